@@ -0,0 +1,227 @@
+from __future__ import annotations
+from typing import Dict, Iterator, List, Optional, Tuple
+from array import array
+from datetime import date, datetime, timedelta
+import numpy as np
+from Calendar import Calendar
+from RollingCalendar import RollingCalendar
+from Schedule import Schedule
+from ScheduleDate import ScheduleDate
+from Stats import timed
+
+#numpy is only needed here; the scheduler itself doesn't depend on it.
+#the calendar is walked once into columns, one row per scheduled episode, sorted by show and then time;
+#every metric after that is array arithmetic over those columns or masked views of them
+ONE_DAY: np.timedelta64 = np.timedelta64(1, "D")
+#1970-01-01 was a thursday; with this offset day numbers give monday = 0 like date.weekday()
+EPOCH_WEEKDAY: int = 3
+EPOCH_ORDINAL: int = date(1970, 1, 1).toordinal()
+#numpy's NaT, so a column of seconds can be viewed as datetimes directly
+NOT_A_TIME: int = np.iinfo(np.int64).min
+DAYS_IN_WEEK: int = 7
+PERCENTILES: Tuple[int, ...] = (50, 90)
+
+
+def distribution(values: np.ndarray) -> Dict[str, float]:
+    if not len(values):
+        return {"count": 0}
+    p50, p90 = np.percentile(values, PERCENTILES)
+    return {"count": int(len(values)), "min": float(values.min()), "mean": float(values.mean()),
+            "p50": float(p50), "p90": float(p90), "max": float(values.max())}
+
+
+def to_seconds(moment: Optional[datetime]) -> int:
+    #converting datetime objects one by one inside numpy is several times slower than this
+    if moment is None:
+        return NOT_A_TIME
+    return (moment.toordinal() - EPOCH_ORDINAL) * 86400 + moment.hour * 3600 + moment.minute * 60 + moment.second
+
+
+def weekdays_of(days: np.ndarray) -> np.ndarray:
+    return (days.astype("datetime64[D]").astype(np.int64) + EPOCH_WEEKDAY) % DAYS_IN_WEEK
+
+
+class ScheduleAnalytics:
+    def __init__(
+            self: ScheduleAnalytics,
+            show_names: List[str],
+            remaining: np.ndarray,
+            shows: np.ndarray,
+            times: np.ndarray,
+            releases: np.ndarray,
+            days: np.ndarray,
+            day_slots: np.ndarray) -> None:
+        #show code -> name, and episodes still waiting in each show's queue
+        self.show_names: List[str] = show_names
+        self.codes: Dict[str, int] = {name: code for code, name in enumerate(show_names)}
+        self.remaining: np.ndarray = remaining
+        #per scheduled episode: show code, slot time, release (NaT when it had none)
+        self.shows: np.ndarray = shows
+        self.times: np.ndarray = times
+        self.releases: np.ndarray = releases
+        #per day of the covered range: the day and how many slots it had, filled or not
+        self.days: np.ndarray = days
+        self.day_slots: np.ndarray = day_slots
+
+    def __len__(self: ScheduleAnalytics) -> int:
+        return len(self.shows)
+
+    def masked(self: ScheduleAnalytics, rows: np.ndarray, days: Optional[np.ndarray] = None) -> ScheduleAnalytics:
+        #boolean masks keep the show-then-time order, so views need no re-sorting
+        return ScheduleAnalytics(self.show_names, self.remaining, self.shows[rows], self.times[rows], self.releases[rows],
+                                 self.days if days is None else self.days[days], self.day_slots if days is None else self.day_slots[days])
+
+    def between(self: ScheduleAnalytics, start: date, end: date) -> ScheduleAnalytics:
+        #both ends included
+        first: np.datetime64 = np.datetime64(start, "D")
+        after: np.datetime64 = np.datetime64(end, "D") + ONE_DAY
+        return self.masked((self.times >= first) & (self.times < after), (self.days >= first) & (self.days < after))
+
+    def for_shows(self: ScheduleAnalytics, *names: str) -> ScheduleAnalytics:
+        #the day columns are kept, so utilization becomes the share of all slots these shows took
+        return self.masked(np.isin(self.shows, [self.codes[name] for name in names if name in self.codes]))
+
+    def groups(self: ScheduleAnalytics) -> Iterator[Tuple[str, slice]]:
+        if not len(self.shows):
+            return
+        bounds: np.ndarray = np.concatenate(([0], np.flatnonzero(np.diff(self.shows)) + 1, [len(self.shows)]))
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            yield self.show_names[self.shows[start]], slice(int(start), int(stop))
+
+    def split(self: ScheduleAnalytics, values: np.ndarray, codes: np.ndarray) -> Dict[str, np.ndarray]:
+        #codes are the show of each value and come in show order, as everything derived from the columns does
+        grouped: Dict[str, np.ndarray] = {}
+        if len(codes):
+            bounds: np.ndarray = np.flatnonzero(np.diff(codes)) + 1
+            for part, start in zip(np.split(values, bounds), np.concatenate(([0], bounds))):
+                grouped[self.show_names[codes[start]]] = part
+        return grouped
+
+    def gap_values(self: ScheduleAnalytics) -> Tuple[np.ndarray, np.ndarray]:
+        #days between consecutive episodes of the same show, and the show code of each
+        same_show: np.ndarray = self.shows[1:] == self.shows[:-1]
+        return np.diff(self.times)[same_show] / ONE_DAY, self.shows[1:][same_show]
+
+    def lag_values(self: ScheduleAnalytics) -> Tuple[np.ndarray, np.ndarray]:
+        #days from release to the slot it was watched in, for episodes that had a release date
+        released: np.ndarray = ~np.isnat(self.releases)
+        return (self.times[released] - self.releases[released]) / ONE_DAY, self.shows[released]
+
+    def gaps(self: ScheduleAnalytics) -> Dict[str, np.ndarray]:
+        return self.split(*self.gap_values())
+
+    def lags(self: ScheduleAnalytics) -> Dict[str, np.ndarray]:
+        return self.split(*self.lag_values())
+
+    def gap_stats(self: ScheduleAnalytics) -> Dict[str, Dict[str, float]]:
+        return {name: distribution(values) for name, values in self.gaps().items()}
+
+    def lag_stats(self: ScheduleAnalytics) -> Dict[str, Dict[str, float]]:
+        return {name: distribution(values) for name, values in self.lags().items()}
+
+    def last_dates(self: ScheduleAnalytics) -> Dict[str, date]:
+        return {name: self.times[rows.stop - 1].astype("datetime64[D]").item() for name, rows in self.groups()}
+
+    def finish_dates(self: ScheduleAnalytics) -> Dict[str, Optional[date]]:
+        #the day each show's last episode airs; None while it still has episodes waiting
+        return {name: day if self.remaining[self.codes[name]] == 0 else None for name, day in self.last_dates().items()}
+
+    def utilization(self: ScheduleAnalytics) -> float:
+        slots: int = int(self.day_slots.sum())
+        return len(self.shows) / slots if slots else 0.0
+
+    def weekday_slots(self: ScheduleAnalytics) -> np.ndarray:
+        return np.bincount(weekdays_of(self.days), weights=self.day_slots, minlength=DAYS_IN_WEEK)
+
+    def weekday_counts(self: ScheduleAnalytics) -> np.ndarray:
+        #episodes per weekday, monday first
+        return np.bincount(weekdays_of(self.times), minlength=DAYS_IN_WEEK)
+
+    def weekday_counts_by_show(self: ScheduleAnalytics) -> Dict[str, np.ndarray]:
+        table: np.ndarray = np.bincount(self.shows * DAYS_IN_WEEK + weekdays_of(self.times),
+                                        minlength=len(self.show_names) * DAYS_IN_WEEK).reshape(len(self.show_names), DAYS_IN_WEEK)
+        return {self.show_names[code]: table[code] for code in np.unique(self.shows)}
+
+    def weekday_balance(self: ScheduleAnalytics) -> float:
+        #spread of per weekday fill rates, as a coefficient of variation; 0 when every weekday is as full as the others
+        slots: np.ndarray = self.weekday_slots()
+        offered: np.ndarray = slots > 0
+        if not offered.any():
+            return 0.0
+        rates: np.ndarray = self.weekday_counts()[offered] / slots[offered]
+        return float(rates.std() / rates.mean()) if rates.mean() else 0.0
+
+    def summary(self: ScheduleAnalytics) -> Dict[str, float]:
+        #one flat row per schedule, for comparing many candidates
+        gaps: np.ndarray = self.gap_values()[0]
+        lags: np.ndarray = self.lag_values()[0]
+        last: Optional[np.datetime64] = self.times.max() if len(self.times) else None
+        return {
+            "episodes": float(len(self.shows)),
+            "utilization": self.utilization(),
+            "weekday balance": self.weekday_balance(),
+            "mean gap": float(gaps.mean()) if len(gaps) else 0.0,
+            "p90 gap": float(np.percentile(gaps, 90)) if len(gaps) else 0.0,
+            "max gap": float(gaps.max()) if len(gaps) else 0.0,
+            "mean lag": float(lags.mean()) if len(lags) else 0.0,
+            "max lag": float(lags.max()) if len(lags) else 0.0,
+            "last day": float((last.astype("datetime64[D]") - self.days[0]) / ONE_DAY) if last is not None and len(self.days) else 0.0,
+        }
+
+
+def covered_days(schedule: Schedule, archived: bool) -> Iterator[Tuple[date, Optional[ScheduleDate]]]:
+    #every day from the first stored one to the last, archived weeks of a rolling calendar first when asked for
+    calendar: Calendar = schedule.schedule
+    start: Optional[date] = calendar.earliest_date
+    if archived and isinstance(calendar, RollingCalendar) and len(calendar.archive) and calendar.frozen_through is not None:
+        sunday: date = calendar.archive.sundays()[0]
+        started: bool = False
+        while sunday <= calendar.frozen_through:
+            for offset, schedule_date in enumerate(calendar.archive.week_days(sunday)):
+                started = started or schedule_date is not None
+                if started:
+                    yield sunday + timedelta(days=offset), schedule_date
+            sunday += timedelta(days=DAYS_IN_WEEK)
+        start = sunday
+    if start is not None and calendar.latest_date is not None:
+        yield from calendar.range(start, calendar.latest_date).items()
+
+
+def analyze(schedule: Schedule, archived: bool = False) -> ScheduleAnalytics:
+    with timed(schedule.stats, "analytics extract"):
+        show_names: List[str] = [show.name for show in schedule.shows.all()]
+        codes: Dict[str, int] = {name: code for code, name in enumerate(show_names)}
+        shows: array = array("q")
+        times: array = array("q")
+        releases: array = array("q")
+        first: Optional[date] = None
+        day_slots: array = array("q")
+        for day, schedule_date in covered_days(schedule, archived):
+            if first is None:
+                first = day
+            if schedule_date is None:
+                #an ordinary day nothing was scheduled on still offered its template's slots
+                day_slots.append(len(schedule.slot_templates.template_for(day).times_on(day)))
+                continue
+            day_slots.append(len(schedule_date.slots))
+            for slot in schedule_date.slots:
+                if slot.episode:
+                    code: Optional[int] = codes.get(slot.episode.show_name)
+                    if code is None:
+                        #an archived show that has since been unregistered
+                        code = codes[slot.episode.show_name] = len(show_names)
+                        show_names.append(slot.episode.show_name)
+                    shows.append(code)
+                    times.append(to_seconds(slot.time))
+                    releases.append(to_seconds(slot.episode.release_date))
+        remaining: np.ndarray = np.zeros(len(show_names), dtype=np.int64)
+        for show in schedule.shows.all():
+            remaining[codes[show.name]] = len(show.episodes)
+        show_column: np.ndarray = np.frombuffer(shows, dtype=np.int64)
+        time_column: np.ndarray = np.frombuffer(times, dtype=np.int64).view("datetime64[s]")
+        #covered days are consecutive, so only the first is needed
+        days: np.ndarray = np.arange(len(day_slots)) + (np.datetime64(first, "D") if first else np.datetime64(0, "D"))
+        order: np.ndarray = np.lexsort((time_column, show_column))
+        return ScheduleAnalytics(show_names, remaining, show_column[order], time_column[order],
+                                 np.frombuffer(releases, dtype=np.int64).view("datetime64[s]")[order],
+                                 days, np.frombuffer(day_slots, dtype=np.int64))
@@ -0,0 +1,81 @@
+from __future__ import annotations
+from typing import Optional
+from datetime import date, datetime, time, timedelta
+
+#bit i is set when the episode may air on date.weekday() == i (monday = 0)
+ALL_WEEKDAYS: int = 0b1111111
+MONDAY: int = 1 << 0
+TUESDAY: int = 1 << 1
+WEDNESDAY: int = 1 << 2
+THURSDAY: int = 1 << 3
+FRIDAY: int = 1 << 4
+SATURDAY: int = 1 << 5
+SUNDAY: int = 1 << 6
+
+
+def weekday_mask(*weekdays: int) -> int:
+    mask: int = 0
+    for weekday in weekdays:
+        mask |= 1 << weekday
+    return mask
+
+
+class Availability:
+    __slots__ = ("not_before", "weekdays", "window_start", "window_end", "release", "never", "release_only")
+
+    def __init__(
+            self: Availability,
+            not_before: Optional[datetime] = None,
+            weekdays: int = ALL_WEEKDAYS,
+            window_start: Optional[time] = None,
+            window_end: Optional[time] = None) -> None:
+        self.not_before: Optional[datetime] = not_before
+        self.weekdays: int = weekdays & ALL_WEEKDAYS
+        #time of day window is [window_start, window_end)
+        self.window_start: time = window_start if window_start else time.min
+        self.window_end: Optional[time] = window_end
+        #precompiled form of the constraints so is_available is at most one comparison chain
+        self.release: datetime = not_before if not_before else datetime.min
+        self.never: bool = self.weekdays == 0 or (window_end is not None and window_end <= self.window_start)
+        self.release_only: bool = self.weekdays == ALL_WEEKDAYS and self.window_start == time.min and window_end is None
+
+    def is_available(self: Availability, slot: datetime) -> bool:
+        if slot < self.release:
+            return False
+        if self.release_only:
+            return True
+        if self.never or not (self.weekdays >> slot.weekday()) & 1:
+            return False
+        slot_time: time = slot.time()
+        return self.window_start <= slot_time and (self.window_end is None or slot_time < self.window_end)
+
+    def earliest(self: Availability, after: datetime) -> Optional[datetime]:
+        if self.never:
+            return None
+        candidate: datetime = max(after, self.release)
+        if self.release_only:
+            return candidate
+        #a matching weekday is always within the next week
+        for _ in range(8):
+            day: date = candidate.date()
+            if (self.weekdays >> day.weekday()) & 1:
+                if candidate.time() < self.window_start:
+                    return datetime.combine(day, self.window_start)
+                if self.window_end is None or candidate.time() < self.window_end:
+                    return candidate
+            candidate = datetime.combine(day + timedelta(days=1), self.window_start)
+        return None
+
+    def with_release(self: Availability, release: Optional[datetime]) -> Availability:
+        return Availability(release, self.weekdays, self.window_start, self.window_end)
+
+    def with_weekdays(self: Availability, weekdays: int) -> Availability:
+        #constraints stack, so restricting weekdays twice keeps only the days both allow
+        return Availability(self.not_before, self.weekdays & weekdays, self.window_start, self.window_end)
+
+    def with_window(self: Availability, start: Optional[time], end: Optional[time]) -> Availability:
+        return Availability(self.not_before, self.weekdays, start, end)
+
+
+#shared by every episode that has no constraints at all
+ANYTIME: Availability = Availability()
@@ -0,0 +1,90 @@
+from __future__ import annotations
+from typing import Dict, Iterable, Iterator, List, Optional, cast
+from datetime import date
+import multiprocessing
+from multiprocessing import shared_memory
+from Scenario import Scenario, apply_scenario
+from Schedule import Schedule
+from Show import Show
+from Snapshot import SnapshotReader, load_schedule_bytes, snapshot_bytes
+
+
+class Tenant:
+    def __init__(self: Tenant, scenario: Scenario, start: date) -> None:
+        #a household's registration phases, priorities and special dates, drawn from the shared catalog
+        self.name: str = scenario.name
+        self.scenario: Scenario = scenario
+        self.start: date = start
+
+
+class TenantResult:
+    def __init__(self: TenantResult, name: str) -> None:
+        self.name: str = name
+        self.stop: Optional[date] = None
+        #the finished schedule as a snapshot, which is far cheaper to send between processes than the objects
+        self.snapshot: bytes = b""
+        self.error: Optional[str] = None
+
+    def load(self: TenantResult) -> Schedule:
+        return load_schedule_bytes(self.snapshot)
+
+
+def catalog_bytes(catalog: Iterable[Show]) -> bytes:
+    #the catalog is written once in snapshot form; registering copies keeps the caller's shows untouched
+    return snapshot_bytes(Schedule(shows=[Show(show.name, show.color, show.episodes.copy(), show.priority) for show in catalog]))
+
+
+def read_catalog(buffer: memoryview) -> Dict[str, Show]:
+    return {show.name: show for show in SnapshotReader(buffer).read_schedule().shows.all()}
+
+
+def schedule_tenant(catalog: Dict[str, Show], tenant: Tenant) -> TenantResult:
+    result: TenantResult = TenantResult(tenant.name)
+    wanted: List[str] = [show_name for phase in tenant.scenario.phases for show_name in phase.show_names] + list(tenant.scenario.priorities)
+    #each tenant consumes its own copy of just the shows it registers
+    pool: Dict[str, Show] = {show_name: Show(show_name, catalog[show_name].color, catalog[show_name].episodes.copy(), catalog[show_name].priority)
+                             for show_name in wanted if show_name in catalog}
+    schedule: Schedule = Schedule()
+    try:
+        result.stop = apply_scenario(schedule, pool, tenant.scenario, tenant.start)
+    except (KeyError, ValueError) as error:
+        result.error = str(error)
+        return result
+    result.snapshot = snapshot_bytes(schedule)
+    return result
+
+
+#only the encoded catalog is shared; every worker decodes its own full copy of it from the block at startup,
+#so memory for the decoded shows grows with the number of processes, while the block itself exists once
+WORKER_CATALOG: Dict[str, Show] = {}
+
+
+def init_worker(block_name: str) -> None:
+    global WORKER_CATALOG
+    block: shared_memory.SharedMemory = shared_memory.SharedMemory(name=block_name)
+    try:
+        WORKER_CATALOG = read_catalog(cast(memoryview, block.buf))
+    finally:
+        block.close()
+
+
+def schedule_in_worker(tenant: Tenant) -> TenantResult:
+    return schedule_tenant(WORKER_CATALOG, tenant)
+
+
+def schedule_tenants(catalog: Iterable[Show], tenants: Iterable[Tenant], processes: Optional[int] = None) -> Iterator[TenantResult]:
+    #results come back in the order tenants finish, not the order they were given
+    data: bytes = catalog_bytes(catalog)
+    if processes == 1:
+        shared: Dict[str, Show] = read_catalog(memoryview(data))
+        for tenant in tenants:
+            yield schedule_tenant(shared, tenant)
+        return
+    block: shared_memory.SharedMemory = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+    try:
+        cast(memoryview, block.buf)[:len(data)] = data
+        with multiprocessing.Pool(processes, initializer=init_worker, initargs=(block.name,)) as workers:
+            yield from workers.imap_unordered(schedule_in_worker, tenants)
+    finally:
+        block.close()
+        block.unlink()
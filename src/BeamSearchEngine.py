@@ -0,0 +1,264 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Set, Tuple, cast
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+import time
+from Schedule import Schedule
+from ScheduleDate import ScheduleDate
+from ShowSlot import ShowSlot
+from Show import Show
+from Episode import Episode
+from Checkpoint import Checkpoint, GenerationRun
+from Journal import set_entry
+from SchedulingEngine import SchedulingEngine
+
+SECONDS_PER_DAY: float = 86400.0
+
+
+class BeamNode:
+    __slots__ = ("heads", "lasts", "scheduled", "penalty", "parent", "choice")
+
+    def __init__(
+            self: BeamNode,
+            heads: Tuple[int, ...],
+            lasts: Tuple[datetime, ...],
+            scheduled: int = 0,
+            penalty: float = 0.0,
+            parent: Optional[BeamNode] = None,
+            choice: Optional[Tuple[int, int]] = None) -> None:
+        #position in each show's episode list and when each show was last on
+        self.heads: Tuple[int, ...] = heads
+        self.lasts: Tuple[datetime, ...] = lasts
+        self.scheduled: int = scheduled
+        self.penalty: float = penalty
+        #(slot index, show index) picked to get here from parent; the plan is read back along the chain
+        self.parent: Optional[BeamNode] = parent
+        self.choice: Optional[Tuple[int, int]] = choice
+
+    def plan(self: BeamNode) -> List[Tuple[int, int]]:
+        choices: List[Tuple[int, int]] = []
+        node: Optional[BeamNode] = self
+        while node is not None and node.choice is not None:
+            choices.append(node.choice)
+            node = node.parent
+        choices.reverse()
+        return choices
+
+
+class PendingLag:
+    #release lag an episode has already built up by a given time, summed over a show's unscheduled episodes in O(log n)
+    def __init__(self: PendingLag, episodes: List[Episode]) -> None:
+        self.length: int = len(episodes)
+        #episodes air in order, so an episode is effectively released no earlier than any episode before it
+        self.releases: List[float] = []
+        self.counts: List[int] = [0]
+        self.sums: List[float] = [0.0]
+        effective: float = 0.0
+        for episode in episodes:
+            if episode.release_date:
+                effective = max(effective, (episode.release_date - datetime.min).total_seconds())
+            self.releases.append(effective)
+            released: bool = episode.release_date is not None
+            self.counts.append(self.counts[-1] + released)
+            self.sums.append(self.sums[-1] + (effective if released else 0.0))
+
+    def lag_days(self: PendingLag, head: int, now: datetime) -> float:
+        seconds: float = (now - datetime.min).total_seconds()
+        released: int = bisect_right(self.releases, seconds, head)
+        count: int = self.counts[released] - self.counts[head]
+        return (count * seconds - (self.sums[released] - self.sums[head])) / SECONDS_PER_DAY
+
+
+class BeamSearchEngine(SchedulingEngine):
+    def __init__(
+            self: BeamSearchEngine,
+            budget: float = 1.0,
+            beam_width: int = 32,
+            branching: int = 3,
+            lag_weight: float = 1.0,
+            gap_weight: float = 0.1) -> None:
+        #wall clock seconds for the whole call, greedy pass included
+        self.budget: float = budget
+        self.beam_width: int = beam_width
+        #how many of the greedy pass's best candidates are tried for each slot
+        self.branching: int = branching
+        self.lag_weight: float = lag_weight
+        self.gap_weight: float = gap_weight
+
+    def cost(self: BeamSearchEngine, slot: datetime, episode: Episode, last: datetime) -> float:
+        cost: float = 0.0
+        if episode.release_date:
+            cost += self.lag_weight * (slot - episode.release_date).total_seconds() / SECONDS_PER_DAY
+        if last != datetime.min:
+            gap: float = (slot - last).total_seconds() / SECONDS_PER_DAY
+            cost += self.gap_weight * gap * gap
+        return cost
+
+    def score(self: BeamSearchEngine, assignments: List[Tuple[datetime, Episode]], lasts: Dict[str, datetime]) -> Tuple[int, datetime, float]:
+        #more episodes placed first, then an earlier last episode, then less release lag and shorter gaps
+        lasts = dict(lasts)
+        penalty: float = 0.0
+        for slot, episode in assignments:
+            penalty += self.cost(slot, episode, lasts.get(episode.show_name, datetime.min))
+            lasts[episode.show_name] = slot
+        finish: datetime = max((slot for slot, _ in assignments), default=datetime.min)
+        return (-len(assignments), finish, penalty)
+
+    def generate(
+            self: BeamSearchEngine,
+            schedule: Schedule,
+            start: date,
+            stop_at_first_empty_show: bool = True,
+            end: Optional[date] = None,
+            event_driven: bool = False) -> date:
+        deadline: float = time.monotonic() + self.budget
+        #the greedy answer is both the fallback and the bar to beat, and its stop day bounds the search
+        stopped: date = schedule.generate_schedule(start, stop_at_first_empty_show, end, event_driven)
+        greedy_run: GenerationRun = cast(GenerationRun, schedule.last_run)
+        if not greedy_run.assignments or not greedy_run.checkpoint_days or time.monotonic() >= deadline:
+            return stopped
+        checkpoint: Checkpoint = greedy_run.checkpoints[greedy_run.checkpoint_days[0]]
+        greedy_plan: List[Tuple[datetime, Episode]] = [(slot.time, episode) for slot, episode in greedy_run.assignments]
+        schedule.rewind(greedy_run, checkpoint)
+
+        shows: List[Show] = list(schedule.shows.active())
+        lasts: Dict[str, datetime] = {show.name: schedule.get_previous_instance_date(show) for show in shows}
+        days: List[Tuple[date, ScheduleDate]] = [(start + timedelta(days=i), schedule.get_current_date(start + timedelta(days=i)))
+                                                 for i in range((stopped - start).days + 1)]
+        #greedy stops at the first slot it can't or won't fill, so both plans are judged on the slots up to its last episode
+        finish: datetime = greedy_plan[-1][0]
+        slots: List[ShowSlot] = [slot for _, schedule_date in days for slot in schedule_date.slots if slot.episode is None and slot.time <= finish]
+        queues: List[List[Episode]] = [list(show.episodes) for show in shows]
+        best: Optional[BeamNode] = self.search(shows, queues, lasts, slots, deadline)
+        if best is not None:
+            plan: List[Tuple[ShowSlot, Episode, Show]] = self.pair_episodes(best.plan(), slots, queues, shows)
+            if self.score([(slot.time, episode) for slot, episode, _ in plan], lasts) < self.score(greedy_plan, lasts):
+                return self.commit(schedule, greedy_run, checkpoint, days, slots, plan, stopped)
+        #put the greedy answer back exactly as it was, checkpoints and all
+        run: GenerationRun = greedy_run.resume_from(checkpoint)
+        schedule.last_run = run
+        run.stop = schedule.replay(greedy_run, checkpoint, run)
+        schedule.clear_empty_shows()
+        return cast(date, run.stop)
+
+    def search(
+            self: BeamSearchEngine,
+            shows: List[Show],
+            queues: List[List[Episode]],
+            lasts: Dict[str, datetime],
+            slots: List[ShowSlot],
+            deadline: float) -> Optional[BeamNode]:
+        pending: List[PendingLag] = [PendingLag(queue) for queue in queues]
+        root: BeamNode = BeamNode(tuple(0 for _ in shows), tuple(lasts[show.name] for show in shows))
+        beam: List[BeamNode] = [root]
+        #the node that has made exactly the greedy pass's choices is never pruned, so the search can't end up behind it
+        greedy: BeamNode = root
+        for slot_index, slot in enumerate(slots):
+            if time.monotonic() >= deadline:
+                return None
+            #nodes that reach the same state are merged, keeping the cheapest way there
+            expanded: Dict[Tuple, BeamNode] = {}
+            greedy_key: Tuple = (greedy.heads, greedy.lasts)
+            for node in beam:
+                candidates: List[int] = [i for i in range(len(shows))
+                                         if node.heads[i] < len(queues[i]) and queues[i][node.heads[i]].is_available(slot.time)]
+                if not candidates:
+                    self.keep(expanded, node)
+                    continue
+                candidates.sort(key=lambda i: (node.lasts[i], shows[i].priority, shows[i].show_id))
+                for i in candidates[:self.branching]:
+                    episode: Episode = queues[i][node.heads[i]]
+                    heads: List[int] = list(node.heads)
+                    heads[i] += 1
+                    node_lasts: List[datetime] = list(node.lasts)
+                    node_lasts[i] = slot.time
+                    child: BeamNode = BeamNode(tuple(heads), tuple(node_lasts), node.scheduled + 1,
+                                               node.penalty + self.cost(slot.time, episode, node.lasts[i]), node, (slot_index, i))
+                    self.keep(expanded, child)
+                    if node is greedy and i == candidates[0]:
+                        greedy_key = (child.heads, child.lasts)
+            greedy = expanded[greedy_key]
+            beam = sorted(expanded.values(), key=lambda node: self.rank(node, slot.time, pending))[:self.beam_width]
+            if greedy not in beam:
+                beam.append(greedy)
+        return min(beam, key=lambda node: self.rank(node, slots[-1].time if slots else datetime.min, pending))
+
+    def rank(self: BeamSearchEngine, node: BeamNode, now: datetime, pending: List[PendingLag]) -> Tuple[int, float]:
+        #every node in a beam has seen the same slots, so fewer scheduled means more slots were left empty;
+        #past that, cost already paid plus what episodes still waiting have run up by now, which they can't avoid paying
+        estimate: float = node.penalty
+        for i, head in enumerate(node.heads):
+            if head >= pending[i].length:
+                continue
+            estimate += self.lag_weight * pending[i].lag_days(head, now)
+            if node.lasts[i] != datetime.min:
+                gap: float = (now - node.lasts[i]).total_seconds() / SECONDS_PER_DAY
+                estimate += self.gap_weight * gap * gap
+        return (-node.scheduled, estimate)
+
+    def keep(self: BeamSearchEngine, expanded: Dict[Tuple, BeamNode], node: BeamNode) -> None:
+        key: Tuple = (node.heads, node.lasts)
+        existing: Optional[BeamNode] = expanded.get(key)
+        if existing is None or (node.scheduled, -node.penalty) > (existing.scheduled, -existing.penalty):
+            expanded[key] = node
+
+    def pair_episodes(
+            self: BeamSearchEngine,
+            choices: List[Tuple[int, int]],
+            slots: List[ShowSlot],
+            queues: List[List[Episode]],
+            shows: List[Show]) -> List[Tuple[ShowSlot, Episode, Show]]:
+        heads: List[int] = [0] * len(shows)
+        plan: List[Tuple[ShowSlot, Episode, Show]] = []
+        for slot_index, show_index in choices:
+            plan.append((slots[slot_index], queues[show_index][heads[show_index]], shows[show_index]))
+            heads[show_index] += 1
+        return plan
+
+    def commit(
+            self: BeamSearchEngine,
+            schedule: Schedule,
+            greedy_run: GenerationRun,
+            checkpoint: Checkpoint,
+            days: List[Tuple[date, ScheduleDate]],
+            slots: List[ShowSlot],
+            plan: List[Tuple[ShowSlot, Episode, Show]],
+            stopped: date) -> date:
+        run: GenerationRun = GenerationRun(greedy_run.start, greedy_run.stop_at_first_empty_show, greedy_run.end, greedy_run.event_driven)
+        #the state at start is the same one greedy saw, so regenerate() can still rewind to it
+        run.add_checkpoint(checkpoint)
+        schedule.last_run = run
+        #like greedy, ordinary days that end up with nothing on them stay unstored
+        used: Set[date] = {slot.time.date() for slot, _, _ in plan}
+        for day, schedule_date in days:
+            if day in used or schedule.stored_date(day) is not None:
+                schedule.store_date(run, day, schedule_date)
+        if run.event_driven:
+            self.log_idle(schedule, run, slots, plan)
+        for slot, episode, show in plan:
+            show.episodes.take(episode)
+            schedule.schedule.assign(slot, episode)
+            set_entry(schedule.journal, schedule.previous_ep_cache, show, slot.time)
+            run.assignments.append((slot, episode))
+        schedule.clear_empty_shows()
+        run.stop = stopped
+        return stopped
+
+    def log_idle(self: BeamSearchEngine, schedule: Schedule, run: GenerationRun, slots: List[ShowSlot], plan: List[Tuple[ShowSlot, Episode, Show]]) -> None:
+        #runs before the plan takes any episodes; the search only leaves a slot empty when no show's next episode could air in it,
+        #so like steps() that slot starts an idle span lasting until the first of those episodes becomes available
+        picked: Dict[int, Show] = {id(slot): show for slot, _, show in plan}
+        heads: Dict[Show, int] = {show: 0 for show in schedule.shows.active()}
+        idle_until: Optional[datetime] = None
+        for slot in slots:
+            show: Optional[Show] = picked.get(id(slot))
+            if show is not None:
+                heads[show] += 1
+                continue
+            if idle_until is not None and slot.time < idle_until:
+                continue
+            idle_until = min((upcoming for waiting, head in heads.items() if head < len(waiting.episodes)
+                              for upcoming in [waiting.episodes[head].earliest_available(slot.time)] if upcoming is not None), default=None)
+            if idle_until is not None:
+                schedule.schedule.mark_idle(slot.time, idle_until)
+                run.idle_spans.append((slot.time, idle_until))
@@ -0,0 +1,218 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, cast
+from datetime import date, datetime, timedelta
+import argparse
+import io
+import json
+import random
+import time
+import tracemalloc
+from Calendar import Calendar
+from Schedule import Schedule, ScheduleBuilder
+from ScheduleDate import DefaultScheduleDate, ScheduleDateBuilder
+from Show import Show, ShowBuilder
+from ScheduleDiff import sync_round_trip
+import Display
+
+BENCH_START: date = date(2025, 1, 1)
+
+
+class Workload:
+    def __init__(
+            self: Workload,
+            shows: int = 16,
+            episodes: int = 10,
+            years: int = 1,
+            weekly_share: float = 0.4,
+            restricted_share: float = 0.2,
+            special_density: float = 0.05,
+            seed: int = 0) -> None:
+        self.shows: int = shows
+        self.episodes: int = episodes
+        self.years: int = years
+        #the rest of the shows are binge releases, half of them held back until a release date
+        self.weekly_share: float = weekly_share
+        self.restricted_share: float = restricted_share
+        #chance that any given day of the horizon is a special date
+        self.special_density: float = special_density
+        self.seed: int = seed
+
+    def end(self: Workload) -> date:
+        return BENCH_START + timedelta(days=365 * self.years - 1)
+
+    def label(self: Workload) -> Dict[str, Any]:
+        return {"shows": self.shows, "episodes": self.episodes, "years": self.years, "weekly": self.weekly_share,
+                "restricted": self.restricted_share, "special": self.special_density, "seed": self.seed}
+
+
+def build_show(rng: random.Random, workload: Workload, index: int) -> Show:
+    builder: ShowBuilder = ShowBuilder(name=f"Show {index:05d}").WithPriority(rng.randint(0, 9)).WithColor(index % 16)
+    horizon: int = 365 * workload.years
+    kind: float = rng.random()
+    if kind < workload.weekly_share:
+        premiere: datetime = datetime.combine(BENCH_START, datetime.min.time()) + timedelta(days=rng.randrange(horizon), hours=21)
+        builder.WithWeeklyEpisodes(premiere, workload.episodes)
+    elif kind < workload.weekly_share + workload.restricted_share:
+        weekdays: List[int] = rng.sample(range(7), rng.randint(1, 3))
+        for number in range(1, workload.episodes + 1):
+            builder.WithEpisode(lambda episode, number=number: episode.EpisodeNumber(number).OnWeekdays(*weekdays))
+        builder.FinalizeLastEpisode()
+    elif rng.random() < 0.5:
+        builder.WithEpisodes(workload.episodes, available_on=datetime.combine(BENCH_START + timedelta(days=rng.randrange(horizon)), datetime.min.time()))
+    else:
+        builder.WithEpisodes(workload.episodes)
+    return builder.show
+
+
+def special_date(day: date, lunch: bool, dinner: bool) -> Callable[[ScheduleDateBuilder], ScheduleDateBuilder]:
+    def configure(builder: ScheduleDateBuilder) -> ScheduleDateBuilder:
+        builder.SpecialDate(day).WithNote(f"special {day.isoformat()}")
+        if lunch:
+            builder.WithLunchSlot()
+        if dinner:
+            builder.WithDinnerSlot()
+        return builder
+    return configure
+
+
+def build_workload(workload: Workload) -> Schedule:
+    rng: random.Random = random.Random(workload.seed)
+    builder: ScheduleBuilder = ScheduleBuilder()
+    for index in range(workload.shows):
+        builder.RegisterShow(build_show(rng, workload, index))
+    for offset in range(365 * workload.years):
+        if rng.random() >= workload.special_density:
+            continue
+        day: date = BENCH_START + timedelta(days=offset)
+        builder.RegisterSpecialDate(special_date(day, rng.random() < 0.5, rng.random() < 0.7))
+    return builder.schedule
+
+
+def operations(workload: Workload) -> List[Tuple[str, Callable[[Schedule], Any]]]:
+    #run in this order against one schedule, so later operations see the state earlier ones left behind
+    end: date = workload.end()
+    middle: date = BENCH_START + (end - BENCH_START) / 2
+
+    def find_last_appearances(schedule: Schedule) -> None:
+        for show in schedule.shows.all():
+            schedule.find_last_show_appearance(show)
+
+    def sync_delta(schedule: Schedule) -> None:
+        #a special date over a generated day changes that day's kind and slots, and the copy has to end up identical anyway
+        def edit(schedule: Schedule) -> None:
+            calendar: Calendar = schedule.schedule
+            generated: Optional[date] = next((day for day, stored in calendar.range(cast(date, calendar.earliest_date), cast(date, calendar.latest_date)).items()
+                                              if isinstance(stored, DefaultScheduleDate)), None) if calendar.earliest_date else None
+            if generated is not None:
+                ScheduleBuilder(schedule).RegisterSpecialDate(special_date(generated, True, False))
+            schedule.regenerate(generated if generated is not None else middle)
+        left: int = len(sync_round_trip(schedule, edit))
+        if left:
+            raise ValueError(f"synced copy still differs in {left} changes")
+
+    return [
+        ("generate_schedule", lambda schedule: schedule.generate_schedule(BENCH_START, False, end, True)),
+        ("find_last_show_appearance", find_last_appearances),
+        ("clear_date_range", lambda schedule: schedule.clear_date_range(middle, middle + timedelta(days=30))),
+        ("regenerate", lambda schedule: schedule.regenerate(middle)),
+        ("schedule_to_string", lambda schedule: Display.write_schedule(schedule, io.StringIO())),
+        ("schedule_paste_format", lambda schedule: Display.write_paste_format(schedule, [], io.StringIO())),
+        ("sync_delta", sync_delta),
+    ]
+
+
+class BenchmarkResult:
+    def __init__(self: BenchmarkResult, workload: Workload, operation: str, seconds: float, peak_bytes: int) -> None:
+        self.workload: Workload = workload
+        self.operation: str = operation
+        self.seconds: float = seconds
+        self.peak_bytes: int = peak_bytes
+
+    def key(self: BenchmarkResult) -> str:
+        return json.dumps([self.operation, self.workload.label()], sort_keys=True)
+
+    def to_record(self: BenchmarkResult) -> Dict[str, Any]:
+        record: Dict[str, Any] = {"operation": self.operation, "seconds": round(self.seconds, 6), "peak_kib": self.peak_bytes // 1024}
+        record.update(self.workload.label())
+        return record
+
+
+def run_workload(workload: Workload, repeat: int = 3) -> List[BenchmarkResult]:
+    #timings are the best of repeat runs with tracing off; peak memory comes from one more run under tracemalloc
+    best: Dict[str, float] = {}
+    for _ in range(repeat):
+        schedule: Schedule = build_workload(workload)
+        for name, operation in operations(workload):
+            started: float = time.perf_counter()
+            operation(schedule)
+            elapsed: float = time.perf_counter() - started
+            best[name] = min(best.get(name, elapsed), elapsed)
+    peaks: Dict[str, int] = {}
+    schedule = build_workload(workload)
+    tracemalloc.start()
+    try:
+        for name, operation in operations(workload):
+            tracemalloc.reset_peak()
+            baseline: int = tracemalloc.get_traced_memory()[0]
+            operation(schedule)
+            peaks[name] = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    return [BenchmarkResult(workload, name, best[name], peaks[name]) for name, _ in operations(workload)]
+
+
+def sweep(show_counts: Iterable[int], episodes: int = 10, years: int = 1, seed: int = 0, repeat: int = 3) -> List[BenchmarkResult]:
+    results: List[BenchmarkResult] = []
+    for shows in show_counts:
+        results += run_workload(Workload(shows=shows, episodes=episodes, years=years, seed=seed), repeat)
+    return results
+
+
+def write_results(results: List[BenchmarkResult], path: str) -> None:
+    with open(path, "a", encoding="utf-8") as sink:
+        for result in results:
+            sink.write(json.dumps(result.to_record(), sort_keys=True) + "\n")
+
+
+def read_results(path: str) -> Dict[str, Dict[str, Any]]:
+    #latest record per (operation, workload), so a results file can simply be appended to run after run
+    records: Dict[str, Dict[str, Any]] = {}
+    with open(path, encoding="utf-8") as source:
+        for line in source:
+            if line.strip():
+                record: Dict[str, Any] = json.loads(line)
+                label: Dict[str, Any] = {name: value for name, value in record.items() if name not in ("operation", "seconds", "peak_kib")}
+                records[json.dumps([record["operation"], label], sort_keys=True)] = record
+    return records
+
+
+def results_to_string(results: List[BenchmarkResult], baseline: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+    header: List[str] = ["operation", "shows", "episodes", "years", "seconds", "peak KiB"]
+    if baseline is not None:
+        header.append("vs baseline")
+    rows: List[List[str]] = [header]
+    for result in results:
+        row: List[str] = [result.operation, str(result.workload.shows), str(result.workload.episodes), str(result.workload.years),
+                          f"{result.seconds:.4f}", str(result.peak_bytes // 1024)]
+        if baseline is not None:
+            previous: Optional[Dict[str, Any]] = baseline.get(result.key())
+            row.append(f"{result.seconds / previous['seconds']:.2f}x" if previous and previous["seconds"] else "-")
+        rows.append(row)
+    return Display.format_table(rows)
+
+
+if __name__ == '__main__':
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description="time and peak memory of the scheduling hot paths")
+    parser.add_argument("--shows", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--episodes", type=int, default=10)
+    parser.add_argument("--years", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="append results to this json lines file")
+    parser.add_argument("--compare", help="json lines file from an earlier run to compare timings against")
+    arguments: argparse.Namespace = parser.parse_args()
+
+    results: List[BenchmarkResult] = sweep(arguments.shows, arguments.episodes, arguments.years, arguments.seed, arguments.repeat)
+    print(results_to_string(results, read_results(arguments.compare) if arguments.compare else None))
+    if arguments.output:
+        write_results(results, arguments.output)
@@ -1,7 +1,11 @@
 from __future__ import annotations
-from typing import Dict, Union
-from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from datetime import date, datetime, timedelta
 from ScheduleDate import ScheduleDate
+from ShowSlot import ShowSlot
+from Episode import Episode
+from Journal import Journal, set_attribute
+from sortedcontainers import SortedSet
 
 class Calendar:
     @staticmethod
@@ -10,22 +14,86 @@ class Calendar:
         return (date.weekday() + 1) % 7
 
     def __init__(self: Calendar) -> None:
-        self.calendar: Dict[date, ScheduleDate] = {}
+        self.init_storage()
         self.latest_date: Union[date, None] = None
         self.earliest_date: Union[date, None] = None
+        #show name -> times that show is scheduled, kept in step with every slot write
+        self.appearances: Dict[str, SortedSet] = {}
+        #[start, end) spans that were deliberately left empty because no show could air yet
+        self.idle_spans: List[Tuple[datetime, datetime]] = []
+        #week key -> bumped whenever a slot or note in that sunday-first week changes, so renders can skip unchanged weeks
+        self.week_versions: Dict[int, int] = {}
+        #last day of the archived weeks; nothing on or before it is kept here or can change any more
+        self.frozen_through: Optional[date] = None
+        #set by Schedule.attach_journal; every write below is recorded there so a history can undo it
+        self.journal: Optional[Journal] = None
 
     def __getitem__(self: Calendar, day: date) -> ScheduleDate:
-        return self.calendar[day]
+        schedule_date: Optional[ScheduleDate] = self.get(day)
+        if schedule_date is None:
+            raise KeyError(day)
+        return schedule_date
 
     def __setitem__(self: Calendar, day: date, schedule_date: ScheduleDate) -> None:
-        self.calendar[day] = schedule_date
+        previous: Optional[ScheduleDate] = self.get(day)
+        if self.journal is not None:
+            self.journal.add(Calendar.set_day, self, day, previous, schedule_date)
+        self.touch(day)
+        if previous is not schedule_date:
+            if previous:
+                self.unindex_date(previous)
+            self.index_date(schedule_date)
+        self.put(day, schedule_date)
         if not self.earliest_date or day < self.earliest_date:
             self.earliest_date = day
         if not self.latest_date or day > self.latest_date:
             self.latest_date = day
 
     def __contains__(self: Calendar, day: date) -> bool:
-        return day in self.calendar
+        return self.get(day) is not None
+
+    def __len__(self: Calendar) -> int:
+        return len(self.calendar)
+
+    def __delitem__(self: Calendar, day: date) -> None:
+        schedule_date: ScheduleDate = self[day]
+        if self.journal is not None:
+            self.journal.add(Calendar.set_day, self, day, schedule_date, None)
+        self.unindex_date(schedule_date)
+        self.touch(day)
+        self.discard(day)
+        if len(self) == 0:
+            self.earliest_date = None
+            self.latest_date = None
+            return
+        one_day: timedelta = timedelta(days=1)
+        while self.latest_date and self.get(self.latest_date) is None:
+            self.latest_date -= one_day
+        while self.earliest_date and self.get(self.earliest_date) is None:
+            self.earliest_date += one_day
+
+    #storage backend; subclasses only need to override these and __len__
+    def init_storage(self: Calendar) -> None:
+        self.calendar: Dict[date, ScheduleDate] = {}
+
+    def get(self: Calendar, day: date) -> Optional[ScheduleDate]:
+        return self.calendar.get(day)
+
+    def put(self: Calendar, day: date, schedule_date: ScheduleDate) -> None:
+        self.calendar[day] = schedule_date
+
+    def discard(self: Calendar, day: date) -> None:
+        self.calendar.pop(day, None)
+
+    def iter_range(self: Calendar, start: date, length: int) -> Iterator[Optional[ScheduleDate]]:
+        return (self.calendar.get(start + timedelta(days=i)) for i in range(length))
+
+    def archive_weeks(self: Calendar, before: date) -> int:
+        #calendars without an archive keep every day
+        return 0
+
+    def range(self: Calendar, start: date, end: date) -> CalendarRange:
+        return CalendarRange(self, start, (end - start).days + 1)
 
     def earliest_sunday(self: Calendar) -> Union[date, None]:
         if not self.earliest_date:
@@ -37,4 +105,141 @@ class Calendar:
         if not self.latest_date:
             return None
         days_to_add = (6 - Calendar.sunday_first_weekday(self.latest_date))
-        return self.latest_date + timedelta(days=days_to_add)
\ No newline at end of file
+        return self.latest_date + timedelta(days=days_to_add)
+
+    @staticmethod
+    #ordinals count from a monday, so this groups sunday through saturday
+    def week_key(day: date) -> int:
+        return day.toordinal() // 7
+
+    def touch(self: Calendar, day: date) -> None:
+        #call after changing a stored day in place; notes have add_note and remove_note, which do it themselves
+        key: int = Calendar.week_key(day)
+        self.week_versions[key] = self.week_versions.get(key, 0) + 1
+
+    def set_day(self: Calendar, day: date, schedule_date: Optional[ScheduleDate]) -> None:
+        if schedule_date is not None:
+            self[day] = schedule_date
+        elif day in self:
+            del self[day]
+
+    def add_note(self: Calendar, day: date, note: str) -> None:
+        notes: List[str] = self[day].special_notes
+        self.set_notes(day, notes + [note])
+
+    def remove_note(self: Calendar, day: date, note: str) -> None:
+        notes: List[str] = self[day].special_notes
+        if note in notes:
+            self.set_notes(day, [kept for kept in notes if kept != note])
+
+    def set_notes(self: Calendar, day: date, notes: List[str]) -> None:
+        schedule_date: ScheduleDate = self[day]
+        if self.journal is not None:
+            self.journal.add(Calendar.set_notes, self, day, schedule_date.special_notes, notes)
+        schedule_date.special_notes = notes
+        self.touch(day)
+
+    def week_version(self: Calendar, sunday: date) -> int:
+        return self.week_versions.get(Calendar.week_key(sunday), 0)
+
+    def index_date(self: Calendar, schedule_date: ScheduleDate) -> None:
+        for slot in schedule_date.slots:
+            if slot.episode:
+                self.appearances.setdefault(slot.episode.show_name, SortedSet()).add(slot.time)
+
+    def unindex_date(self: Calendar, schedule_date: ScheduleDate) -> None:
+        for slot in schedule_date.slots:
+            if slot.episode and slot.episode.show_name in self.appearances:
+                self.appearances[slot.episode.show_name].discard(slot.time)
+
+    def assign(self: Calendar, slot: ShowSlot, episode: Episode) -> None:
+        if slot.episode:
+            self.unassign(slot)
+        if self.journal is not None:
+            self.journal.add(Calendar.set_slot, self, slot, None, episode)
+        slot.episode = episode
+        #touch, inlined for the generation hot path
+        week: int = slot.time.toordinal() // 7
+        self.week_versions[week] = self.week_versions.get(week, 0) + 1
+        self.appearances.setdefault(episode.show_name, SortedSet()).add(slot.time)
+
+    def unassign(self: Calendar, slot: ShowSlot) -> Optional[Episode]:
+        episode: Optional[Episode] = slot.episode
+        if episode:
+            if self.journal is not None:
+                self.journal.add(Calendar.set_slot, self, slot, episode, None)
+            if episode.show_name in self.appearances:
+                self.appearances[episode.show_name].discard(slot.time)
+            slot.episode = None
+            self.touch(slot.time)
+        return episode
+
+    def set_slot(self: Calendar, slot: ShowSlot, episode: Optional[Episode]) -> None:
+        if episode is not None:
+            self.assign(slot, episode)
+        else:
+            self.unassign(slot)
+
+    def last_appearance(self: Calendar, show_name: str, before: Optional[datetime] = None) -> Optional[datetime]:
+        times: Optional[SortedSet] = self.appearances.get(show_name)
+        if not times:
+            return None
+        if before is None:
+            return times[-1]
+        index: int = times.bisect_left(before)
+        return times[index - 1] if index > 0 else None
+
+    def mark_idle(self: Calendar, start: datetime, end: datetime) -> None:
+        if self.idle_spans and self.idle_spans[-1][0] <= start <= self.idle_spans[-1][1]:
+            self.set_idle_span(len(self.idle_spans) - 1, (self.idle_spans[-1][0], max(end, self.idle_spans[-1][1])))
+            return
+        self.set_idle_span(len(self.idle_spans), (start, end))
+
+    def set_idle_span(self: Calendar, index: int, span: Optional[Tuple[datetime, datetime]]) -> None:
+        #index == len(idle_spans) appends; span None drops everything from index on, which only ever undoes an append
+        if self.journal is not None:
+            self.journal.add(Calendar.set_idle_span, self, index, self.idle_spans[index] if index < len(self.idle_spans) else None, span)
+        if span is None:
+            del self.idle_spans[index:]
+        elif index == len(self.idle_spans):
+            self.idle_spans.append(span)
+        else:
+            self.idle_spans[index] = span
+
+    def clear_idle(self: Calendar, start: datetime, end: datetime) -> None:
+        kept: List[Tuple[datetime, datetime]] = [(span_start, span_end) for span_start, span_end in self.idle_spans if span_end <= start or span_start >= end]
+        set_attribute(self.journal, self, "idle_spans", kept)
+
+    def is_idle(self: Calendar, time: datetime) -> bool:
+        return any(start <= time < end for start, end in self.idle_spans)
+
+
+class CalendarRange:
+    #a view over consecutive days of a calendar; nothing is copied until it is iterated
+    def __init__(self: CalendarRange, calendar: Calendar, start: date, length: int) -> None:
+        self.calendar: Calendar = calendar
+        self.start: date = start
+        self.length: int = max(length, 0)
+
+    def __len__(self: CalendarRange) -> int:
+        return self.length
+
+    def __iter__(self: CalendarRange) -> Iterator[Optional[ScheduleDate]]:
+        return self.calendar.iter_range(self.start, self.length)
+
+    def __getitem__(self: CalendarRange, index: int) -> Optional[ScheduleDate]:
+        if index < 0:
+            index += self.length
+        if index < 0 or index >= self.length:
+            raise IndexError(index)
+        return self.calendar.get(self.day_at(index))
+
+    def day_at(self: CalendarRange, index: int) -> date:
+        return self.start + timedelta(days=index)
+
+    def items(self: CalendarRange) -> Iterator[Tuple[date, Optional[ScheduleDate]]]:
+        return ((self.day_at(i), schedule_date) for i, schedule_date in enumerate(self))
+
+    def weeks(self: CalendarRange, days_in_week: int = 7) -> Iterator[CalendarRange]:
+        for offset in range(0, self.length, days_in_week):
+            yield CalendarRange(self.calendar, self.day_at(offset), min(days_in_week, self.length - offset))
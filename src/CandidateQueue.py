@@ -0,0 +1,90 @@
+from __future__ import annotations
+from typing import Dict, Optional, Tuple, Union, Type
+from datetime import datetime
+from Show import Show
+from Episode import Episode, NonEpisode
+from Stats import Stats
+from sortedcontainers import SortedList
+
+
+class CandidateQueue:
+    def __init__(self: CandidateQueue, stats: Optional[Stats] = None) -> None:
+        #entries are (last appearance, priority, show id, show) so the longest-unseen show sorts first,
+        #ties broken by priority and then by registration order, same as the greedy pass
+        self.entries: SortedList = SortedList()
+        self.keys: Dict[Show, Tuple[datetime, int, int, Show]] = {}
+        #show -> (head episode, slot it was checked at, earliest time it can air) for heads that were not yet available
+        self.waiting: Dict[Show, Tuple[Episode, datetime, Optional[datetime]]] = {}
+        self.stats: Optional[Stats] = stats
+
+    def __len__(self: CandidateQueue) -> int:
+        return len(self.entries)
+
+    def __contains__(self: CandidateQueue, show: Show) -> bool:
+        return show in self.keys
+
+    def add(self: CandidateQueue, show: Show, last_appearance: datetime) -> None:
+        if show in self.keys:
+            self.update(show, last_appearance)
+            return
+        entry: Tuple[datetime, int, int, Show] = (last_appearance, show.priority, show.show_id, show)
+        self.keys[show] = entry
+        self.entries.add(entry)
+
+    def update(self: CandidateQueue, show: Show, last_appearance: datetime) -> None:
+        old: Tuple[datetime, int, int, Show] = self.keys[show]
+        if old[0] == last_appearance:
+            return
+        self.entries.remove(old)
+        entry: Tuple[datetime, int, int, Show] = (last_appearance, old[1], old[2], show)
+        self.keys[show] = entry
+        self.entries.add(entry)
+
+    def remove(self: CandidateQueue, show: Show) -> None:
+        if show in self.keys:
+            self.entries.remove(self.keys.pop(show))
+        self.waiting.pop(show, None)
+
+    def is_waiting(self: CandidateQueue, show: Show, episode: Episode, slot: datetime) -> bool:
+        waiting: Optional[Tuple[Episode, datetime, Optional[datetime]]] = self.waiting.get(show)
+        if waiting is None or waiting[0] is not episode or slot < waiting[1]:
+            return False
+        return waiting[2] is None or slot < waiting[2]
+
+    def next_candidate(self: CandidateQueue, slot: datetime, stop_at_empty_show: bool = True) -> Optional[Tuple[Union[Episode, Type[NonEpisode]], Show]]:
+        examined: int = 0
+        #availability checks are counted here rather than in Episode, so each run's stats only see its own
+        checked: int = 0
+        for examined, entry in enumerate(self.entries, 1):
+            show: Show = entry[3]
+            if len(show.episodes) == 0:
+                if stop_at_empty_show:
+                    self.record(examined, checked)
+                    return (NonEpisode, show)
+                continue
+            episode: Episode = show.episodes[0]
+            if self.is_waiting(show, episode, slot):
+                continue
+            checked += 1
+            if episode.is_available(slot):
+                self.record(examined, checked)
+                return (episode, show)
+            self.waiting[show] = (episode, slot, episode.earliest_available(slot))
+        self.record(examined, checked)
+        return None
+
+    def record(self: CandidateQueue, examined: int, checked: int) -> None:
+        if self.stats is not None:
+            self.stats.count("candidate lookups")
+            self.stats.count("candidates examined", examined)
+            self.stats.count("availability checks", checked)
+
+    def next_event(self: CandidateQueue) -> Optional[datetime]:
+        #only meaningful right after next_candidate came back empty: every show with episodes left is then waiting
+        upcoming: Optional[datetime] = None
+        for show, waiting in self.waiting.items():
+            if waiting[2] is None or show not in self.keys or len(show.episodes) == 0 or show.episodes[0] is not waiting[0]:
+                continue
+            if upcoming is None or waiting[2] < upcoming:
+                upcoming = waiting[2]
+        return upcoming
@@ -0,0 +1,205 @@
+from __future__ import annotations
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from datetime import datetime, time
+import csv
+import json
+import re
+from Availability import Availability, ANYTIME, ALL_WEEKDAYS, weekday_mask
+from ConfigLoader import to_datetime, to_time, to_weekday
+from EpisodeQueue import EpisodeQueue
+from Show import Show
+
+#one episode per row, as CSV with a header or as JSON lines with the same keys:
+#  show      required
+#  episode   required label, e.g. 3 or "3+4" for a combined episode
+#  order     optional, defaults to the label's leading number
+#  air       optional release, 2025-09-17 or 2025-09-17T21:00
+#  weekdays  optional, "fri" or "sat|sun" (a list in JSON)
+#  between   optional time window, "12:00-15:00" (a pair in JSON)
+#  final     optional, marks the show's last episode like FinalizeLastEpisode
+#  color, priority  optional, taken from the first row of each show
+LEADING_NUMBER: re.Pattern = re.compile(r"\s*(\d+)")
+TRUE_VALUES: Set[str] = {"1", "true", "yes", "y", "x"}
+MAX_REPORTED_PROBLEMS: int = 100
+#what the row readers hand out per line: the row, or the error for a line that couldn't be read as one
+Row = Tuple[int, Union[Dict[str, Any], ValueError]]
+
+
+def optional_int(value: Any, default: int) -> int:
+    return default if value in (None, "") else int(value)
+
+
+class IngestReport:
+    def __init__(self: IngestReport) -> None:
+        self.rows: int = 0
+        self.episodes: int = 0
+        self.shows: int = 0
+        self.duplicates: int = 0
+        #duplicates whose release or constraints differ from the row that was kept
+        self.conflicts: int = 0
+        self.rejected: int = 0
+        #(line, message), only the first MAX_REPORTED_PROBLEMS
+        self.problems: List[Tuple[int, str]] = []
+
+    def problem(self: IngestReport, line: int, message: str) -> None:
+        if len(self.problems) < MAX_REPORTED_PROBLEMS:
+            self.problems.append((line, message))
+
+    def __str__(self: IngestReport) -> str:
+        lines: List[str] = [f"{self.rows} rows, {self.shows} shows, {self.episodes} episodes, "
+                            f"{self.duplicates} duplicates ({self.conflicts} conflicting), {self.rejected} rejected"]
+        lines += [f"line {line}: {message}" for line, message in self.problems]
+        return "\n".join(lines)
+
+
+class PendingShow:
+    __slots__ = ("show", "seen", "finalize")
+
+    def __init__(self: PendingShow, show: Show) -> None:
+        self.show: Show = show
+        #label -> (release, constraint) of the row that was kept, for spotting duplicates
+        self.seen: Dict[str, Tuple[Optional[datetime], Availability]] = {}
+        self.finalize: bool = False
+
+
+class CatalogIngester:
+    def __init__(self: CatalogIngester, strict: bool = False, grouped: bool = False) -> None:
+        #strict raises on the first bad row instead of skipping it
+        self.strict: bool = strict
+        #grouped feeds list each show's rows together, so a show is finished, and handed out, as soon as the next one starts;
+        #only the show being read is held, and a show whose rows are split up comes out once per run of rows
+        self.grouped: bool = grouped
+        self.report: IngestReport = IngestReport()
+        self.pending: Dict[str, PendingShow] = {}
+        #every distinct weekday / time window combination is built once and shared
+        self.constraints: Dict[Tuple[int, Optional[time], Optional[time]], Availability] = {(ALL_WEEKDAYS, None, None): ANYTIME}
+
+    def constraint(self: CatalogIngester, weekdays: int, start: Optional[time], end: Optional[time]) -> Availability:
+        key: Tuple[int, Optional[time], Optional[time]] = (weekdays, start, end)
+        if key not in self.constraints:
+            self.constraints[key] = Availability(None, weekdays, start, end)
+        return self.constraints[key]
+
+    def parse_weekdays(self: CatalogIngester, value: Any) -> int:
+        if value in (None, ""):
+            return ALL_WEEKDAYS
+        names: Iterable[Any] = value.split("|") if isinstance(value, str) else value
+        return weekday_mask(*(to_weekday(name) for name in names))
+
+    def parse_window(self: CatalogIngester, value: Any) -> Tuple[Optional[time], Optional[time]]:
+        if value in (None, ""):
+            return None, None
+        start, end = value.split("-") if isinstance(value, str) else value
+        return to_time(start.strip()) if start else None, to_time(end.strip()) if end else None
+
+    def parse_order(self: CatalogIngester, label: str, value: Any) -> int:
+        if value not in (None, ""):
+            return int(value)
+        number: Optional[re.Match] = LEADING_NUMBER.match(label)
+        if number is None:
+            raise ValueError(f"episode {label!r} needs an order")
+        return int(number.group(1))
+
+    def feed(self: CatalogIngester, row: Dict[str, Any], line: int = 0) -> Iterator[Show]:
+        #yields the shows this row finished, which is only ever the previous show of a grouped feed;
+        #nothing happens until it is iterated
+        self.report.rows += 1
+        try:
+            name: str = str(row.get("show") or "").strip()
+            label: str = str(row.get("episode") or "").strip()
+            if not name or not label:
+                raise ValueError("row needs a show and an episode")
+            order: int = self.parse_order(label, row.get("order"))
+            release: Optional[datetime] = to_datetime(row.get("air") or None)
+            start, end = self.parse_window(row.get("between"))
+            weekdays: int = self.parse_weekdays(row.get("weekdays"))
+            if end is not None and start is not None and end <= start:
+                raise ValueError(f"empty time window {row.get('between')!r}")
+            constraint: Availability = self.constraint(weekdays, start, end)
+            color: int = optional_int(row.get("color"), -1)
+            priority: int = optional_int(row.get("priority"), 0)
+        except (ValueError, TypeError) as error:
+            self.reject(line, error)
+            return
+        if self.grouped and name not in self.pending:
+            yield from self.finish()
+        pending: Optional[PendingShow] = self.pending.get(name)
+        if pending is None:
+            pending = self.pending[name] = PendingShow(Show(name, color, EpisodeQueue(name), priority))
+        kept: Optional[Tuple[Optional[datetime], Availability]] = pending.seen.get(label)
+        if kept is not None:
+            self.report.duplicates += 1
+            differences: List[str] = [what for what, differs in (("release", kept[0] != release), ("weekdays or time window", kept[1] != constraint)) if differs]
+            if differences:
+                self.report.conflicts += 1
+                self.report.problem(line, f"{name} {label} listed again with a different {' and '.join(differences)}; the first row is kept")
+            return
+        pending.seen[label] = (release, constraint)
+        queue: EpisodeQueue = pending.show.episodes
+        #feeds are almost always in episode order, which makes building the queue a plain append
+        if not queue.orders or order >= queue.orders[-1]:
+            queue.append_record(order, label, release, constraint)
+        else:
+            queue.add_record(order, label, release, constraint)
+        if str(row.get("final") or "").strip().lower() in TRUE_VALUES:
+            pending.finalize = True
+        self.report.episodes += 1
+
+    def reject(self: CatalogIngester, line: int, error: Exception) -> None:
+        if self.strict:
+            raise ValueError(f"line {line}: {error}") from error
+        self.report.rejected += 1
+        self.report.problem(line, str(error))
+
+    def finish(self: CatalogIngester) -> Iterator[Show]:
+        for pending in self.pending.values():
+            if pending.finalize:
+                pending.show.episodes.finalize_last()
+            self.report.shows += 1
+            yield pending.show
+        self.pending = {}
+
+    def ingest(self: CatalogIngester, rows: Iterable[Row]) -> Iterator[Show]:
+        for line, row in rows:
+            if isinstance(row, ValueError):
+                #a line that isn't a row at all is still counted as one, and rejected like any other bad row
+                self.report.rows += 1
+                self.reject(line, row)
+                continue
+            yield from self.feed(row, line)
+        yield from self.finish()
+
+
+def iter_csv_rows(source: IO[str]) -> Iterator[Row]:
+    reader: csv.DictReader = csv.DictReader(source)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def iter_jsonl_rows(source: IO[str]) -> Iterator[Row]:
+    #a bad line is handed on as its error rather than raised, since raising would end the generator and the rest of the file with it
+    for line, text in enumerate(source, 1):
+        if text.strip():
+            try:
+                row: Any = json.loads(text)
+            except ValueError as error:
+                yield line, ValueError(f"not valid json: {error}")
+                continue
+            yield line, row if isinstance(row, dict) else ValueError("expected a json object")
+
+
+def iter_catalog_rows(source: IO[str], path: str) -> Iterator[Row]:
+    return iter_jsonl_rows(source) if path.endswith((".jsonl", ".ndjson", ".json")) else iter_csv_rows(source)
+
+
+def iter_catalog(path: str, strict: bool = False, grouped: bool = False, ingester: Optional[CatalogIngester] = None) -> Iterator[Show]:
+    #shows as they are completed; pass an ingester to read its report afterwards
+    ingester = ingester if ingester is not None else CatalogIngester(strict, grouped)
+    with open(path, encoding="utf-8", newline="") as source:
+        yield from ingester.ingest(iter_catalog_rows(source, path))
+
+
+def load_catalog(path: str, strict: bool = False) -> Dict[str, Show]:
+    #not grouped, so every show is held until the end of the file; for a catalog too big for that, use
+    #iter_catalog(path, grouped=True), which keeps one show at a time but hands a show out again for each separate run of its rows
+    return {show.name: show for show in iter_catalog(path, strict)}
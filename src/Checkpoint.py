@@ -0,0 +1,101 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Set, Tuple
+from bisect import bisect_right
+from datetime import date, datetime
+from ScheduleDate import ScheduleDate
+from ShowSlot import ShowSlot
+from Show import Show
+from Episode import Episode
+from Stats import Stats
+
+
+class Checkpoint:
+    __slots__ = ("day", "fingerprint", "last_appearances", "exhausted_ids", "idle_until", "assignment_position", "created_position", "idle_position")
+
+    def __init__(
+            self: Checkpoint,
+            day: date,
+            fingerprint: Tuple,
+            last_appearances: Dict[Show, datetime],
+            exhausted_ids: Set[int],
+            idle_until: Optional[datetime],
+            assignment_position: int,
+            created_position: int,
+            idle_position: int) -> None:
+        #scheduler state as of the start of day, before any of its slots were filled
+        self.day: date = day
+        self.fingerprint: Tuple = fingerprint
+        self.last_appearances: Dict[Show, datetime] = last_appearances
+        self.exhausted_ids: Set[int] = exhausted_ids
+        self.idle_until: Optional[datetime] = idle_until
+        #how far into the run's logs the generation had got
+        self.assignment_position: int = assignment_position
+        self.created_position: int = created_position
+        self.idle_position: int = idle_position
+
+
+class GenerationRun:
+    def __init__(
+            self: GenerationRun,
+            start: date,
+            stop_at_first_empty_show: bool = True,
+            end: Optional[date] = None,
+            event_driven: bool = False) -> None:
+        self.start: date = start
+        self.stop_at_first_empty_show: bool = stop_at_first_empty_show
+        self.end: Optional[date] = end
+        self.event_driven: bool = event_driven
+        self.stop: Optional[date] = None
+        self.checkpoints: Dict[date, Checkpoint] = {}
+        self.checkpoint_days: List[date] = []
+        #everything the run wrote, in order, so it can be rewound to or replayed from any checkpoint
+        self.assignments: List[Tuple[ShowSlot, Episode]] = []
+        self.created_days: List[Tuple[date, ScheduleDate]] = []
+        self.idle_spans: List[Tuple[datetime, datetime]] = []
+        #counters and timers for this run, when the schedule has instrumentation enabled
+        self.stats: Optional[Stats] = None
+
+    def add_checkpoint(self: GenerationRun, checkpoint: Checkpoint) -> None:
+        self.checkpoints[checkpoint.day] = checkpoint
+        self.checkpoint_days.append(checkpoint.day)
+
+    def checkpoint_before(self: GenerationRun, day: date) -> Optional[Checkpoint]:
+        index: int = bisect_right(self.checkpoint_days, day)
+        if index == 0:
+            return None
+        return self.checkpoints[self.checkpoint_days[index - 1]]
+
+    def resume_from(self: GenerationRun, checkpoint: Checkpoint) -> GenerationRun:
+        #a new run sharing this run's history up to, but not including, checkpoint.day
+        resumed: GenerationRun = GenerationRun(self.start, self.stop_at_first_empty_show, self.end, self.event_driven)
+        for day in self.checkpoint_days:
+            if day >= checkpoint.day:
+                break
+            resumed.add_checkpoint(self.checkpoints[day])
+        resumed.assignments = self.assignments[:checkpoint.assignment_position]
+        resumed.created_days = self.created_days[:checkpoint.created_position]
+        resumed.idle_spans = self.idle_spans[:checkpoint.idle_position]
+        return resumed
+
+    def trimmed(self: GenerationRun, day: date) -> GenerationRun:
+        #a copy that can't be rewound to before day, without the log entries only the dropped checkpoints needed
+        kept: List[date] = [checkpoint_day for checkpoint_day in self.checkpoint_days if checkpoint_day >= day]
+        if len(kept) == len(self.checkpoint_days):
+            return self
+        first: Optional[Checkpoint] = self.checkpoints[kept[0]] if kept else None
+        assignment_position: int = first.assignment_position if first else len(self.assignments)
+        created_position: int = first.created_position if first else len(self.created_days)
+        idle_position: int = first.idle_position if first else len(self.idle_spans)
+        trimmed: GenerationRun = GenerationRun(self.start, self.stop_at_first_empty_show, self.end, self.event_driven)
+        trimmed.stop = self.stop
+        trimmed.stats = self.stats
+        for checkpoint_day in kept:
+            old: Checkpoint = self.checkpoints[checkpoint_day]
+            trimmed.add_checkpoint(Checkpoint(checkpoint_day, old.fingerprint, old.last_appearances, old.exhausted_ids, old.idle_until,
+                                              old.assignment_position - assignment_position,
+                                              old.created_position - created_position,
+                                              old.idle_position - idle_position))
+        trimmed.assignments = self.assignments[assignment_position:]
+        trimmed.created_days = self.created_days[created_position:]
+        trimmed.idle_spans = self.idle_spans[idle_position:]
+        return trimmed
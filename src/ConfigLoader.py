@@ -0,0 +1,255 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from datetime import date, datetime, time
+import hashlib
+import json
+import os
+import struct
+import tomllib
+from Episode import EpisodeBuilder
+from Schedule import Schedule, ScheduleBuilder
+from ScheduleDate import ScheduleDateBuilder
+from SlotTemplate import SlotTemplate
+from Show import Show, ShowBuilder
+from Snapshot import snapshot_bytes, load_schedule_bytes
+
+#a config file (TOML or JSON) looks like:
+#
+#  [[shows]]
+#  name = "Gen V S2"
+#  color = 6                      #optional
+#  priority = 12                  #optional, defaults to position in the file like build_show_pool
+#  finalize = true                #mark the last explicitly listed episode, like FinalizeLastEpisode
+#  episodes = [
+#      { number = 1, available_on = 2025-09-17 },
+#      { label = "3+4", order = 3, weekdays = ["fri"], between = ["12:00", "15:00"] },
+#      { numbered = { last = 10, first = 2, available_on = 2025-09-01 } },
+#      { weekly = { start = 2025-09-24T21:00:00, last = 8, first = 4 } },
+#  ]
+#
+#  [[special_dates]]
+#  date = 2025-08-24
+#  slots = ["lunch", "dinner", "21:00"]
+#  notes = ["start AppleTV+ trial on prime"]
+#
+#  [[slot_templates]]             #slot times of ordinary days; without start it replaces the default
+#  start = 2025-12-20             #optional
+#  end = 2026-01-04               #optional, open ended without it
+#  slots = { daily = ["dinner"], sat = ["lunch", "dinner"], sun = ["lunch", "dinner", "21:00"] }
+
+#bump whenever the compiled objects change shape so stale caches are ignored
+CACHE_VERSION: int = 3
+#compiled configs are cached as two snapshots, the show pool and the schedule, each behind its length;
+#snapshots are plain data, so a cache file someone else wrote can at worst fail to load
+CACHE_PART: struct.Struct = struct.Struct("<Q")
+WEEKDAY_NAMES: Dict[str, int] = {"mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6}
+
+
+def parse_config(raw: bytes, path: str) -> Dict[str, Any]:
+    if path.endswith(".json"):
+        return json.loads(raw)
+    return tomllib.loads(raw.decode("utf-8"))
+
+
+def to_datetime(value: Union[str, date, datetime, None]) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value
+    return datetime.combine(value, time.min)
+
+
+def to_date(value: Union[str, date, datetime]) -> date:
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def to_time(value: Union[str, time]) -> time:
+    if isinstance(value, str):
+        return time.fromisoformat(value)
+    return value
+
+
+def to_weekday(value: Union[str, int]) -> int:
+    if isinstance(value, int):
+        return value
+    key: str = value.strip().lower()[:3]
+    if key not in WEEKDAY_NAMES:
+        raise ValueError(f"unknown weekday {value!r}")
+    return WEEKDAY_NAMES[key]
+
+
+def to_slot_time(value: Union[str, time]) -> time:
+    if value == "lunch":
+        return time(12)
+    if value == "dinner":
+        return time(18)
+    return to_time(value)
+
+
+def episode_config(entry: Dict[str, Any]) -> Callable[[EpisodeBuilder], EpisodeBuilder]:
+    def configure(builder: EpisodeBuilder) -> EpisodeBuilder:
+        if "label" in entry:
+            builder.EpisodeLabel(str(entry["label"]), int(entry.get("order", -1)))
+        elif "number" in entry:
+            builder.EpisodeNumber(int(entry["number"]))
+        else:
+            raise ValueError(f"episode needs a label or a number: {entry!r}")
+        builder.AvailableAt(to_datetime(entry.get("available_on")))
+        if "weekdays" in entry:
+            builder.OnWeekdays(*(to_weekday(weekday) for weekday in entry["weekdays"]))
+        if "between" in entry:
+            start, end = entry["between"]
+            builder.BetweenTimes(to_time(start), to_time(end))
+        return builder
+    return configure
+
+
+def build_show(entry: Dict[str, Any], default_priority: int) -> Show:
+    if "name" not in entry:
+        raise ValueError(f"show needs a name: {entry!r}")
+    builder: ShowBuilder = ShowBuilder(name=str(entry["name"]))
+    builder.WithPriority(int(entry.get("priority", default_priority)))
+    if "color" in entry:
+        builder.WithColor(int(entry["color"]))
+    for episodes in entry.get("episodes", []):
+        if "numbered" in episodes:
+            run: Dict[str, Any] = episodes["numbered"]
+            builder.WithEpisodes(int(run["last"]), int(run.get("first", 1)), to_datetime(run.get("available_on")))
+        elif "weekly" in episodes:
+            run = episodes["weekly"]
+            start: Optional[datetime] = to_datetime(run.get("start"))
+            if start is None:
+                raise ValueError(f"weekly episodes need a start: {run!r}")
+            builder.WithWeeklyEpisodes(start, int(run["last"]), int(run.get("first", 1)))
+        else:
+            builder.WithEpisode(episode_config(episodes))
+    if entry.get("finalize", False):
+        builder.FinalizeLastEpisode()
+    return builder.show
+
+
+def build_special_date(entry: Dict[str, Any]) -> Callable[[ScheduleDateBuilder], ScheduleDateBuilder]:
+    def configure(builder: ScheduleDateBuilder) -> ScheduleDateBuilder:
+        builder.SpecialDate(to_date(entry["date"]))
+        for slot in entry.get("slots", []):
+            if slot == "lunch":
+                builder.WithLunchSlot()
+            elif slot == "dinner":
+                builder.WithDinnerSlot()
+            else:
+                builder.WithSlot(to_time(slot))
+        for note in entry.get("notes", []):
+            builder.WithNote(str(note))
+        return builder
+    return configure
+
+
+def build_slot_template(entry: Dict[str, Any]) -> SlotTemplate:
+    #"daily" applies to every weekday not given its own list
+    slots: Dict[str, Any] = entry.get("slots", {})
+    daily: List[time] = [to_slot_time(value) for value in slots.get("daily", [])]
+    times: Dict[int, List[time]] = {weekday: daily for weekday in range(7)}
+    for name, values in slots.items():
+        if name != "daily":
+            times[to_weekday(name)] = [to_slot_time(value) for value in values]
+    return SlotTemplate(times)
+
+
+def compile_config(config: Dict[str, Any]) -> Tuple[Dict[str, Show], Schedule]:
+    pool: Dict[str, Show] = {}
+    for entry in config.get("shows", []):
+        show: Show = build_show(entry, len(pool) + 1)
+        if show.name in pool:
+            raise ValueError(f"show {show.name!r} is defined twice")
+        pool[show.name] = show
+    builder: ScheduleBuilder = ScheduleBuilder()
+    for entry in config.get("special_dates", []):
+        builder.RegisterSpecialDate(build_special_date(entry))
+    for entry in config.get("slot_templates", []):
+        builder.WithSlotTemplate(build_slot_template(entry), to_date(entry["start"]) if "start" in entry else None,
+                                 to_date(entry["end"]) if "end" in entry else None)
+    return pool, builder.schedule
+
+
+def default_cache_dir() -> str:
+    #per user rather than next to a config many people can write to
+    base: str = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "show_scheduling")
+
+
+def cache_path(raw: bytes, cache_dir: Optional[str]) -> str:
+    digest: str = hashlib.sha256(raw + f"\0{CACHE_VERSION}".encode()).hexdigest()
+    return os.path.join(cache_dir if cache_dir else default_cache_dir(), f"{digest}.snapshot")
+
+
+def unregistered_copy(show: Show) -> Show:
+    return Show(show.name, show.color, show.episodes.copy(), show.priority)
+
+
+def encode_compiled(pool: Dict[str, Show], schedule: Schedule) -> bytes:
+    #pool shows are written through a schedule of their own, as copies so the caller's shows stay unregistered;
+    #their ids keep the pool's order
+    pool_schedule: Schedule = Schedule(shows=[unregistered_copy(show) for show in pool.values()])
+    parts: List[bytes] = [snapshot_bytes(pool_schedule), snapshot_bytes(schedule)]
+    return b"".join(CACHE_PART.pack(len(part)) + part for part in parts)
+
+
+def decode_compiled(raw: bytes) -> Tuple[Dict[str, Show], Schedule]:
+    parts: List[bytes] = []
+    offset: int = 0
+    while offset < len(raw):
+        length: int = CACHE_PART.unpack_from(raw, offset)[0]
+        offset += CACHE_PART.size
+        parts.append(raw[offset:offset + length])
+        offset += length
+    if len(parts) != 2 or offset != len(raw):
+        raise ValueError("truncated config cache")
+    pool_schedule: Schedule = load_schedule_bytes(parts[0])
+    #handed out unregistered, the same as a freshly compiled pool
+    pool: Dict[str, Show] = {show.name: unregistered_copy(show) for show in sorted(pool_schedule.shows.all(), key=lambda show: show.show_id)}
+    #a compiled config has no calendar yet, so only the tables a config sets are carried over to a plain schedule
+    loaded: Schedule = load_schedule_bytes(parts[1])
+    schedule: Schedule = Schedule()
+    for special_date in loaded.special_dates.values():
+        schedule.set_special_date(special_date)
+    schedule.slot_templates = loaded.slot_templates
+    return pool, schedule
+
+
+def load_config(path: str, cache_dir: Optional[str] = None, use_cache: bool = True) -> Tuple[Dict[str, Show], Schedule]:
+    with open(path, "rb") as source:
+        raw: bytes = source.read()
+    cached: str = cache_path(raw, cache_dir)
+    if use_cache and os.path.exists(cached):
+        try:
+            with open(cached, "rb") as source:
+                return decode_compiled(source.read())
+        except Exception:
+            #whatever is wrong with a cache file, compiling the config again fixes it
+            pass
+    compiled: Tuple[Dict[str, Show], Schedule] = compile_config(parse_config(raw, path))
+    if use_cache:
+        try:
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            #write then rename so a concurrent startup never reads a half written cache
+            partial: str = f"{cached}.{os.getpid()}.tmp"
+            with open(partial, "wb") as sink:
+                sink.write(encode_compiled(*compiled))
+            os.replace(partial, cached)
+        except OSError:
+            pass
+    return compiled
+
+
+def load_show_pool(path: str, cache_dir: Optional[str] = None) -> Dict[str, Show]:
+    return load_config(path, cache_dir)[0]
+
+
+def load_schedule_dates(path: str, cache_dir: Optional[str] = None) -> Schedule:
+    return load_config(path, cache_dir)[1]
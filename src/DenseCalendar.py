@@ -0,0 +1,62 @@
+from __future__ import annotations
+from typing import Iterator, List, Optional
+from itertools import repeat, chain
+from datetime import date
+from ScheduleDate import ScheduleDate
+from Calendar import Calendar
+
+
+class DenseCalendar(Calendar):
+    def init_storage(self: DenseCalendar) -> None:
+        #days live in a list indexed by date.toordinal() - base, None for days never stored
+        self.base: int = 0
+        self.days: List[Optional[ScheduleDate]] = []
+        self.stored: int = 0
+
+    def __len__(self: DenseCalendar) -> int:
+        return self.stored
+
+    def get(self: DenseCalendar, day: date) -> Optional[ScheduleDate]:
+        index: int = day.toordinal() - self.base
+        if 0 <= index < len(self.days):
+            return self.days[index]
+        return None
+
+    def put(self: DenseCalendar, day: date, schedule_date: ScheduleDate) -> None:
+        index: int = self.grow_to(day.toordinal())
+        if self.days[index] is None:
+            self.stored += 1
+        self.days[index] = schedule_date
+
+    def discard(self: DenseCalendar, day: date) -> None:
+        index: int = day.toordinal() - self.base
+        if 0 <= index < len(self.days) and self.days[index] is not None:
+            self.days[index] = None
+            self.stored -= 1
+
+    def grow_to(self: DenseCalendar, ordinal: int) -> int:
+        if not self.days:
+            self.base = ordinal
+            self.days.append(None)
+            return 0
+        index: int = ordinal - self.base
+        #grow by at least the current size so repeated growth at either end stays amortized constant
+        if index < 0:
+            extra: int = max(-index, len(self.days))
+            self.days[0:0] = [None] * extra
+            self.base -= extra
+            index += extra
+        elif index >= len(self.days):
+            self.days.extend([None] * max(index - len(self.days) + 1, len(self.days)))
+        return index
+
+    def iter_range(self: DenseCalendar, start: date, length: int) -> Iterator[Optional[ScheduleDate]]:
+        first: int = start.toordinal() - self.base
+        last: int = first + length
+        inside_start: int = min(max(first, 0), len(self.days))
+        inside_end: int = min(max(last, 0), len(self.days))
+        before: int = min(max(-first, 0), length)
+        after: int = length - before - (inside_end - inside_start)
+        #a slice, so a range costs its own length rather than its distance from the first stored day
+        return chain(repeat(None, before), self.days[inside_start:inside_end], repeat(None, after))
+
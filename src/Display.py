@@ -1,10 +1,17 @@
 from __future__ import annotations
-from typing import List, Optional, Set, Iterable, Dict, cast
+from typing import List, Optional, Set, Iterable, Iterator, Dict, TextIO, Tuple, cast
+from collections import Counter
 from datetime import date, timedelta
+from itertools import chain, zip_longest
+from weakref import WeakKeyDictionary
+import io
+from Calendar import Calendar, CalendarRange
+from RollingCalendar import RollingCalendar
 from ScheduleDate import ScheduleDate
 from Schedule import Schedule
 from Show import Show
 from Episode import Episode
+from Stats import Stats, timed
 
 
 MAX_PRINT_DAY_ROWS: int = 5
@@ -37,67 +44,217 @@ class PrintWeek:
             pretty[row] = " | ".join(week)
         return "\n".join(pretty)
 
-    def to_csv(self: PrintWeek, separator: str = ",") -> str:
-        csv: List[str] = [""] * MAX_PRINT_DAY_ROWS
+    def csv_rows(self: PrintWeek, separator: str = ",") -> Iterator[str]:
         for row in range(0, MAX_PRINT_DAY_ROWS):
-            csv[row] = separator.join(day.rows[row] for day in self.days)
-        return "\n".join(csv)
-
+            yield separator.join(day.rows[row] for day in self.days)
 
-def to_print_weeks(schedule: Schedule) -> List[PrintWeek]:
-    print_weeks: List[PrintWeek] = []
-    curr_week: PrintWeek = PrintWeek()
+    def to_csv(self: PrintWeek, separator: str = ",") -> str:
+        return "\n".join(self.csv_rows(separator))
+
+
+def to_print_day(day: date, schedule_date: Optional[ScheduleDate]) -> PrintDay:
+    print_day: PrintDay = PrintDay(day)
+    if schedule_date is not None:
+        for i, slot in enumerate((slot for slot in schedule_date.slots)):
+            if slot.episode:
+                print_day.rows[i + 1] = slot.episode.display_name()
+        if schedule_date.special_notes:
+            print_day.rows[4] = "; ".join(schedule_date.special_notes)
+    return print_day
+
+
+class RenderCache:
+    def __init__(self: RenderCache, calendar: Calendar) -> None:
+        self.calendar: Calendar = calendar
+        #sunday -> (calendar week version, rendered week, width of each of its days), one entry for every week in range;
+        #renders walk every week in order, so anything smaller than the whole range would be evicted before it came round again
+        self.weeks: Dict[date, Tuple[int, PrintWeek, List[int]]] = {}
+        #per column, day width -> how many weeks have a day that wide, so the maxima follow single week changes
+        self.widths: List[Counter] = [Counter() for _ in range(DAYS_IN_WEEK)]
+        #labels can change in place on episodes already in the calendar, which no week version sees
+        self.label_version: int = Episode.label_version
+        self.start: Optional[date] = None
+        self.end: Optional[date] = None
+
+    def keep_range(self: RenderCache, start: date, end: date) -> None:
+        if self.label_version != Episode.label_version:
+            self.label_version = Episode.label_version
+            self.start, self.end = None, None
+            self.weeks.clear()
+            self.widths = [Counter() for _ in range(DAYS_IN_WEEK)]
+        if (start, end) == (self.start, self.end):
+            return
+        for sunday in [sunday for sunday in self.weeks if sunday < start or sunday > end]:
+            self.forget(sunday)
+        self.start, self.end = start, end
+
+    def forget(self: RenderCache, sunday: date) -> None:
+        for column, width in enumerate(self.weeks.pop(sunday)[2]):
+            self.widths[column][width] -= 1
+            if self.widths[column][width] <= 0:
+                del self.widths[column][width]
+
+    def is_current(self: RenderCache, sunday: date) -> bool:
+        known: Optional[Tuple[int, PrintWeek, List[int]]] = self.weeks.get(sunday)
+        return known is not None and known[0] == self.calendar.week_version(sunday)
+
+    def week(self: RenderCache, days: CalendarRange, stats: Optional[Stats]) -> PrintWeek:
+        version: int = self.calendar.week_version(days.start)
+        cached: Optional[Tuple[int, PrintWeek, List[int]]] = self.weeks.get(days.start)
+        if cached and cached[0] == version:
+            if stats is not None:
+                stats.count("display weeks reused")
+            return cached[1]
+        if stats is not None:
+            stats.count("display weeks")
+        print_week: PrintWeek = PrintWeek([to_print_day(day, schedule_date) for day, schedule_date in days.items()])
+        if cached:
+            self.forget(days.start)
+        week_widths: List[int] = [print_day.max_length() for print_day in print_week.days]
+        self.weeks[days.start] = (version, print_week, week_widths)
+        for column, width in enumerate(week_widths):
+            self.widths[column][width] += 1
+        return print_week
+
+    def column_widths(self: RenderCache) -> List[int]:
+        return [max(widths) if widths else 0 for widths in self.widths]
+
+
+#rendered weeks per calendar, dropped along with the calendar
+RENDER_CACHES: WeakKeyDictionary = WeakKeyDictionary()
+
+
+def render_cache(calendar: Calendar) -> RenderCache:
+    cache: Optional[RenderCache] = RENDER_CACHES.get(calendar)
+    if cache is None:
+        cache = RENDER_CACHES[calendar] = RenderCache(calendar)
+    return cache
+
+
+def iter_archived_print_weeks(schedule: Schedule) -> Iterator[PrintWeek]:
+    #frozen weeks of a rolling calendar, read back from its archive one week at a time and never cached,
+    #then any empty weeks between them and the first live day
+    calendar: Calendar = schedule.schedule
+    if not isinstance(calendar, RollingCalendar) or not len(calendar.archive) or calendar.frozen_through is None:
+        return
+    sundays: List[date] = calendar.archive.sundays()
+    sunday: date = sundays[0]
+    #frozen weeks after the last archived one had nothing in them, and past the last scheduled day they aren't shown
+    while sunday <= sundays[-1]:
+        yield PrintWeek([to_print_day(sunday + timedelta(days=i), schedule_date) for i, schedule_date in enumerate(calendar.archive.week_days(sunday))])
+        sunday += timedelta(days=DAYS_IN_WEEK)
+    live: Optional[date] = calendar.earliest_sunday()
+    if live is not None and live > sunday:
+        for week in calendar.range(sunday, live - timedelta(days=1)).weeks(DAYS_IN_WEEK):
+            yield PrintWeek([to_print_day(day, schedule_date) for day, schedule_date in week.items()])
+
+
+def iter_print_weeks(schedule: Schedule, archived: bool = False) -> Iterator[PrintWeek]:
+    if archived:
+        yield from iter_archived_print_weeks(schedule)
+    if schedule.schedule.earliest_date is None:
+        return
+    #weeks whose calendar version has not moved since they were last rendered come straight from the cache
     start: date = cast(date, schedule.schedule.earliest_sunday())
     end: date = cast(date, schedule.schedule.latest_saturday())
-    for day in (start + timedelta(days=i) for i in range((end - start).days + 1)):
-        if len(curr_week.days) == DAYS_IN_WEEK:
-            print_weeks.append(curr_week)
-            curr_week = PrintWeek()
-        print_day: PrintDay = PrintDay(day)
-        if day in schedule.schedule:
-            schedule_date: ScheduleDate = schedule.schedule[day]
-            for i, slot in enumerate((slot for slot in schedule_date.slots)):
-                if slot.episode:
-                    print_day.rows[i + 1] = slot.episode.display_name()
-            if schedule_date.special_notes:
-                print_day.rows[4] = "; ".join(schedule_date.special_notes)
-        curr_week.days.append(print_day)
-
-    print_weeks.append(curr_week)
-    return print_weeks
+    cache: RenderCache = render_cache(schedule.schedule)
+    cache.keep_range(start, end)
+    for week in schedule.schedule.range(start, end).weeks(DAYS_IN_WEEK):
+        yield cache.week(week, schedule.stats)
+
+
+def to_print_weeks(schedule: Schedule) -> List[PrintWeek]:
+    return list(iter_print_weeks(schedule))
+
+
+def column_widths(schedule: Schedule, archived: bool = False) -> List[int]:
+    #only weeks that changed since they were last rendered are rendered again, and the write pass then finds them in the cache
+    widths: List[int] = [0] * DAYS_IN_WEEK
+    calendar: Calendar = schedule.schedule
+    if calendar.earliest_date is not None:
+        start: date = cast(date, calendar.earliest_sunday())
+        cache: RenderCache = render_cache(calendar)
+        cache.keep_range(start, cast(date, calendar.latest_saturday()))
+        for days in calendar.range(start, cast(date, calendar.latest_saturday())).weeks(DAYS_IN_WEEK):
+            if not cache.is_current(days.start):
+                cache.week(days, schedule.stats)
+        widths = cache.column_widths()
+    if archived:
+        for week in iter_archived_print_weeks(schedule):
+            widths = [max(width, print_day.max_length()) for width, print_day in zip(widths, week.days)]
+    return widths
+
+
+def format_table(rows: List[List[str]]) -> str:
+    #the first row is the header; every column is padded to its widest cell
+    widths: List[int] = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    return "\n".join(" | ".join(cell.ljust(widths[column]) for column, cell in enumerate(row)) for row in rows)
+
+
+def write_rows(sink: TextIO, rows: Iterable[str]) -> None:
+    first: bool = True
+    for row in rows:
+        if not first:
+            sink.write("\n")
+        sink.write(row)
+        first = False
+
+
+def write_schedule(schedule: Schedule, sink: TextIO, archived: bool = False) -> None:
+    #archived also writes the frozen weeks of a rolling calendar, read back from its archive
+    with timed(schedule.stats, "display widths"):
+        max_col_widths: List[int] = column_widths(schedule, archived)
+    length: int = sum(max_col_widths) + len(" | ") * (DAYS_IN_WEEK - 1)
+    spacer: str = "\n" + "-" * length + "\n"
+    with timed(schedule.stats, "display render"):
+        for i, week in enumerate(iter_print_weeks(schedule, archived)):
+            if i:
+                sink.write(spacer)
+            sink.write(week.to_string(max_col_widths))
 
 
 def schedule_to_string(schedule: Schedule) -> str:
-    print_weeks: List[PrintWeek] = to_print_weeks(schedule)
-    max_col_widths: List[int] = [0] * 7
-    for day in range(0, DAYS_IN_WEEK):
-        max_col_widths[day] = max(week.days[day].max_length() for week in print_weeks)
+    pretty: io.StringIO = io.StringIO()
+    write_schedule(schedule, pretty)
+    return pretty.getvalue()
 
-    pretty: List[str] = list(week.to_string(max_col_widths) for week in print_weeks)
-    length: int = pretty[0].index('\n')
-    spacer: str = "\n" + "-" * length + "\n"
-    return spacer.join(pretty)
+
+def iter_csv_rows(schedule: Schedule, separator: str = ",", archived: bool = False) -> Iterator[str]:
+    for week in iter_print_weeks(schedule, archived):
+        yield from week.csv_rows(separator)
+
+
+def write_csv(schedule: Schedule, sink: TextIO, separator: str = ",", archived: bool = False) -> None:
+    with timed(schedule.stats, "display csv"):
+        write_rows(sink, iter_csv_rows(schedule, separator, archived))
 
 
 def schedule_to_csv(schedule: Schedule, separator: str = ",") -> str:
-    print_weeks: List[PrintWeek] = to_print_weeks(schedule)
-    pretty: List[str] = [week.to_csv(separator) for week in print_weeks]
-    return "\n".join(pretty)
+    pretty: io.StringIO = io.StringIO()
+    write_csv(schedule, pretty, separator)
+    return pretty.getvalue()
 
 
 def schedule_to_tab_delimited(schedule: Schedule) -> str:
     return schedule_to_csv(schedule, "\t")
 
 
-def schedule_episode_pool(schedule: Schedule) -> str:
-    pretty: str = ""
+def iter_episode_pool_rows(schedule: Schedule) -> Iterator[str]:
+    #a show with nothing left still takes up one empty row
     show: Show
-    episodes_list: List[str] = []
+    any_shows: bool = False
     for show in schedule.shows:
-        episode: Episode
-        episodes_list.append("\n".join(episode.display_name() for episode in show.episodes))
+        any_shows = True
+        if len(show.episodes) == 0:
+            yield ""
+        for episode in show.episodes:
+            yield episode.display_name()
+    if not any_shows:
+        yield ""
 
-    return "\n".join(episodes_list)
+
+def schedule_episode_pool(schedule: Schedule) -> str:
+    return "\n".join(iter_episode_pool_rows(schedule))
 
 
 def order_shows_by_color(shows: Iterable[Show]) -> List[str]:
@@ -123,12 +280,10 @@ def order_shows_by_color(shows: Iterable[Show]) -> List[str]:
     return show_names
 
 
-def schedule_paste_format(schedule: Schedule, pending_shows: Iterable[Show]) -> str:
-    weeks_display: List[str] = schedule_to_csv(schedule).split("\n")
-    remaining_episodes_display: List[str] = schedule_episode_pool(schedule).split("\n")
-    pending_episodes: List[str] = [ep.display_name() for show in pending_shows for ep in show.episodes]
-    remaining_episodes_display += pending_episodes
-    shows_set: Set[Show] = set(schedule.shows + schedule.empty_shows)
+def iter_paste_rows(schedule: Schedule, pending_shows: Iterable[Show]) -> Iterator[str]:
+    pending_episodes: Iterator[str] = (ep.display_name() for show in pending_shows for ep in show.episodes)
+    remaining_episodes_display: Iterator[str] = chain(iter_episode_pool_rows(schedule), pending_episodes)
+    shows_set: Set[Show] = set(schedule.shows.all())
     shows_display: List[str] = order_shows_by_color(shows_set)
 
     max_shows: int = 16
@@ -136,21 +291,26 @@ def schedule_paste_format(schedule: Schedule, pending_shows: Iterable[Show]) ->
         for i in range(len(shows_display), max_shows):
             shows_display.append("." * i)
 
-    longest_list = max((len(weeks_display), len(shows_display), len(remaining_episodes_display)))
+    #the three columns are walked side by side; a column that runs out first is padded
+    empty_week_row: str = "," * (DAYS_IN_WEEK - 1)
+    for week_row, episode_row, show_row in zip_longest(iter_csv_rows(schedule), remaining_episodes_display, shows_display):
+        formatted: str = week_row if week_row is not None else empty_week_row
+        if episode_row is not None:
+            formatted += ",," + episode_row
+        elif show_row is not None:
+            formatted += ",,"
 
-    formatted: List[str] = [""] * longest_list
-    for i in range(0, longest_list):
-        if i < len(weeks_display):
-            formatted[i] += weeks_display[i]
-        else:
-            formatted[i] += "," * weeks_display[0].count(",")
+        if show_row is not None:
+            formatted += ",," + show_row
+        yield formatted
 
-        if i < len(remaining_episodes_display):
-            formatted[i] += ",," + remaining_episodes_display[i]
-        elif i < len(shows_display):
-            formatted[i] += ",,"
 
-        if i < len(shows_display):
-            formatted[i] += ",," + shows_display[i]
+def write_paste_format(schedule: Schedule, pending_shows: Iterable[Show], sink: TextIO) -> None:
+    with timed(schedule.stats, "display paste"):
+        write_rows(sink, iter_paste_rows(schedule, pending_shows))
 
-    return "\n".join(formatted)
\ No newline at end of file
+
+def schedule_paste_format(schedule: Schedule, pending_shows: Iterable[Show]) -> str:
+    formatted: io.StringIO = io.StringIO()
+    write_paste_format(schedule, pending_shows, formatted)
+    return formatted.getvalue()
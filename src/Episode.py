@@ -1,20 +1,30 @@
 from __future__ import annotations
-from typing import Callable, List, Optional, Union
-from datetime import datetime
+from typing import ClassVar, Optional, Union
+from datetime import datetime, time
+from Availability import Availability, ANYTIME, FRIDAY, SATURDAY, weekday_mask
 
 class Episode:
+    __slots__ = ("show_name", "episode_label", "episode_order", "availability")
+    #bumped whenever any episode's label changes in place, so cached renders of the calendar know to start over
+    label_version: ClassVar[int] = 0
+
     def __init__(
             self: Episode,
             show_name: str,
             label: str,
             order: int = -1,
             release_date: Optional[datetime] = None,
-            filters: Optional[List[Callable[[Episode, datetime], bool]]] = None) -> None:
+            availability: Optional[Availability] = None) -> None:
         self.show_name: str = show_name
         self.episode_label: str = label
         self.episode_order: int = int(label) if label.isdigit() else order
-        self.release_date: Optional[datetime] = release_date
-        self.availability_filters: List[Callable[[Episode, datetime], bool]] = filters if filters else [lambda ep, slot: True]
+        self.availability: Availability = availability if availability else ANYTIME
+        if release_date:
+            self.availability = self.availability.with_release(release_date)
+
+    @property
+    def release_date(self: Episode) -> Optional[datetime]:
+        return self.availability.not_before
 
     def display_name(self: Episode) -> str:
         display: str = f"{self.show_name} {self.episode_label}"
@@ -23,16 +33,19 @@ class Episode:
         return display
 
     def is_available(self: Episode, slot: datetime) -> bool:
-        for filter in self.availability_filters:
-            if not filter(self, slot):
-                return False
-        return True
+        return self.availability.is_available(slot)
+
+    def earliest_available(self: Episode, after: datetime) -> Optional[datetime]:
+        return self.availability.earliest(after)
 
     def make_last(self: Episode):
         self.episode_label = f"({self.episode_label})"
+        Episode.label_version += 1
 
 
 class NonEpisode(Episode):
+    __slots__ = ()
+
     def __init__(
             self:NonEpisode,
             show_name: str) -> None:
@@ -59,14 +72,21 @@ class EpisodeBuilder:
     
     def AvailableAt(self: EpisodeBuilder, release: Union[datetime, None]) -> EpisodeBuilder:
         if release:
-            self.episode.release_date = release
-            self.episode.availability_filters.append(lambda ep, slot: ep.release_date <= slot if ep.release_date else True)
+            self.episode.availability = self.episode.availability.with_release(release)
         return self
-    
+
+    def OnWeekdays(self: EpisodeBuilder, *weekdays: int) -> EpisodeBuilder:
+        self.episode.availability = self.episode.availability.with_weekdays(weekday_mask(*weekdays))
+        return self
+
     def OnFridays(self: EpisodeBuilder) -> EpisodeBuilder:
-        self.episode.availability_filters.append(lambda _, slot: slot.weekday() == 4)
+        self.episode.availability = self.episode.availability.with_weekdays(FRIDAY)
         return self
 
     def OnSaturdays(self: EpisodeBuilder) -> EpisodeBuilder:
-        self.episode.availability_filters.append(lambda _, slot: slot.weekday() == 5)
+        self.episode.availability = self.episode.availability.with_weekdays(SATURDAY)
+        return self
+
+    def BetweenTimes(self: EpisodeBuilder, start: Optional[time], end: Optional[time]) -> EpisodeBuilder:
+        self.episode.availability = self.episode.availability.with_window(start, end)
         return self
\ No newline at end of file
@@ -0,0 +1,260 @@
+from __future__ import annotations
+from typing import Iterable, Iterator, List, Optional, Tuple, TYPE_CHECKING
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from Availability import Availability, ANYTIME
+from Episode import Episode
+from Journal import Journal
+
+if TYPE_CHECKING:
+    from ShowRegistry import ShowRegistry
+
+#order, label, release, constraint and built episode of one entry in the parallel arrays
+Record = Tuple[int, str, Optional[datetime], Availability, Optional[Episode]]
+
+
+class EpisodeQueue:
+    __slots__ = ("show_name", "orders", "labels", "releases", "constraints", "episodes", "consumed", "head", "remaining", "version", "registry")
+
+    def __init__(self: EpisodeQueue, show_name: str = "") -> None:
+        self.show_name: str = show_name
+        #parallel arrays, one entry per episode, sorted by episode order
+        self.orders: array = array("q")
+        self.labels: List[str] = []
+        self.releases: List[Optional[datetime]] = []
+        #weekday / time window constraints, shared between episodes wherever possible
+        self.constraints: List[Availability] = []
+        #Episode objects are only built when something reads them, then reused so identity stays stable
+        self.episodes: List[Optional[Episode]] = []
+        #scheduled episodes stay in the arrays, flagged here, so they can be handed back cheaply
+        self.consumed: bytearray = bytearray()
+        self.head: int = 0
+        self.remaining: int = 0
+        #bumped by every change to which episodes are waiting or how they are labelled, so syncs can skip unchanged queues
+        self.version: int = 0
+        #the registry this queue's show is registered with; its journal, when one is attached, records every change made here
+        self.registry: Optional[ShowRegistry] = None
+
+    @staticmethod
+    def numbered(show_name: str, last_episode: int, start_episode: int = 1, available_on: Optional[datetime] = None) -> EpisodeQueue:
+        queue: EpisodeQueue = EpisodeQueue(show_name)
+        queue.extend_numbered(last_episode, start_episode, available_on)
+        return queue
+
+    @staticmethod
+    def weekly(show_name: str, start_date: datetime, last_episode: int, start_episode: int = 1) -> EpisodeQueue:
+        queue: EpisodeQueue = EpisodeQueue(show_name)
+        queue.extend_weekly(start_date, last_episode, start_episode)
+        return queue
+
+    def copy(self: EpisodeQueue) -> EpisodeQueue:
+        #an independent queue over the same records; its Episode objects are built fresh on first read
+        queue: EpisodeQueue = EpisodeQueue(self.show_name)
+        queue.orders = array("q", self.orders)
+        queue.labels = list(self.labels)
+        queue.releases = list(self.releases)
+        queue.constraints = list(self.constraints)
+        queue.episodes = [None] * len(self.orders)
+        queue.consumed = bytearray(self.consumed)
+        queue.head = self.head
+        queue.remaining = self.remaining
+        return queue
+
+    def __len__(self: EpisodeQueue) -> int:
+        return self.remaining
+
+    def __iter__(self: EpisodeQueue) -> Iterator[Episode]:
+        for index in range(self.head, len(self.orders)):
+            if not self.consumed[index]:
+                yield self.episode_at(index)
+
+    def __getitem__(self: EpisodeQueue, position: int) -> Episode:
+        return self.episode_at(self.index_of_position(position))
+
+    def index_of_position(self: EpisodeQueue, position: int) -> int:
+        if position < 0:
+            position += self.remaining
+        if position < 0 or position >= self.remaining:
+            raise IndexError("episode queue index out of range")
+        if position == 0:
+            return self.head
+        index: int = self.head
+        while True:
+            if not self.consumed[index]:
+                if position == 0:
+                    return index
+                position -= 1
+            index += 1
+
+    def episode_at(self: EpisodeQueue, index: int) -> Episode:
+        episode: Optional[Episode] = self.episodes[index]
+        if episode is None:
+            release: Optional[datetime] = self.releases[index]
+            constraint: Availability = self.constraints[index]
+            episode = Episode(self.show_name, self.labels[index], self.orders[index],
+                              availability=constraint.with_release(release) if release else constraint)
+            episode.episode_order = self.orders[index]
+            self.episodes[index] = episode
+        return episode
+
+    def journal(self: EpisodeQueue) -> Optional[Journal]:
+        return self.registry.journal if self.registry is not None else None
+
+    def append_record(self: EpisodeQueue, order: int, label: str, release: Optional[datetime], constraint: Availability) -> None:
+        if self.journal() is not None:
+            self.insert_record(len(self.orders), (order, label, release, constraint, None))
+            return
+        self.orders.append(order)
+        self.labels.append(label)
+        self.releases.append(release)
+        self.constraints.append(constraint)
+        self.episodes.append(None)
+        self.consumed.append(0)
+        self.remaining += 1
+        self.version += 1
+
+    def extend_numbered(self: EpisodeQueue, last_episode: int, start_episode: int = 1, available_on: Optional[datetime] = None) -> None:
+        if self.orders and start_episode < self.orders[-1]:
+            for number in range(start_episode, last_episode + 1):
+                self.add_record(number, str(number), available_on, ANYTIME)
+            return
+        for number in range(start_episode, last_episode + 1):
+            self.append_record(number, str(number), available_on, ANYTIME)
+
+    def extend_weekly(self: EpisodeQueue, start_date: datetime, last_episode: int, start_episode: int = 1) -> None:
+        week: timedelta = timedelta(days=7)
+        release: datetime = start_date
+        for number in range(start_episode, last_episode + 1):
+            if self.orders and number < self.orders[-1]:
+                self.add_record(number, str(number), release, ANYTIME)
+            else:
+                self.append_record(number, str(number), release, ANYTIME)
+            release += week
+
+    def add_record(self: EpisodeQueue, order: int, label: str, release: Optional[datetime], constraint: Availability, episode: Optional[Episode] = None) -> None:
+        self.insert_record(bisect_right(self.orders, order), (order, label, release, constraint, episode))
+
+    def insert_record(self: EpisodeQueue, index: int, record: Record) -> None:
+        order, label, release, constraint, episode = record
+        self.orders.insert(index, order)
+        self.labels.insert(index, label)
+        self.releases.insert(index, release)
+        self.constraints.insert(index, constraint)
+        self.episodes.insert(index, episode)
+        self.consumed.insert(index, 0)
+        self.remaining += 1
+        self.version += 1
+        if index <= self.head:
+            self.head = index
+        journal: Optional[Journal] = self.journal()
+        if journal is not None:
+            #built now so that redoing the insert brings back the same Episode the calendar slots point at
+            journal.add(EpisodeQueue.set_record, self, index, None, (order, label, release, constraint, self.episode_at(index)))
+
+    def remove_record(self: EpisodeQueue, index: int) -> None:
+        journal: Optional[Journal] = self.journal()
+        if journal is not None:
+            journal.add(EpisodeQueue.set_record, self, index,
+                        (self.orders[index], self.labels[index], self.releases[index], self.constraints[index], self.episode_at(index)), None)
+        if not self.consumed[index]:
+            self.remaining -= 1
+        del self.orders[index]
+        del self.labels[index]
+        del self.releases[index]
+        del self.constraints[index]
+        del self.episodes[index]
+        del self.consumed[index]
+        self.version += 1
+        if index < self.head:
+            self.head -= 1
+        while self.head < len(self.orders) and self.consumed[self.head]:
+            self.head += 1
+
+    def set_record(self: EpisodeQueue, index: int, record: Optional[Record]) -> None:
+        if record is None:
+            self.remove_record(index)
+        else:
+            self.insert_record(index, record)
+
+    def find(self: EpisodeQueue, episode: Episode) -> int:
+        index: int = bisect_left(self.orders, episode.episode_order)
+        while index < len(self.orders) and self.orders[index] == episode.episode_order:
+            if self.episodes[index] is episode:
+                return index
+            index += 1
+        return -1
+
+    def add(self: EpisodeQueue, episode: Episode) -> None:
+        index: int = self.find(episode)
+        if index < 0:
+            self.add_record(episode.episode_order, episode.episode_label, episode.release_date, episode.availability, episode)
+        elif self.consumed[index]:
+            journal: Optional[Journal] = self.journal()
+            if journal is not None:
+                journal.add(EpisodeQueue.set_waiting, self, episode, False, True)
+            self.consumed[index] = 0
+            self.remaining += 1
+            self.version += 1
+            self.head = min(self.head, index)
+
+    def return_episodes(self: EpisodeQueue, episodes: Iterable[Episode]) -> None:
+        for episode in episodes:
+            self.add(episode)
+
+    def pop(self: EpisodeQueue, position: int = 0) -> Episode:
+        index: int = self.index_of_position(position)
+        episode: Episode = self.episode_at(index)
+        #journal(), inlined for the generation hot path
+        if self.registry is not None and self.registry.journal is not None:
+            self.registry.journal.add(EpisodeQueue.set_waiting, self, episode, True, False)
+        self.consumed[index] = 1
+        self.remaining -= 1
+        self.version += 1
+        if index == self.head:
+            self.head += 1
+            while self.head < len(self.orders) and self.consumed[self.head]:
+                self.head += 1
+        return episode
+
+    def take(self: EpisodeQueue, episode: Episode) -> bool:
+        index: int = self.find(episode)
+        if index < 0 or self.consumed[index]:
+            return False
+        journal: Optional[Journal] = self.journal()
+        if journal is not None:
+            journal.add(EpisodeQueue.set_waiting, self, episode, True, False)
+        self.consumed[index] = 1
+        self.remaining -= 1
+        self.version += 1
+        while self.head < len(self.orders) and self.consumed[self.head]:
+            self.head += 1
+        return True
+
+    def set_waiting(self: EpisodeQueue, episode: Episode, waiting: bool) -> None:
+        if waiting:
+            self.add(episode)
+        else:
+            self.take(episode)
+
+    def finalize_last(self: EpisodeQueue) -> None:
+        if not self.orders:
+            return
+        self.version += 1
+        journal: Optional[Journal] = self.journal()
+        if journal is not None:
+            journal.add(EpisodeQueue.set_label, self, len(self.labels) - 1, self.labels[-1], f"({self.labels[-1]})")
+        last: Optional[Episode] = self.episodes[-1]
+        if last:
+            last.make_last()
+            self.labels[-1] = last.episode_label
+        else:
+            self.labels[-1] = f"({self.labels[-1]})"
+
+    def set_label(self: EpisodeQueue, index: int, label: str) -> None:
+        self.labels[index] = label
+        self.version += 1
+        episode: Optional[Episode] = self.episodes[index]
+        if episode:
+            episode.episode_label = label
+            Episode.label_version += 1
@@ -0,0 +1,181 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, cast
+from contextlib import contextmanager
+from datetime import date
+from Checkpoint import GenerationRun
+from Journal import Journal
+from Schedule import Schedule, ScheduleBuilder
+from ScheduleDate import ScheduleDateBuilder
+from Show import Show
+from SlotTemplate import SlotTemplate
+
+
+class ScheduleFields:
+    #the schedule's single valued fields, captured whole at each end of a version since that is O(1);
+    #everything else is journaled change by change as it happens
+    __slots__ = ("last_run", "edited_through", "default_template")
+
+    def __init__(self: ScheduleFields, schedule: Schedule) -> None:
+        self.last_run: Optional[GenerationRun] = schedule.last_run
+        self.edited_through: Optional[date] = schedule.edited_through
+        self.default_template: SlotTemplate = schedule.slot_templates.default
+
+    def restore(self: ScheduleFields, schedule: Schedule) -> None:
+        schedule.last_run = self.last_run
+        schedule.edited_through = self.edited_through
+        schedule.slot_templates.default = self.default_template
+
+
+class Version:
+    __slots__ = ("number", "label", "parent", "before", "after", "journal", "redo_child")
+
+    def __init__(self: Version, number: int, label: str, parent: Optional[Version]) -> None:
+        self.number: int = number
+        self.label: str = label
+        self.parent: Optional[Version] = parent
+        self.before: Optional[ScheduleFields] = None
+        self.after: Optional[ScheduleFields] = None
+        self.journal: Journal = Journal()
+        #the child redo() goes to: the one most recently created or undone
+        self.redo_child: Optional[Version] = None
+
+
+class ScheduleHistory:
+    #every change made through the history becomes a version; undo and redo replay only what that version changed
+    def __init__(self: ScheduleHistory, schedule: Schedule) -> None:
+        self.schedule: Schedule = schedule
+        self.root: Version = Version(0, "start", None)
+        self.current: Version = self.root
+        self.versions: List[Version] = [self.root]
+        self.branches: Dict[str, Version] = {"main": self.root}
+        #the branch new versions are added to; undo and redo leave branch heads where they are
+        self.branch_name: Optional[str] = "main"
+        #the version a record() block of this history is filling in, if any
+        self.recording: Optional[Version] = None
+
+    @contextmanager
+    def record(self: ScheduleHistory, label: str) -> Iterator[Schedule]:
+        #anything done to the schedule inside the block is one version, even if the block fails part way
+        if self.recording is not None:
+            #a block inside one of this history's own blocks is part of that version
+            yield self.schedule
+            return
+        version: Version = Version(len(self.versions), label, self.current)
+        version.before = ScheduleFields(self.schedule)
+        #a recording already in progress on this schedule keeps getting every change through outer
+        outer: Optional[Journal] = self.schedule.journal
+        version.journal.outer = outer
+        self.schedule.attach_journal(version.journal)
+        self.recording = version
+        try:
+            yield self.schedule
+        finally:
+            self.recording = None
+            self.schedule.attach_journal(outer)
+            version.journal.outer = None
+            version.after = ScheduleFields(self.schedule)
+            self.versions.append(version)
+            self.current.redo_child = version
+            self.current = version
+            if self.branch_name is not None:
+                self.branches[self.branch_name] = version
+
+    def generate_schedule(
+            self: ScheduleHistory,
+            start: date,
+            stop_at_first_empty_show: bool = True,
+            end: Optional[date] = None,
+            event_driven: bool = False) -> date:
+        with self.record(f"generate_schedule {start}"):
+            return self.schedule.generate_schedule(start, stop_at_first_empty_show, end, event_driven)
+
+    def regenerate(self: ScheduleHistory, start: date) -> date:
+        with self.record(f"regenerate {start}"):
+            return self.schedule.regenerate(start)
+
+    def clear_date_range(self: ScheduleHistory, start: date, end: Optional[date] = None) -> None:
+        with self.record(f"clear_date_range {start} {end}" if end else f"clear_date_range {start}"):
+            self.schedule.clear_date_range(start, end)
+
+    def register_show(self: ScheduleHistory, show: Show) -> None:
+        with self.record(f"register_show {show.name}"):
+            ScheduleBuilder(self.schedule).RegisterShow(show)
+
+    def register_special_date(self: ScheduleHistory, date_generator: Callable[[ScheduleDateBuilder], Any]) -> None:
+        with self.record("register_special_date"):
+            ScheduleBuilder(self.schedule).RegisterSpecialDate(date_generator)
+
+    def revert(self: ScheduleHistory, version: Version) -> None:
+        self.check_idle()
+        version.journal.undo()
+        if version.before is not None:
+            version.before.restore(self.schedule)
+
+    def apply(self: ScheduleHistory, version: Version) -> None:
+        self.check_idle()
+        version.journal.redo()
+        if version.after is not None:
+            version.after.restore(self.schedule)
+
+    def check_idle(self: ScheduleHistory) -> None:
+        #versions are replayed on top of the exact state they were recorded against, which a recording in progress would change under them
+        if self.schedule.journal is not None:
+            raise ValueError("can't move between versions while a version is being recorded")
+
+    def undo(self: ScheduleHistory) -> bool:
+        parent: Optional[Version] = self.current.parent
+        if parent is None:
+            return False
+        self.revert(self.current)
+        parent.redo_child = self.current
+        self.current = parent
+        return True
+
+    def redo(self: ScheduleHistory) -> bool:
+        child: Optional[Version] = self.current.redo_child
+        if child is None:
+            return False
+        self.apply(child)
+        self.current = child
+        return True
+
+    def branch(self: ScheduleHistory, name: str) -> None:
+        #names the current version and follows it from here on, like creating and switching to a git branch
+        self.branches[name] = self.current
+        self.branch_name = name
+
+    def checkout(self: ScheduleHistory, target: Any) -> None:
+        #a branch name or a version number
+        version: Version = self.branches[target] if isinstance(target, str) else self.versions[target]
+        ancestors: Set[int] = set()
+        walk: Optional[Version] = version
+        while walk is not None:
+            ancestors.add(walk.number)
+            walk = walk.parent
+        while self.current.number not in ancestors:
+            self.revert(self.current)
+            self.current = cast(Version, self.current.parent)
+        path: List[Version] = []
+        walk = version
+        while walk is not self.current:
+            path.append(cast(Version, walk))
+            walk = cast(Version, walk).parent
+        for step in reversed(path):
+            self.apply(step)
+            cast(Version, step.parent).redo_child = step
+            self.current = step
+        self.branch_name = target if isinstance(target, str) else None
+
+    def log(self: ScheduleHistory) -> List[str]:
+        #the current version's lineage, oldest first, with the branches pointing at each
+        lineage: List[Version] = []
+        walk: Optional[Version] = self.current
+        while walk is not None:
+            lineage.append(walk)
+            walk = walk.parent
+        lines: List[str] = []
+        for version in reversed(lineage):
+            names: List[str] = sorted(name for name, head in self.branches.items() if head is version)
+            marker: str = "*" if version is self.current else " "
+            lines.append(f"{marker} {version.number:>3} {version.label}" + (f" ({', '.join(names)})" if names else ""))
+        return lines
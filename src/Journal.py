@@ -0,0 +1,70 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+#every write made while a journal is attached is kept as (writer, target, key, value before, value after);
+#writer(target, key, value) puts either value back, so walking the entries backwards undoes them and forwards redoes them.
+#entries hold references, not copies, so a journal costs O(changes) no matter how big the schedule is
+Entry = Tuple[Callable[[Any, Any, Any], Any], Any, Any, Any, Any]
+
+
+class Missing:
+    #stands for a key that wasn't in a table, or an item that wasn't in a list
+    def __repr__(self: Missing) -> str:
+        return "MISSING"
+
+
+MISSING: Missing = Missing()
+
+
+def write_entry(table: Dict[Any, Any], key: Any, value: Any) -> None:
+    if value is MISSING:
+        table.pop(key, None)
+    else:
+        table[key] = value
+
+
+def write_item(items: List[Any], index: int, value: Any) -> None:
+    if value is MISSING:
+        del items[index]
+    else:
+        items.insert(index, value)
+
+
+class Journal:
+    def __init__(self: Journal, outer: Optional[Journal] = None) -> None:
+        self.entries: List[Entry] = []
+        #the journal that was attached when this one was; it still gets every entry, so nested recordings each see all of their changes
+        self.outer: Optional[Journal] = outer
+
+    def __len__(self: Journal) -> int:
+        return len(self.entries)
+
+    def add(self: Journal, writer: Callable[[Any, Any, Any], Any], target: Any, key: Any, before: Any, after: Any) -> None:
+        entry: Entry = (writer, target, key, before, after)
+        journal: Optional[Journal] = self
+        while journal is not None:
+            journal.entries.append(entry)
+            journal = journal.outer
+
+    def undo(self: Journal) -> None:
+        for writer, target, key, before, _ in reversed(self.entries):
+            writer(target, key, before)
+
+    def redo(self: Journal) -> None:
+        for writer, target, key, _, after in self.entries:
+            writer(target, key, after)
+
+
+def set_entry(journal: Optional[Journal], table: Dict[Any, Any], key: Any, value: Any) -> None:
+    #table[key] = value, or drops key when value is MISSING
+    if journal is not None:
+        journal.add(write_entry, table, key, table.get(key, MISSING), value)
+    write_entry(table, key, value)
+
+
+def set_attribute(journal: Optional[Journal], target: Any, name: str, value: Any) -> None:
+    #for attributes that get replaced whole; the old value must not be changed in place afterwards, which holds for
+    #everything replaced this way since only the new value is reachable from then on
+    if journal is not None:
+        journal.add(setattr, target, name, getattr(target, name), value)
+    setattr(target, name, value)
@@ -0,0 +1,95 @@
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+from datetime import date, datetime, time, timedelta
+from Calendar import Calendar
+from ScheduleDate import ScheduleDate
+from WeekArchive import WeekArchive, DAYS_IN_WEEK
+
+
+class ShowSummary:
+    __slots__ = ("last_appearance", "episodes_watched")
+
+    def __init__(self: ShowSummary) -> None:
+        self.last_appearance: Optional[datetime] = None
+        self.episodes_watched: int = 0
+
+    def add(self: ShowSummary, moment: datetime) -> None:
+        self.episodes_watched += 1
+        if self.last_appearance is None or moment > self.last_appearance:
+            self.last_appearance = moment
+
+
+class RollingCalendar(Calendar):
+    #keeps only the weeks from the horizon on; older weeks are frozen, written to the archive and dropped from memory,
+    #leaving a summary per show in their place
+    def __init__(self: RollingCalendar, archive: WeekArchive, keep_weeks: int = 8) -> None:
+        super().__init__()
+        self.archive: WeekArchive = archive
+        #how many whole weeks before the current one stay live when rolling forward
+        self.keep_weeks: int = keep_weeks
+        self.summaries: Dict[str, ShowSummary] = {}
+        #an archive left by an earlier process picks up where it stopped
+        for sunday, days in archive.iter_weeks():
+            self.summarize(days)
+            self.frozen_through = sunday + timedelta(days=DAYS_IN_WEEK - 1)
+
+    def summarize(self: RollingCalendar, days: List[Tuple[date, ScheduleDate]]) -> None:
+        for _, schedule_date in days:
+            for slot in schedule_date.slots:
+                if slot.episode:
+                    self.summaries.setdefault(slot.episode.show_name, ShowSummary()).add(slot.time)
+
+    def horizon(self: RollingCalendar, today: date) -> date:
+        return today - timedelta(days=Calendar.sunday_first_weekday(today) + DAYS_IN_WEEK * self.keep_weeks)
+
+    def archive_weeks(self: RollingCalendar, before: date) -> int:
+        if self.earliest_date is None:
+            return 0
+        sunday: date = self.earliest_date - timedelta(days=Calendar.sunday_first_weekday(self.earliest_date))
+        if self.frozen_through is not None:
+            sunday = max(sunday, self.frozen_through + timedelta(days=1))
+        archived: int = 0
+        while sunday + timedelta(days=DAYS_IN_WEEK) <= before:
+            days: List[Tuple[date, ScheduleDate]] = [(day, schedule_date) for day, schedule_date in self.range(sunday, sunday + timedelta(days=DAYS_IN_WEEK - 1)).items()
+                                                     if schedule_date is not None]
+            if days:
+                self.archive.append(sunday, days)
+                self.summarize(days)
+                archived += 1
+            for day, _ in days:
+                del self[day]
+            self.week_versions.pop(Calendar.week_key(sunday), None)
+            self.frozen_through = sunday + timedelta(days=DAYS_IN_WEEK - 1)
+            sunday += timedelta(days=DAYS_IN_WEEK)
+        if self.frozen_through is not None:
+            boundary: datetime = datetime.combine(self.frozen_through + timedelta(days=1), time.min)
+            for show_name in [show_name for show_name, times in self.appearances.items() if not times]:
+                del self.appearances[show_name]
+            self.idle_spans = [(start, end) for start, end in self.idle_spans if end > boundary]
+        return archived
+
+    def last_appearance(self: RollingCalendar, show_name: str, before: Optional[datetime] = None) -> Optional[datetime]:
+        live: Optional[datetime] = super().last_appearance(show_name, before)
+        if live is not None:
+            return live
+        summary: Optional[ShowSummary] = self.summaries.get(show_name)
+        if summary is None or summary.last_appearance is None:
+            return None
+        if before is None or summary.last_appearance < before:
+            return summary.last_appearance
+        #only a look back into archived history needs the archive itself, a week at a time from before's week down
+        sunday: date = min(before.date(), self.frozen_through or before.date())
+        sunday -= timedelta(days=Calendar.sunday_first_weekday(sunday))
+        first: Optional[date] = self.archive.sundays()[0] if len(self.archive) else None
+        while first is not None and sunday >= first:
+            moments: List[datetime] = [slot.time for _, schedule_date in self.archive.read_week(sunday) for slot in schedule_date.slots
+                                       if slot.episode and slot.episode.show_name == show_name and slot.time < before]
+            if moments:
+                return max(moments)
+            sunday -= timedelta(days=DAYS_IN_WEEK)
+        return None
+
+    def episodes_watched(self: RollingCalendar, show_name: str) -> int:
+        #archived and live appearances together
+        summary: Optional[ShowSummary] = self.summaries.get(show_name)
+        return (summary.episodes_watched if summary else 0) + len(self.appearances.get(show_name, ()))
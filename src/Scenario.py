@@ -0,0 +1,183 @@
+from __future__ import annotations
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, cast
+from datetime import date, datetime, timedelta
+import multiprocessing
+import pickle
+from Schedule import Schedule
+from ScheduleDate import ScheduleDate, ScheduleDateBuilder
+from Show import Show
+import Display
+
+
+class Phase:
+    def __init__(self: Phase, show_names: List[str], runs: int = 1, end: Optional[date] = None) -> None:
+        #shows registered together, then generate_schedule is run this many times from where the last run stopped
+        self.show_names: List[str] = show_names
+        self.runs: int = runs
+        self.end: Optional[date] = end
+
+
+class Scenario:
+    def __init__(self: Scenario, name: str) -> None:
+        self.name: str = name
+        self.phases: List[Phase] = []
+        self.priorities: Dict[str, int] = {}
+        self.special_dates: List[ScheduleDate] = []
+        self.removed_dates: List[date] = []
+
+
+class ScenarioBuilder:
+    def __init__(self: ScenarioBuilder, name: str = "", scenario: Optional[Scenario] = None) -> None:
+        self.scenario: Scenario
+        if scenario:
+            self.scenario = scenario
+        else:
+            self.scenario = Scenario(name)
+
+    def ThenRegister(self: ScenarioBuilder, show_names: List[str], runs: int = 1, end: Optional[date] = None) -> ScenarioBuilder:
+        self.scenario.phases.append(Phase(list(show_names), runs, end))
+        return self
+
+    def WithPriority(self: ScenarioBuilder, show_name: str, priority: int) -> ScenarioBuilder:
+        self.scenario.priorities[show_name] = priority
+        return self
+
+    def WithSpecialDate(self: ScenarioBuilder, date_generator: Callable[[ScheduleDateBuilder], ScheduleDateBuilder]) -> ScenarioBuilder:
+        #built right away so the scenario stays picklable for the worker processes
+        schedule_date_builder: ScheduleDateBuilder = ScheduleDateBuilder()
+        date_generator(schedule_date_builder)
+        self.scenario.special_dates.append(cast(ScheduleDate, schedule_date_builder.day))
+        return self
+
+    def WithoutSpecialDate(self: ScenarioBuilder, day: date) -> ScenarioBuilder:
+        self.scenario.removed_dates.append(day)
+        return self
+
+
+class ScenarioResult:
+    def __init__(self: ScenarioResult, name: str) -> None:
+        self.name: str = name
+        self.finish: Optional[date] = None
+        #episodes left unscheduled, registered or not; a plan that drops shows shouldn't win on finish date
+        self.unscheduled: int = 0
+        #show name -> longest stretch between two consecutive episodes of that show
+        self.max_gaps: Dict[str, timedelta] = {}
+        self.mean_lag: timedelta = timedelta(0)
+        self.max_lag: timedelta = timedelta(0)
+        self.error: Optional[str] = None
+
+    def worst_gap(self: ScenarioResult) -> timedelta:
+        return max(self.max_gaps.values(), default=timedelta(0))
+
+    def rank_key(self: ScenarioResult) -> Tuple:
+        return (self.error is not None, self.unscheduled, self.finish or date.max, self.worst_gap(), self.mean_lag, self.name)
+
+
+def apply_scenario(schedule: Schedule, pool: Dict[str, Show], scenario: Scenario, start: date) -> date:
+    for day in scenario.removed_dates:
+        schedule.clear_date_range(day, day)
+        schedule.special_dates.pop(day, None)
+    for special_date in scenario.special_dates:
+        #generation fills the slots it is given, and the scenario's own days have to stay empty for the next evaluation
+        schedule.set_special_date(special_date.copy())
+    for show_name, priority in scenario.priorities.items():
+        if show_name in schedule.shows:
+            schedule.shows.set_priority(schedule.get_show(show_name), priority)
+        elif show_name in pool:
+            pool[show_name].priority = priority
+    stopped: date = start
+    for phase in scenario.phases:
+        for show_name in phase.show_names:
+            if show_name not in pool:
+                raise KeyError(f"{show_name!r} is not in the show pool")
+            schedule.shows.register(pool.pop(show_name))
+        for _ in range(phase.runs):
+            stopped = schedule.generate_schedule(start=stopped, end=phase.end)
+    return stopped
+
+
+def measure(schedule: Schedule, pool: Dict[str, Show], result: ScenarioResult) -> None:
+    result.unscheduled = sum(len(show.episodes) for show in schedule.shows.all()) + sum(len(show.episodes) for show in pool.values())
+    last_times: List[datetime] = [times[-1] for times in schedule.schedule.appearances.values() if times]
+    result.finish = max(last_times).date() if last_times else None
+    for show_name, times in schedule.schedule.appearances.items():
+        if len(times) > 1:
+            result.max_gaps[show_name] = max(later - earlier for earlier, later in zip(times, times[1:]))
+    total_lag: timedelta = timedelta(0)
+    lagged: int = 0
+    if schedule.schedule.earliest_date and schedule.schedule.latest_date:
+        for schedule_date in schedule.schedule.range(schedule.schedule.earliest_date, schedule.schedule.latest_date):
+            if schedule_date is None:
+                continue
+            for slot in schedule_date.slots:
+                if slot.episode and slot.episode.release_date:
+                    lag: timedelta = slot.time - slot.episode.release_date
+                    total_lag += lag
+                    lagged += 1
+                    result.max_lag = max(result.max_lag, lag)
+    if lagged:
+        result.mean_lag = total_lag / lagged
+
+
+def evaluate(schedule: Schedule, pool: Dict[str, Show], scenario: Scenario, start: date) -> ScenarioResult:
+    result: ScenarioResult = ScenarioResult(scenario.name)
+    try:
+        apply_scenario(schedule, pool, scenario, start)
+    except (KeyError, ValueError) as error:
+        result.error = str(error)
+        return result
+    measure(schedule, pool, result)
+    return result
+
+
+#pickled base state; fork()ed workers inherit it copy-on-write instead of having it sent to them
+BASE_STATE: bytes = b""
+
+
+def init_worker(state: bytes) -> None:
+    global BASE_STATE
+    BASE_STATE = state
+
+
+def evaluate_from_base(scenario: Scenario) -> ScenarioResult:
+    schedule, pool, start = pickle.loads(BASE_STATE)
+    return evaluate(schedule, pool, scenario, start)
+
+
+def explore(
+        schedule: Schedule,
+        pool: Dict[str, Show],
+        start: date,
+        scenarios: Sequence[Scenario],
+        processes: Optional[int] = None) -> List[ScenarioResult]:
+    #the base schedule and pool are never touched; every scenario runs on its own copy
+    global BASE_STATE
+    BASE_STATE = pickle.dumps((schedule, pool, start), protocol=pickle.HIGHEST_PROTOCOL)
+    results: List[ScenarioResult]
+    if processes == 1 or len(scenarios) <= 1:
+        results = [evaluate_from_base(scenario) for scenario in scenarios]
+    else:
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+            with context.Pool(processes) as workers:
+                results = workers.map(evaluate_from_base, scenarios)
+        else:
+            with multiprocessing.Pool(processes, initializer=init_worker, initargs=(BASE_STATE,)) as workers:
+                results = workers.map(evaluate_from_base, scenarios)
+    return sorted(results, key=lambda result: result.rank_key())
+
+
+def format_days(span: timedelta) -> str:
+    return f"{span.total_seconds() / 86400:.1f}d"
+
+
+def results_to_string(results: List[ScenarioResult]) -> str:
+    header: List[str] = ["#", "scenario", "finish", "unscheduled", "worst gap", "mean lag", "max lag"]
+    rows: List[List[str]] = [header]
+    for rank, result in enumerate(results, start=1):
+        if result.error:
+            rows.append([str(rank), result.name, "error: " + result.error, "", "", "", ""])
+            continue
+        rows.append([str(rank), result.name, result.finish.strftime("%b %d %Y") if result.finish else "-", str(result.unscheduled),
+                     format_days(result.worst_gap()), format_days(result.mean_lag), format_days(result.max_lag)])
+    return Display.format_table(rows)
@@ -1,25 +1,50 @@
 from __future__ import annotations
-from typing import List, Optional, Callable, Union, Tuple, Dict, cast
+from typing import Iterable, Iterator, List, Optional, Callable, Union, Tuple, Dict, Set, cast
 from datetime import date, datetime, time, timedelta
+from time import perf_counter
 from ScheduleDate import ScheduleDate, ScheduleDateBuilder, SpecialScheduleDate
+from SlotTemplate import SlotTemplate, SlotTemplates
+from ShowSlot import ShowSlot
 from Show import Show, ShowBuilder
+from ShowRegistry import ShowRegistry
 from Episode import Episode, NonEpisode
 from Calendar import Calendar
-from sortedcontainers import SortedList
+from CandidateQueue import CandidateQueue
+from Checkpoint import Checkpoint, GenerationRun
+from Journal import Journal, MISSING, set_attribute, set_entry, write_entry, write_item
+from SchedulingEngine import SchedulingEngine, GreedyEngine
+from Stats import Stats, timed, STOP_END, STOP_EMPTY_SHOW, STOP_NO_CANDIDATE, STOP_CONVERGED, STOP_CONSUMER
 
 
 class Schedule:
     def __init__(
             self: Schedule,
             special_dates: Optional[List[ScheduleDate]] = None,
-            shows: Optional[SortedList] = None) -> None:
+            shows: Optional[Iterable[Show]] = None,
+            calendar: Optional[Calendar] = None) -> None:
         self.special_dates: Dict[date, ScheduleDate] = { special_date.day : special_date for special_date in special_dates } if special_dates else {}
-        self.shows: SortedList = shows if shows else SortedList(key=lambda show: show.priority)
-        self.empty_shows: List[Show] = []
+        self.shows: ShowRegistry = ShowRegistry(shows)
         self.previous_ep_cache: Dict[Show, datetime] = {}
-        self.schedule: Calendar = Calendar()
+        self.schedule: Calendar = calendar if calendar is not None else Calendar()
+        #slot times for ordinary days; days only get a record of their own once something is scheduled on them
+        self.slot_templates: SlotTemplates = SlotTemplates()
+        #the most recent generate_schedule call, with the weekly checkpoints regenerate() resumes from
+        self.last_run: Optional[GenerationRun] = None
+        #latest day touched by an edit since that run; the old run can't be reused before it
+        self.edited_through: Optional[date] = None
+        self.engine: SchedulingEngine = GreedyEngine()
+        #opt-in instrumentation: totals across runs and renders; each run also keeps its own in last_run.stats
+        self.stats: Optional[Stats] = None
+        #while a history records, every write to the schedule and the calendar, registry and queues it owns lands here
+        self.journal: Optional[Journal] = None
+
+    def attach_journal(self: Schedule, journal: Optional[Journal]) -> None:
+        self.journal = journal
+        self.schedule.journal = journal
+        self.shows.journal = journal
 
     def clear_date_range(self: Schedule, start: date, end: Optional[date] = None) -> None:
+        start = self.open_from(start)
         if self.schedule.latest_date is None or start > self.schedule.latest_date:
             return
         if start < cast(date, self.schedule.earliest_date):
@@ -27,101 +52,340 @@ class Schedule:
         if not end:
             end = cast(date, self.schedule.latest_date)
 
+        self.mark_edited(end)
+        cleared_shows: Set[Show] = set()
         for day in [start + timedelta(days=i) for i in range((end - start).days + 1)]:
             if day in self.special_dates:
                 for slot in (slot for slot in self.special_dates[day].slots if slot.episode):
-                    show: Show = self.get_show(cast(Episode, slot.episode).show_name)
-                    show.episodes.add(slot.episode)
-                    slot.episode = None
-                del self.special_dates[day]
-        #invalidate cache
-        self.previous_ep_cache = {}
+                    episode: Episode = cast(Episode, self.schedule.unassign(slot))
+                    show: Show = self.get_show(episode.show_name)
+                    show.episodes.add(episode)
+                    self.shows.mark_active(show)
+                    cleared_shows.add(show)
+                set_entry(self.journal, self.special_dates, day, MISSING)
+        self.schedule.clear_idle(datetime.combine(start, time.min), datetime.combine(end + timedelta(days=1), time.min))
+        #only the shows that lost an episode need their last appearance looked up again
+        for show in cleared_shows:
+            set_entry(self.journal, self.previous_ep_cache, show, MISSING)
+
+    def enable_stats(self: Schedule) -> Stats:
+        if self.stats is None:
+            self.stats = Stats()
+        return self.stats
+
+    def disable_stats(self: Schedule) -> None:
+        self.stats = None
+
+    def open_from(self: Schedule, day: date) -> date:
+        #archived weeks are frozen, so edits and generation move up to the first day after them
+        frozen: Optional[date] = self.schedule.frozen_through
+        return frozen + timedelta(days=1) if frozen is not None and day <= frozen else day
+
+    def freeze_before(self: Schedule, horizon: date) -> int:
+        #hands every whole week before horizon to the calendar's archive, if it has one, and lets go of what only those weeks needed;
+        #returns how many weeks were written
+        if self.journal is not None:
+            raise ValueError("archived weeks can't be undone, so nothing can be frozen while a history is recording")
+        archived: int = self.schedule.archive_weeks(horizon)
+        frozen: Optional[date] = self.schedule.frozen_through
+        if frozen is None:
+            return archived
+        for day in [day for day in self.special_dates if day <= frozen]:
+            del self.special_dates[day]
+        if self.last_run is not None:
+            self.last_run = self.last_run.trimmed(frozen + timedelta(days=1))
+        return archived
+
+    def mark_edited(self: Schedule, day: date) -> None:
+        if self.edited_through is None or day > self.edited_through:
+            self.edited_through = day
+
+    def set_special_date(self: Schedule, special_date: ScheduleDate) -> None:
+        set_entry(self.journal, self.special_dates, special_date.day, special_date)
+        self.mark_edited(special_date.day)
+
+    def set_slot_template(self: Schedule, template: SlotTemplate, start: date, end: Optional[date] = None) -> None:
+        #days already in the calendar keep the slots they were created with
+        self.slot_templates.override(template, start, end)
+        if self.journal is not None:
+            overrides: List[Tuple[date, date, SlotTemplate]] = self.slot_templates.overrides
+            self.journal.add(write_item, overrides, len(overrides) - 1, MISSING, overrides[-1])
+        #an open ended template only reaches generated days up to the last one in the calendar
+        self.mark_edited(end if end else self.schedule.latest_date or start)
 
     def get_show(self: Schedule, show_name: str) -> Show:
-        show = next(entry for entry in self.shows + self.empty_shows if entry.name == show_name)
-        return show
+        return self.shows.get(show_name)
 
     def get_previous_instance_date(self: Schedule, show: Show) -> datetime:
         if show in self.previous_ep_cache:
             return self.previous_ep_cache[show]
         time: Union[datetime, None] = self.find_last_show_appearance(show)
         if time:
-            self.previous_ep_cache[show] = time
+            set_entry(self.journal, self.previous_ep_cache, show, time)
             return time
         return datetime.min
 
     def find_last_show_appearance(self: Schedule, show: Show) -> Optional[datetime]:
-        if self.schedule.latest_date is None:
-            return None
-        end_date: date = cast(date, self.schedule.latest_date)
-        start_date: date = cast(date, self.schedule.earliest_date)
-        for day in [end_date - timedelta(days=i) for i in range((end_date - start_date).days + 1)]:
-            if day in self.schedule:
-                schedule_date: ScheduleDate = self.schedule[day]
-                for slot in schedule_date.slots:
-                    if slot.episode and slot.episode.show_name == show.name:
-                        return slot.time
-        return None
-
-    def collect_next_available_episodes(self: Schedule, slot: datetime) -> SortedList:
-        next_episodes: SortedList = SortedList(key=lambda entry: (entry[2], entry[1].priority))
+        return self.schedule.last_appearance(show.name)
+
+    def build_candidate_queue(self: Schedule, stats: Optional[Stats] = None) -> CandidateQueue:
+        candidates: CandidateQueue = CandidateQueue(stats)
         show: Show
         for show in self.shows:
-            last_appearance: datetime = self.get_previous_instance_date(show)
-            #use negative distance so that larger distance is lower in value for the sorted list
-            distance: timedelta = last_appearance - slot
-            if len(show.episodes) == 0:
-                next_episodes.add((NonEpisode, show, distance))
-            elif cast(Episode, show.episodes[0]).is_available(slot):
-                next_episodes.add((show.episodes[0], show, distance))
-        return next_episodes
+            if stats is not None:
+                stats.count("cache hits" if show in self.previous_ep_cache else "cache misses")
+            candidates.add(show, self.get_previous_instance_date(show))
+        return candidates
+
+    def stored_date(self: Schedule, search: date) -> Optional[ScheduleDate]:
+        #the day's own record, if it has one; anything else is still just its slot template
+        schedule_date: Optional[ScheduleDate] = self.schedule.get(search)
+        if schedule_date is None:
+            schedule_date = self.special_dates.get(search)
+        return schedule_date
 
     def get_current_date(self: Schedule, search: date) -> ScheduleDate:
-        if search in self.schedule:
-            return self.schedule[search]
-        new_date: ScheduleDate
-        if search in self.special_dates:
-            new_date = self.special_dates[search]
-        else:
-            new_date = cast(ScheduleDate, ScheduleDateBuilder().DefaultDate(search).day)
-        return new_date
+        stored: Optional[ScheduleDate] = self.stored_date(search)
+        if stored is not None:
+            return stored
+        return cast(ScheduleDate, ScheduleDateBuilder().DefaultDate(search, self.slot_templates.template_for(search)).day)
 
     def clear_empty_shows(self: Schedule) -> None:
-        for reverse_index in range(len(self.shows) - 1, -1, -1):
-            empty_show: Show = cast(Show, self.shows[reverse_index])
-            if len(empty_show.episodes) == 0:
-                del self.shows[reverse_index]
-                self.empty_shows.append(empty_show)
+        for empty_show in [show for show in self.shows.active() if len(show.episodes) == 0]:
+            self.shows.mark_exhausted(empty_show)
+
+    def special_dates_between(self: Schedule, after: date, through: date) -> List[date]:
+        return sorted(day for day in self.special_dates if after < day <= through)
+
+    def state_fingerprint(self: Schedule, idle_until: Optional[datetime]) -> Tuple:
+        return (idle_until, tuple(
+            (show.show_id, self.previous_ep_cache.get(show), show.episodes.head, len(show.episodes), self.shows.is_exhausted(show))
+            for show in self.shows.ordered))
+
+    def take_checkpoint(self: Schedule, run: GenerationRun, day: date, idle_until: Optional[datetime]) -> Checkpoint:
+        return Checkpoint(day, self.state_fingerprint(idle_until), dict(self.previous_ep_cache), set(self.shows.exhausted_ids),
+                          idle_until, len(run.assignments), len(run.created_days), len(run.idle_spans))
+
+    def store_date(self: Schedule, run: GenerationRun, day: date, schedule_date: ScheduleDate) -> None:
+        if day not in self.schedule:
+            run.created_days.append((day, schedule_date))
+        self.schedule[day] = schedule_date
+
+    def rewind(self: Schedule, run: GenerationRun, checkpoint: Checkpoint) -> None:
+        for slot, episode in reversed(run.assignments[checkpoint.assignment_position:]):
+            #anything a clear already handed back is left alone
+            if slot.episode is episode:
+                self.schedule.unassign(slot)
+                self.get_show(episode.show_name).episodes.add(episode)
+        for day, schedule_date in reversed(run.created_days[checkpoint.created_position:]):
+            if self.schedule.get(day) is schedule_date:
+                del self.schedule[day]
+        for start, end in run.idle_spans[checkpoint.idle_position:]:
+            self.schedule.clear_idle(start, end)
+        set_attribute(self.journal, self, "previous_ep_cache", dict(checkpoint.last_appearances))
+        set_attribute(self.journal, self.shows, "exhausted_ids", set(checkpoint.exhausted_ids))
+
+    def replay(self: Schedule, old_run: GenerationRun, checkpoint: Checkpoint, run: GenerationRun) -> date:
+        #old checkpoint positions are shifted to where the new run's logs are at the point of convergence
+        assignment_shift: int = len(run.assignments) - checkpoint.assignment_position
+        created_shift: int = len(run.created_days) - checkpoint.created_position
+        idle_shift: int = len(run.idle_spans) - checkpoint.idle_position
+        for day, schedule_date in old_run.created_days[checkpoint.created_position:]:
+            self.store_date(run, day, schedule_date)
+        for slot, episode in old_run.assignments[checkpoint.assignment_position:]:
+            show: Show = self.get_show(episode.show_name)
+            show.episodes.take(episode)
+            self.schedule.assign(slot, episode)
+            set_entry(self.journal, self.previous_ep_cache, show, slot.time)
+            run.assignments.append((slot, episode))
+        for start, end in old_run.idle_spans[checkpoint.idle_position:]:
+            self.schedule.mark_idle(start, end)
+            run.idle_spans.append((start, end))
+        for day in old_run.checkpoint_days:
+            if day >= checkpoint.day:
+                old: Checkpoint = old_run.checkpoints[day]
+                run.add_checkpoint(Checkpoint(day, old.fingerprint, old.last_appearances, old.exhausted_ids, old.idle_until,
+                                              old.assignment_position + assignment_shift,
+                                              old.created_position + created_shift,
+                                              old.idle_position + idle_shift))
+        return cast(date, old_run.stop)
+
+    def generate_schedule(
+            self: Schedule,
+            start: date,
+            stop_at_first_empty_show: Optional[bool] = True,
+            end: Optional[date] = None,
+            event_driven: bool = False) -> date:
+        start = self.open_from(start)
+        run: GenerationRun = GenerationRun(start, bool(stop_at_first_empty_show), end, event_driven)
+        self.last_run = run
+        self.edited_through = None
+        return self.fill(run, start)
+
+    def plan(
+            self: Schedule,
+            start: date,
+            stop_at_first_empty_show: bool = True,
+            end: Optional[date] = None,
+            event_driven: bool = False) -> date:
+        return self.engine.generate(self, self.open_from(start), stop_at_first_empty_show, end, event_driven)
 
-    def generate_schedule(self: Schedule, start: date, stop_at_first_empty_show: Optional[bool] = True, end: Optional[date] = None) -> date:
+    def regenerate(self: Schedule, start: date) -> date:
+        start = self.open_from(start)
+        old_run: Optional[GenerationRun] = self.last_run
+        if old_run is None or old_run.checkpoint_before(start) is None:
+            return self.generate_schedule(start, old_run.stop_at_first_empty_show if old_run else True,
+                                          old_run.end if old_run else None, old_run.event_driven if old_run else False)
+        checkpoint: Checkpoint = cast(Checkpoint, old_run.checkpoint_before(start))
+        self.rewind(old_run, checkpoint)
+        run: GenerationRun = old_run.resume_from(checkpoint)
+        self.last_run = run
+        #the old tail can only be reused once generation is past every edited day
+        converge_after: date = max(self.edited_through, start) if self.edited_through else start
+        self.edited_through = None
+        return self.fill(run, checkpoint.day, checkpoint.idle_until, old_run, converge_after)
+
+    def fill(
+            self: Schedule,
+            run: GenerationRun,
+            start: date,
+            idle_until: Optional[datetime] = None,
+            old_run: Optional[GenerationRun] = None,
+            converge_after: Optional[date] = None) -> date:
+        for _ in self.steps(run, start, idle_until, old_run, converge_after):
+            pass
+        return cast(date, run.stop)
+
+    def iter_schedule(
+            self: Schedule,
+            start: date,
+            stop_at_first_empty_show: bool = True,
+            end: Optional[date] = None,
+            event_driven: bool = False) -> Iterator[Tuple[datetime, ShowSlot, Episode]]:
+        #same run as generate_schedule, but each assignment is handed out as soon as it is written;
+        #whatever the consumer doesn't pull is never generated, and the run stops where the consumer did
+        start = self.open_from(start)
+        run: GenerationRun = GenerationRun(start, stop_at_first_empty_show, end, event_driven)
+        self.last_run = run
+        self.edited_through = None
+        return self.steps(run, start)
+
+    def steps(
+            self: Schedule,
+            run: GenerationRun,
+            start: date,
+            idle_until: Optional[datetime] = None,
+            old_run: Optional[GenerationRun] = None,
+            converge_after: Optional[date] = None) -> Iterator[Tuple[datetime, ShowSlot, Episode]]:
         shift_one_day: timedelta = timedelta(1)
+        stats: Optional[Stats] = Stats() if self.stats is not None else None
+        run.stats = stats
+        started: float = perf_counter()
+        #only the show that just got scheduled changes its place in line, so the queue is built once and re-keyed per pick
+        with timed(stats, "candidate queue"):
+            candidates: CandidateQueue = self.build_candidate_queue(stats)
+        #in event driven mode, slots before idle_until are left empty on purpose because nothing can air yet
+        checkpoint_week: Optional[date] = None
         #start back one day so that the first increment lands on start
         current: date = start - shift_one_day
         keep_going: bool = True
-        while keep_going:
-            current += shift_one_day
-            if end and current > end:
-                keep_going = False
-                break
-            current_date: ScheduleDate = self.get_current_date(current)
-
-            for slot in filter(lambda slot: slot.episode is None, current_date.slots):
-                #next_episodes is SortedList[Tuple[Episode, Show, timedelta]]
-                next_episodes: SortedList = self.collect_next_available_episodes(slot.time)
-                if len(next_episodes) == 0:
+        try:
+            while keep_going:
+                current += shift_one_day
+                if run.end and current > run.end:
+                    if stats is not None:
+                        stats.stop_reason = STOP_END
                     keep_going = False
                     break
-                next_episode: Tuple[Episode, Show, timedelta] = cast(Tuple[Episode, Show, timedelta], next_episodes[0])
-                if stop_at_first_empty_show and next_episode[0] is NonEpisode:
-                    keep_going = False
-                    break
-                if keep_going:
-                    slot.episode = next_episode[0]
+                if stats is not None:
+                    stats.count("days")
+                week: date = current - timedelta(days=Calendar.sunday_first_weekday(current))
+                if week != checkpoint_week:
+                    checkpoint_week = week
+                    with timed(stats, "checkpoints"):
+                        checkpoint: Checkpoint = self.take_checkpoint(run, current, idle_until)
+                    old_checkpoint: Optional[Checkpoint] = old_run.checkpoints.get(current) if old_run else None
+                    if old_run and old_checkpoint and current > cast(date, converge_after) and old_checkpoint.fingerprint == checkpoint.fingerprint:
+                        #same state on the same day as last time, so the rest of the old run would come out identical
+                        replayed: int = len(run.assignments)
+                        with timed(stats, "replay"):
+                            current = self.replay(old_run, old_checkpoint, run)
+                        if stats is not None:
+                            stats.stop_reason = STOP_CONVERGED
+                            stats.count("replayed assignments", len(run.assignments) - replayed)
+                        for replayed_slot, episode in run.assignments[replayed:]:
+                            yield (replayed_slot.time, replayed_slot, episode)
+                        break
+                    run.add_checkpoint(checkpoint)
+                current_date: Optional[ScheduleDate] = self.stored_date(current)
+                template: Optional[SlotTemplate] = None
+                moments: List[datetime]
+                if current_date is not None:
+                    self.store_date(run, current, current_date)
+                    moments = [slot.time for slot in current_date.slots]
+                else:
+                    #an ordinary day is only built and stored once it gets its first episode
+                    template = self.slot_templates.template_for(current)
+                    moments = template.moments(current)
+
+                for index, moment in enumerate(moments):
+                    if current_date is not None and current_date.slots[index].episode is not None:
+                        continue
+                    if stats is not None:
+                        stats.count("slots")
+                    if idle_until and moment < idle_until:
+                        if stats is not None:
+                            stats.count("idle slots")
+                        continue
+                    next_episode: Optional[Tuple[Episode, Show]] = cast(Optional[Tuple[Episode, Show]], candidates.next_candidate(moment, run.stop_at_first_empty_show))
+                    if next_episode is None and run.event_driven:
+                        idle_until = candidates.next_event()
+                        if idle_until:
+                            self.schedule.mark_idle(moment, idle_until)
+                            run.idle_spans.append((moment, idle_until))
+                            if stats is not None:
+                                stats.count("idle spans")
+                            continue
+                    if next_episode is None or next_episode[0] is NonEpisode:
+                        if stats is not None:
+                            stats.stop_reason = STOP_NO_CANDIDATE if next_episode is None else STOP_EMPTY_SHOW
+                            stats.stopped_on = next_episode[1].name if next_episode else None
+                        keep_going = False
+                        break
+                    if current_date is None:
+                        current_date = cast(ScheduleDate, ScheduleDateBuilder().DefaultDate(current, template).day)
+                        self.store_date(run, current, current_date)
+                    slot: ShowSlot = current_date.slots[index]
+                    self.schedule.assign(slot, next_episode[0])
+                    run.assignments.append((slot, next_episode[0]))
+                    #set_entry, inlined for the generation hot path
+                    if self.journal is not None:
+                        self.journal.add(write_entry, self.previous_ep_cache, next_episode[1], self.previous_ep_cache.get(next_episode[1], MISSING), slot.time)
                     self.previous_ep_cache[next_episode[1]] = slot.time
+                    candidates.update(next_episode[1], slot.time)
                     next_episode[1].episodes.pop(0)
-            self.schedule[current] = current_date
-        self.clear_empty_shows()
-        return current
+                    if stats is not None:
+                        stats.count("assignments")
+                    yield (slot.time, slot, next_episode[0])
+
+                if keep_going and idle_until and idle_until.date() > current + shift_one_day:
+                    #jump straight to the day of the next release; only special dates in between get stored, for their notes
+                    jump_to: date = idle_until.date() - shift_one_day
+                    if run.end and jump_to > run.end:
+                        jump_to = run.end
+                    for day in self.special_dates_between(current, jump_to):
+                        self.store_date(run, day, self.get_current_date(day))
+                    current = jump_to
+        finally:
+            #also runs when an iter_schedule consumer stops early, so the run always ends in a consistent state
+            self.clear_empty_shows()
+            run.stop = current
+            if stats is not None:
+                stats.add_time("generate", perf_counter() - started)
+                if stats.stop_reason is None:
+                    stats.stop_reason = STOP_CONSUMER
+                if self.stats is not None:
+                    self.stats.merge(stats)
 
 
 class ScheduleBuilder:
@@ -132,8 +396,22 @@ class ScheduleBuilder:
         else:
             self.schedule = Schedule()
 
+    def WithEngine(self: ScheduleBuilder, engine: SchedulingEngine) -> ScheduleBuilder:
+        self.schedule.engine = engine
+        return self
+
+    def WithSlotTemplate(self: ScheduleBuilder, template: SlotTemplate, start: Optional[date] = None, end: Optional[date] = None) -> ScheduleBuilder:
+        #without a start this replaces the default used for every ordinary day
+        if start is None:
+            self.schedule.slot_templates.default = template
+            if self.schedule.schedule.latest_date is not None:
+                self.schedule.mark_edited(self.schedule.schedule.latest_date)
+        else:
+            self.schedule.set_slot_template(template, start, end)
+        return self
+
     def RegisterShow(self: ScheduleBuilder, show: Show) -> ScheduleBuilder:
-        self.schedule.shows.add(show)
+        self.schedule.shows.register(show)
         return self
 
     def BuildAndRegisterShow(self: ScheduleBuilder, show_generator: Callable[[ShowBuilder]]) -> ScheduleBuilder:
@@ -145,5 +423,5 @@ class ScheduleBuilder:
         schedule_date_builder: ScheduleDateBuilder = ScheduleDateBuilder()
         date_generator(schedule_date_builder)
         built: ScheduleDate = cast(ScheduleDate, schedule_date_builder.day)
-        self.schedule.special_dates[built.day] = built
+        self.schedule.set_special_date(built)
         return self
\ No newline at end of file
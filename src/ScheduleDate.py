@@ -2,8 +2,11 @@ from __future__ import annotations
 from typing import List, Union, Optional
 from datetime import date, datetime, time
 from ShowSlot import ShowSlot
+from SlotTemplate import SlotTemplate, DEFAULT_TEMPLATE
 
 class ScheduleDate:
+    __slots__ = ("day", "slots", "special_notes")
+
     def __init__(
             self: ScheduleDate,
             day: date,
@@ -13,13 +16,23 @@ class ScheduleDate:
         self.slots: List[ShowSlot] = slots if slots else []
         self.special_notes: List[str] = special_notes if special_notes else []
 
+    def copy(self: ScheduleDate) -> ScheduleDate:
+        #the same kind of day with slots and notes of its own, so filling one leaves the other as it was
+        copied: ScheduleDate = type(self).__new__(type(self))
+        ScheduleDate.__init__(copied, self.day, [ShowSlot(slot.time, slot.episode) for slot in self.slots], list(self.special_notes))
+        return copied
+
 
 class DefaultScheduleDate(ScheduleDate):
-    def __init__(self: DefaultScheduleDate, day: date) -> None:
-        super().__init__(day)
+    __slots__ = ()
+
+    def __init__(self: DefaultScheduleDate, day: date, slots: Optional[List[ShowSlot]] = None) -> None:
+        super().__init__(day, slots)
 
 
 class SpecialScheduleDate(ScheduleDate):
+    __slots__ = ()
+
     def __init__(self: SpecialScheduleDate, day: date) -> None:
         super().__init__(day)
 
@@ -32,11 +45,8 @@ class ScheduleDateBuilder:
         self.day = SpecialScheduleDate(day)
         return self
 
-    def DefaultDate(self: ScheduleDateBuilder, day: date) -> ScheduleDateBuilder:
-        self.day = DefaultScheduleDate(day)
-        if day.weekday() == 5 or day.weekday() == 6:
-            self.WithLunchSlot()
-        self.WithDinnerSlot()
+    def DefaultDate(self: ScheduleDateBuilder, day: date, template: Optional[SlotTemplate] = None) -> ScheduleDateBuilder:
+        self.day = DefaultScheduleDate(day, [ShowSlot(moment) for moment in (template if template else DEFAULT_TEMPLATE).moments(day)])
         return self
 
     def WithLunchSlot(self: ScheduleDateBuilder) -> ScheduleDateBuilder:
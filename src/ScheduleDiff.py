@@ -0,0 +1,337 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from collections import Counter
+from datetime import date, datetime, time
+from itertools import chain
+import io
+import json
+from Availability import ANYTIME
+from Calendar import Calendar
+from Episode import Episode
+from EpisodeQueue import EpisodeQueue
+from Schedule import Schedule
+from ScheduleDate import ScheduleDate, DefaultScheduleDate, SpecialScheduleDate
+from Show import Show
+from ShowSlot import ShowSlot
+from Snapshot import SnapshotCalendar, load_schedule, load_schedule_bytes, snapshot_bytes
+
+#one change per line, as compact json:
+#  {"op": "day+", "day": "2025-09-01", "kind": "default", "slots": ["18:00"]}   day now exists in the calendar, slots still empty
+#  {"op": "day-", "day": "2025-09-01"}
+#  {"op": "slot", "at": "2025-09-01T21:00", "from": ["Show", "3"], "to": null}   either side may be null
+#  {"op": "note+", "day": "2025-09-01", "note": "LABOR DAY"}
+#  {"op": "note-", "day": "2025-09-01", "note": "LABOR DAY"}
+#  {"op": "show+", "show": "Show"} / {"op": "show-", "show": "Show"}
+#  {"op": "queue", "show": "Show", "added": [["4", 4, "2025-09-10T00:00:00"]], "removed": ["1", "2"]}   added is label, order, release
+DELTA_VERSION: int = 2
+DAY_KINDS: Dict[str, type] = {"special": SpecialScheduleDate, "default": DefaultScheduleDate, "plain": ScheduleDate}
+
+#what a downstream copy holds of a day: (slot time, episode key) pairs, notes, and the kind of day
+DayState = Tuple[Tuple[Tuple[datetime, Optional[Tuple[str, str]]], ...], Tuple[str, ...], str]
+#and of an episode queue: label, order and release of every waiting episode
+QueueState = List[Tuple[str, int, Optional[datetime]]]
+
+
+def episode_key(episode: Optional[Episode]) -> Optional[Tuple[str, str]]:
+    if episode is None:
+        return None
+    return (episode.show_name, episode.episode_label)
+
+
+def day_kind(schedule_date: ScheduleDate) -> str:
+    if isinstance(schedule_date, SpecialScheduleDate):
+        return "special"
+    return "default" if isinstance(schedule_date, DefaultScheduleDate) else "plain"
+
+
+def day_state(schedule_date: Optional[ScheduleDate]) -> Optional[DayState]:
+    if schedule_date is None:
+        return None
+    return (tuple((slot.time, episode_key(slot.episode)) for slot in schedule_date.slots), tuple(schedule_date.special_notes), day_kind(schedule_date))
+
+
+def queue_state(queue: EpisodeQueue) -> QueueState:
+    #read from the records, so no Episode objects get built just to be compared
+    return [(queue.labels[index], queue.orders[index], queue.releases[index]) for index in range(queue.head, len(queue.orders)) if not queue.consumed[index]]
+
+
+class ScheduleDelta:
+    def __init__(self: ScheduleDelta, changes: Optional[List[Dict[str, Any]]] = None) -> None:
+        self.changes: List[Dict[str, Any]] = changes if changes else []
+
+    def __len__(self: ScheduleDelta) -> int:
+        return len(self.changes)
+
+    def __iter__(self: ScheduleDelta) -> Iterator[Dict[str, Any]]:
+        return iter(self.changes)
+
+    def add(self: ScheduleDelta, op: str, **fields: Any) -> None:
+        change: Dict[str, Any] = {"op": op}
+        change.update(fields)
+        self.changes.append(change)
+
+    def write(self: ScheduleDelta, sink: TextIO) -> None:
+        #a header line with the format version, then one change per line
+        for change in chain([{"delta": DELTA_VERSION, "changes": len(self.changes)}], self.changes):
+            sink.write(json.dumps(change, separators=(",", ":")))
+            sink.write("\n")
+
+    def to_jsonl(self: ScheduleDelta) -> str:
+        lines: io.StringIO = io.StringIO()
+        self.write(lines)
+        return lines.getvalue()
+
+    @staticmethod
+    def read(lines: Iterable[str]) -> ScheduleDelta:
+        delta: ScheduleDelta = ScheduleDelta()
+        rows: Iterator[str] = (line for line in lines if line.strip())
+        header: Dict[str, Any] = json.loads(next(rows, "{}"))
+        if header.get("delta") != DELTA_VERSION:
+            raise ValueError(f"unsupported delta version {header.get('delta')!r}")
+        for line in rows:
+            delta.changes.append(json.loads(line))
+        return delta
+
+
+def missing_from(values: List[Any], other: List[Any]) -> List[Any]:
+    #values not in other, counting repeats, in the order they appear in values
+    unmatched: Counter = Counter(values) - Counter(other)
+    missing: List[Any] = []
+    for value in values:
+        if unmatched[value] > 0:
+            unmatched[value] -= 1
+            missing.append(value)
+    return missing
+
+
+def calendar_bounds(old: Calendar, new: Calendar) -> Optional[Tuple[date, date]]:
+    earliest: List[date] = [day for day in (old.earliest_date, new.earliest_date) if day]
+    latest: List[date] = [day for day in (old.latest_date, new.latest_date) if day]
+    if not earliest or not latest:
+        return None
+    return min(earliest), max(latest)
+
+
+def diff_day(delta: ScheduleDelta, day: date, old: Optional[DayState], new: Optional[DayState]) -> None:
+    if old == new:
+        return
+    if new is None:
+        #the copy drops the day with everything on it, so nothing more is said about it
+        delta.add("day-", day=day.isoformat())
+        return
+    if old is not None and (old[2] != new[2] or [moment for moment, _ in old[0]] != [moment for moment, _ in new[0]]):
+        #slot ops can't change the kind of day or its slot times, so the copy's day is replaced by an empty one and filled from there
+        delta.add("day-", day=day.isoformat())
+        old = None
+    if old is None:
+        delta.add("day+", day=day.isoformat(), kind=new[2], slots=[moment.time().isoformat(timespec="minutes") for moment, _ in new[0]])
+    old_slots: Dict[datetime, Optional[Tuple[str, str]]] = dict(old[0]) if old else {}
+    new_slots: Dict[datetime, Optional[Tuple[str, str]]] = dict(new[0])
+    for moment in sorted(old_slots.keys() | new_slots.keys()):
+        before: Optional[Tuple[str, str]] = old_slots.get(moment)
+        after: Optional[Tuple[str, str]] = new_slots.get(moment)
+        if before != after:
+            delta.add("slot", at=moment.isoformat(timespec="minutes"), **{"from": list(before) if before else None, "to": list(after) if after else None})
+    old_notes: List[str] = list(old[1]) if old else []
+    new_notes: List[str] = list(new[1])
+    if old_notes != new_notes:
+        for note in missing_from(old_notes, new_notes):
+            delta.add("note-", day=day.isoformat(), note=note)
+        for note in missing_from(new_notes, old_notes):
+            delta.add("note+", day=day.isoformat(), note=note)
+
+
+def diff_queue(delta: ScheduleDelta, name: str, old: QueueState, new: QueueState) -> None:
+    if old == new:
+        return
+    added: QueueState = missing_from(new, old)
+    removed: QueueState = missing_from(old, new)
+    delta.add("queue", show=name, added=[[label, order, release.isoformat() if release else None] for label, order, release in added],
+              removed=[label for label, _, _ in removed])
+
+
+def diff_calendars(old: Calendar, new: Calendar, delta: Optional[ScheduleDelta] = None) -> ScheduleDelta:
+    #two unrelated calendars can only be compared day by day; DeltaTracker does it in O(changes) for one calendar over time
+    delta = delta if delta is not None else ScheduleDelta()
+    bounds: Optional[Tuple[date, date]] = calendar_bounds(old, new)
+    if bounds is None:
+        return delta
+    for (day, before), after in zip(old.range(*bounds).items(), new.range(*bounds)):
+        if before is not after:
+            diff_day(delta, day, day_state(before), day_state(after))
+    return delta
+
+
+def diff_queues(old: Schedule, new: Schedule, delta: ScheduleDelta) -> None:
+    old_shows: Dict[str, Show] = {show.name: show for show in old.shows.all()}
+    new_shows: Dict[str, Show] = {show.name: show for show in new.shows.all()}
+    for name in old_shows:
+        if name not in new_shows:
+            delta.add("show-", show=name)
+    for name in new_shows:
+        old_show: Optional[Show] = old_shows.get(name)
+        if old_show is None:
+            delta.add("show+", show=name)
+        diff_queue(delta, name, queue_state(old_show.episodes) if old_show else [], queue_state(new_shows[name].episodes))
+
+
+def diff_schedules(old: Schedule, new: Schedule) -> ScheduleDelta:
+    delta: ScheduleDelta = diff_calendars(old.schedule, new.schedule)
+    diff_queues(old, new, delta)
+    return delta
+
+
+def diff_against_snapshot(path: str, schedule: Schedule) -> ScheduleDelta:
+    #what changed in schedule since the snapshot at path was saved; the snapshot's mapping is closed again once it has been read
+    old: Schedule = load_schedule(path)
+    try:
+        return diff_schedules(old, schedule)
+    finally:
+        if isinstance(old.schedule, SnapshotCalendar):
+            old.schedule.close()
+
+
+class DeltaTracker:
+    #what a downstream copy of one live schedule last received; each delta() only visits the weeks and queues whose
+    #versions moved since the previous call, so keeping a copy in sync costs O(changes) after the first full pass
+    def __init__(self: DeltaTracker, schedule: Schedule) -> None:
+        self.schedule: Schedule = schedule
+        self.week_versions: Dict[int, int] = {}
+        #week key -> state of each stored day of that week, as last sent
+        self.weeks: Dict[int, Dict[date, DayState]] = {}
+        self.queue_versions: Dict[str, int] = {}
+        self.queues: Dict[str, QueueState] = {}
+        #a label changed in place shows up in no week version, so every week is looked at again when this moves
+        self.label_version: int = Episode.label_version
+
+    def week_days(self: DeltaTracker, week: int) -> Dict[date, DayState]:
+        calendar: Calendar = self.schedule.schedule
+        days: Dict[date, DayState] = {}
+        for day, schedule_date in calendar.range(date.fromordinal(week * 7), date.fromordinal(week * 7 + 6)).items():
+            state: Optional[DayState] = day_state(schedule_date)
+            if state is not None:
+                days[day] = state
+        return days
+
+    def delta(self: DeltaTracker) -> ScheduleDelta:
+        delta: ScheduleDelta = ScheduleDelta()
+        calendar: Calendar = self.schedule.schedule
+        if self.label_version != Episode.label_version:
+            self.label_version = Episode.label_version
+            self.week_versions.clear()
+        for week, version in sorted(calendar.week_versions.items()):
+            if self.week_versions.get(week) == version:
+                continue
+            self.week_versions[week] = version
+            old: Dict[date, DayState] = self.weeks.get(week, {})
+            new: Dict[date, DayState] = self.week_days(week)
+            for day in sorted(old.keys() | new.keys()):
+                diff_day(delta, day, old.get(day), new.get(day))
+            self.weeks[week] = new
+        if calendar.frozen_through is not None:
+            #archived weeks drop out of week_versions; the copy keeps them as they were when they were sent
+            frozen: int = Calendar.week_key(calendar.frozen_through)
+            for week in [week for week in self.weeks if week <= frozen]:
+                del self.weeks[week]
+                self.week_versions.pop(week, None)
+        self.delta_queues(delta)
+        return delta
+
+    def delta_queues(self: DeltaTracker, delta: ScheduleDelta) -> None:
+        shows: Dict[str, Show] = {show.name: show for show in self.schedule.shows.all()}
+        for name in [name for name in self.queues if name not in shows]:
+            delta.add("show-", show=name)
+            del self.queues[name]
+            del self.queue_versions[name]
+        for name, show in shows.items():
+            if self.queue_versions.get(name) == show.episodes.version and name in self.queues:
+                continue
+            if name not in self.queues:
+                delta.add("show+", show=name)
+            new: QueueState = queue_state(show.episodes)
+            diff_queue(delta, name, self.queues.get(name, []), new)
+            self.queues[name] = new
+            self.queue_versions[name] = show.episodes.version
+
+
+def target_slot(schedule: Schedule, moment: datetime) -> ShowSlot:
+    schedule_date: Optional[ScheduleDate] = schedule.schedule.get(moment.date())
+    for slot in schedule_date.slots if schedule_date else []:
+        if slot.time == moment:
+            return slot
+    raise ValueError(f"delta changes slot {moment.isoformat(timespec='minutes')}, which the target doesn't have")
+
+
+def target_episode(schedule: Schedule, show_name: str, label: str) -> Episode:
+    #the copy's own episode object when it has one, a waiting one first, so queue changes that follow find it by identity
+    if show_name in schedule.shows:
+        queue: EpisodeQueue = schedule.get_show(show_name).episodes
+        matches: List[int] = [index for index, known in enumerate(queue.labels) if known == label]
+        if matches:
+            return queue.episode_at(min(matches, key=lambda index: queue.consumed[index]))
+    return Episode(show_name, label)
+
+
+def apply_delta(schedule: Schedule, delta: Iterable[Dict[str, Any]]) -> None:
+    #replays a delta onto a copy of the schedule it was taken from; episodes new to a queue come without weekday or time constraints
+    calendar: Calendar = schedule.schedule
+    for change in delta:
+        op: str = change["op"]
+        if op == "day+":
+            day: date = date.fromisoformat(change["day"])
+            schedule_date: ScheduleDate = DAY_KINDS[change.get("kind", "plain")](day)
+            schedule_date.slots = [ShowSlot(datetime.combine(day, time.fromisoformat(moment))) for moment in change.get("slots", [])]
+            calendar[day] = schedule_date
+        elif op == "day-":
+            day = date.fromisoformat(change["day"])
+            if day in calendar:
+                del calendar[day]
+        elif op == "slot":
+            slot: ShowSlot = target_slot(schedule, datetime.fromisoformat(change["at"]))
+            if change["to"] is None:
+                calendar.unassign(slot)
+            else:
+                calendar.assign(slot, target_episode(schedule, *change["to"]))
+        elif op in ("note+", "note-"):
+            day = date.fromisoformat(change["day"])
+            if op == "note+":
+                calendar.add_note(day, change["note"])
+            else:
+                calendar.remove_note(day, change["note"])
+        elif op == "show+":
+            if change["show"] not in schedule.shows:
+                schedule.shows.register(Show(change["show"]))
+        elif op == "show-":
+            if change["show"] in schedule.shows:
+                schedule.shows.unregister(schedule.get_show(change["show"]))
+        elif op == "queue":
+            show: Show = schedule.get_show(change["show"])
+            for label in change["removed"]:
+                show.episodes.take(target_episode(schedule, show.name, label))
+            queue: EpisodeQueue = show.episodes
+            for label, order, release in change["added"]:
+                #an episode handed out earlier comes back; anything else, a second episode with the same label included, is new
+                handed_out: List[int] = [index for index, known in enumerate(queue.labels) if known == label and queue.consumed[index]]
+                if handed_out:
+                    queue.add(queue.episode_at(handed_out[0]))
+                else:
+                    queue.add_record(order, label, datetime.fromisoformat(release) if release else None, ANYTIME)
+            if len(queue):
+                schedule.shows.mark_active(show)
+        else:
+            raise ValueError(f"unknown delta op {op!r}")
+
+
+def sync_round_trip(schedule: Schedule, edit: Callable[[Schedule], Any]) -> ScheduleDelta:
+    #what a downstream copy still differs by after edit, empty when syncing works: the copy starts from a snapshot taken
+    #as the tracker is primed, and gets the tracker's delta through its json lines form
+    tracker: DeltaTracker = DeltaTracker(schedule)
+    tracker.delta()
+    copy: Schedule = load_schedule_bytes(snapshot_bytes(schedule))
+    try:
+        edit(schedule)
+        apply_delta(copy, ScheduleDelta.read(tracker.delta().to_jsonl().splitlines()))
+        return diff_schedules(copy, schedule)
+    finally:
+        if isinstance(copy.schedule, SnapshotCalendar):
+            copy.schedule.close()
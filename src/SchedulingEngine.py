@@ -0,0 +1,31 @@
+from __future__ import annotations
+from typing import Optional, TYPE_CHECKING
+from abc import ABC, abstractmethod
+from datetime import date
+
+if TYPE_CHECKING:
+    from Schedule import Schedule
+
+
+class SchedulingEngine(ABC):
+    #fills a schedule from start onwards; Schedule.plan hands the work to whichever engine the schedule was given
+    @abstractmethod
+    def generate(
+            self: SchedulingEngine,
+            schedule: Schedule,
+            start: date,
+            stop_at_first_empty_show: bool = True,
+            end: Optional[date] = None,
+            event_driven: bool = False) -> date:
+        ...
+
+
+class GreedyEngine(SchedulingEngine):
+    def generate(
+            self: GreedyEngine,
+            schedule: Schedule,
+            start: date,
+            stop_at_first_empty_show: bool = True,
+            end: Optional[date] = None,
+            event_driven: bool = False) -> date:
+        return schedule.generate_schedule(start, stop_at_first_empty_show, end, event_driven)
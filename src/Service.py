@@ -0,0 +1,231 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, Optional, Tuple, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+import asyncio
+import io
+import json
+import sys
+from ConfigLoader import build_show, build_special_date, load_config, to_date
+from Schedule import Schedule, ScheduleBuilder
+from Show import Show
+import Display
+
+#a small local HTTP/JSON front for one schedule; bodies use the same show and special date entries as ConfigLoader
+#  GET  /state                  -> summary
+#  GET  /views/text|csv|paste   -> rendered schedule, cached until the state changes
+#  POST /shows                  {"name": ...} from the loaded pool, or a full show entry
+#  POST /special-dates          special date entry
+#  POST /clear                  {"start": "2025-09-01", "end": "2025-09-07"}
+#  POST /generate               {"start": ..., "end": ..., "stop_at_first_empty_show": true, "event_driven": false}
+#  POST /regenerate             {"start": ...}; concurrent requests are folded into one run from the earliest start
+T = TypeVar("T")
+Response = Tuple[int, str, str]
+REASONS: Dict[int, str] = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+MAX_BODY: int = 1 << 20
+
+
+class RequestError(Exception):
+    def __init__(self: RequestError, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status: int = status
+
+
+class ScheduleService:
+    def __init__(self: ScheduleService, schedule: Schedule, pool: Optional[Dict[str, Show]] = None) -> None:
+        self.schedule: Schedule = schedule
+        self.pool: Dict[str, Show] = pool if pool else {}
+        #every read and write of the schedule happens on this one thread, in order, so the event loop never blocks on it
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1)
+        #bumped after every change; rendered views remember the version they were rendered at
+        self.version: int = 0
+        self.views: Dict[str, Tuple[int, str]] = {}
+        #regenerate requests that arrive before the next run starts join one batch, run once from the earliest start;
+        #every request in a batch awaits the batch's future, which carries that run's stop day or its error
+        self.regenerate_from: Optional[date] = None
+        self.next_batch: Optional[asyncio.Future[Optional[date]]] = None
+        self.regenerating: bool = False
+        self.last_stop: Optional[date] = None
+
+    async def run(self: ScheduleService, work: Callable[[], T]) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, work)
+
+    async def mutate(self: ScheduleService, work: Callable[[], T]) -> T:
+        try:
+            return await self.run(work)
+        finally:
+            self.version += 1
+
+    async def view(self: ScheduleService, name: str) -> str:
+        cached: Optional[Tuple[int, str]] = self.views.get(name)
+        if cached and cached[0] == self.version:
+            return cached[1]
+        version: int = self.version
+        rendered: str = await self.run(lambda: self.render(name))
+        self.views[name] = (version, rendered)
+        return rendered
+
+    def render(self: ScheduleService, name: str) -> str:
+        if self.schedule.schedule.earliest_date is None:
+            return ""
+        sink: io.StringIO = io.StringIO()
+        if name == "text":
+            Display.write_schedule(self.schedule, sink)
+        elif name == "csv":
+            Display.write_csv(self.schedule, sink)
+        else:
+            Display.write_paste_format(self.schedule, self.pool.values(), sink)
+        return sink.getvalue()
+
+    async def regenerate(self: ScheduleService, start: date) -> Optional[date]:
+        if self.next_batch is None:
+            self.next_batch = asyncio.get_running_loop().create_future()
+        batch: asyncio.Future[Optional[date]] = self.next_batch
+        self.regenerate_from = start if self.regenerate_from is None else min(self.regenerate_from, start)
+        if not self.regenerating:
+            self.regenerating = True
+            asyncio.create_task(self.regenerate_pending())
+        #shielded, so a client that goes away doesn't cancel the batch for everyone else in it
+        return await asyncio.shield(batch)
+
+    async def regenerate_pending(self: ScheduleService) -> None:
+        batch: Optional[asyncio.Future[Optional[date]]] = None
+        try:
+            while self.next_batch is not None and self.regenerate_from is not None:
+                batch, start = self.next_batch, self.regenerate_from
+                self.next_batch, self.regenerate_from = None, None
+                try:
+                    stop: Optional[date] = await self.mutate(lambda: self.schedule.regenerate(start))
+                except Exception as error:
+                    batch.set_exception(RequestError(500, f"regenerate failed: {error}"))
+                else:
+                    self.last_stop = stop
+                    batch.set_result(stop)
+        finally:
+            self.regenerating = False
+            #only reached with a batch still open when this task itself was cancelled
+            for waiting in (batch, self.next_batch):
+                if waiting is not None and not waiting.done():
+                    waiting.set_exception(RequestError(500, "regenerate was cancelled"))
+            self.next_batch, self.regenerate_from = None, None
+
+    def state(self: ScheduleService) -> Dict[str, Any]:
+        calendar = self.schedule.schedule
+        return {
+            "version": self.version,
+            "earliest": calendar.earliest_date.isoformat() if calendar.earliest_date else None,
+            "latest": calendar.latest_date.isoformat() if calendar.latest_date else None,
+            "last_stop": self.last_stop.isoformat() if self.last_stop else None,
+            "shows": {show.name: len(show.episodes) for show in self.schedule.shows.all()},
+            "pool": sorted(self.pool),
+        }
+
+    def register_show(self: ScheduleService, entry: Dict[str, Any]) -> str:
+        name: str = str(entry.get("name", ""))
+        show: Show
+        if set(entry) == {"name"}:
+            if name not in self.pool:
+                raise RequestError(404, f"{name!r} is not in the show pool")
+            show = self.pool.pop(name)
+        else:
+            show = build_show(entry, len(self.schedule.shows.all()) + len(self.pool) + 1)
+        ScheduleBuilder(self.schedule).RegisterShow(show)
+        return show.name
+
+    async def handle(self: ScheduleService, method: str, path: str, body: Dict[str, Any]) -> Response:
+        if method == "GET":
+            if path == "/state":
+                return 200, "application/json", json.dumps(await self.run(self.state))
+            if path.startswith("/views/") and path[len("/views/"):] in ("text", "csv", "paste"):
+                view: str = path[len("/views/"):]
+                return 200, "text/csv" if view != "text" else "text/plain", await self.view(view)
+        elif method == "POST":
+            if path == "/shows":
+                name: str = await self.mutate(lambda: self.register_show(body))
+                return 200, "application/json", json.dumps({"registered": name, "version": self.version})
+            if path == "/special-dates":
+                await self.mutate(lambda: ScheduleBuilder(self.schedule).RegisterSpecialDate(build_special_date(body)))
+                return 200, "application/json", json.dumps({"version": self.version})
+            if path == "/clear":
+                start: date = to_date(body["start"])
+                end: Optional[date] = to_date(body["end"]) if body.get("end") else None
+                await self.mutate(lambda: self.schedule.clear_date_range(start, end))
+                return 200, "application/json", json.dumps({"version": self.version})
+            if path == "/generate":
+                generate_start: date = to_date(body["start"])
+                generate_end: Optional[date] = to_date(body["end"]) if body.get("end") else None
+                self.last_stop = await self.mutate(lambda: self.schedule.plan(
+                    generate_start, bool(body.get("stop_at_first_empty_show", True)), generate_end, bool(body.get("event_driven", False))))
+                return 200, "application/json", json.dumps({"stop": self.last_stop.isoformat(), "version": self.version})
+            if path == "/regenerate":
+                stop: Optional[date] = await self.regenerate(to_date(body["start"]))
+                return 200, "application/json", json.dumps({"stop": stop.isoformat() if stop else None, "version": self.version})
+        else:
+            raise RequestError(405, f"{method} is not supported")
+        raise RequestError(404, f"no route for {method} {path}")
+
+    async def serve_connection(self: ScheduleService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        response: Response
+        try:
+            try:
+                method, path, body = await read_request(reader)
+                response = await self.handle(method, path, body)
+            except RequestError as error:
+                response = error.status, "application/json", json.dumps({"error": str(error)})
+            except (KeyError, ValueError, TypeError, asyncio.IncompleteReadError) as error:
+                response = 400, "application/json", json.dumps({"error": f"bad request: {error}"})
+            except Exception as error:
+                #anything else is a bug on this side, but the client still gets an answer and the server keeps serving
+                response = 500, "application/json", json.dumps({"error": f"internal error: {error}"})
+            await write_response(writer, response)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self: ScheduleService, host: str = "127.0.0.1", port: int = 8080) -> None:
+        server: asyncio.AbstractServer = await asyncio.start_server(self.serve_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+async def read_request(reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, Any]]:
+    request_line: str = (await reader.readline()).decode("latin-1").strip()
+    parts = request_line.split()
+    if len(parts) < 2:
+        raise RequestError(400, "malformed request line")
+    length: int = 0
+    while True:
+        header: str = (await reader.readline()).decode("latin-1").strip()
+        if not header:
+            break
+        name, _, value = header.partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value.strip())
+    if length > MAX_BODY:
+        raise RequestError(400, "request body too large")
+    raw: bytes = await reader.readexactly(length) if length else b""
+    body: Any = json.loads(raw) if raw else {}
+    if not isinstance(body, dict):
+        raise RequestError(400, "request body must be a json object")
+    return parts[0].upper(), parts[1].split("?")[0], body
+
+
+async def write_response(writer: asyncio.StreamWriter, response: Response) -> None:
+    status, content_type, text = response
+    payload: bytes = text.encode("utf-8")
+    writer.write(f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}\r\n"
+                 f"Content-Type: {content_type}; charset=utf-8\r\n"
+                 f"Content-Length: {len(payload)}\r\n"
+                 "Connection: close\r\n\r\n".encode("latin-1") + payload)
+    await writer.drain()
+
+
+if __name__ == '__main__':
+    #python Service.py [config.toml] [port]
+    pool: Dict[str, Show] = {}
+    schedule: Schedule = Schedule()
+    if len(sys.argv) > 1:
+        pool, schedule = load_config(sys.argv[1])
+    service: ScheduleService = ScheduleService(schedule, pool)
+    asyncio.run(service.serve(port=int(sys.argv[2]) if len(sys.argv) > 2 else 8080))
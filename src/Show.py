@@ -1,20 +1,22 @@
 from __future__ import annotations
-from typing import Callable, Optional, cast
-from datetime import datetime, timedelta
-from Episode import Episode, EpisodeBuilder
-from sortedcontainers import SortedList
+from typing import Callable, Optional
+from datetime import datetime
+from Episode import EpisodeBuilder
+from EpisodeQueue import EpisodeQueue
 
 class Show:
     def __init__(
             self: Show,
             name: str,
             color: int = -1,
-            episodes: Optional[SortedList] = None,
+            episodes: Optional[EpisodeQueue] = None,
             priority: int = 0) -> None:
         self.name: str = name
-        self.episodes: SortedList = episodes if episodes else SortedList(key=lambda ep: ep.episode_order)
+        self.episodes: EpisodeQueue = episodes if episodes is not None else EpisodeQueue(name)
         self.priority: int = priority
         self.color: int = color
+        #assigned by the ShowRegistry the show is registered with
+        self.show_id: int = -1
 
 
 class ShowBuilder:
@@ -40,22 +42,15 @@ class ShowBuilder:
         return self
 
     def WithEpisodes(self: ShowBuilder, num_episodes: int, start_episode: int = 1, available_on: Optional[datetime] = None) -> ShowBuilder:
-        for i in range(start_episode, num_episodes + 1):
-            self.WithEpisode(lambda ep_generator: ep_generator
-                             .EpisodeNumber(i)
-                             .AvailableAt(available_on))
+        self.show.episodes.extend_numbered(num_episodes, start_episode, available_on)
         self.FinalizeLastEpisode()
         return self
 
     def WithWeeklyEpisodes(self: ShowBuilder, start_date: datetime, num_episodes: int, start_episode: int = 1) -> ShowBuilder:
-        for i in range(start_episode, num_episodes + 1):
-            week_num: int = i - start_episode
-            self.WithEpisode(lambda ep_generator: ep_generator
-                             .EpisodeNumber(i)
-                             .AvailableAt(start_date + timedelta(days = week_num * 7)))
+        self.show.episodes.extend_weekly(start_date, num_episodes, start_episode)
         self.FinalizeLastEpisode()
         return self
 
     def FinalizeLastEpisode(self: ShowBuilder) -> ShowBuilder:
-        cast(Episode, self.show.episodes[-1]).make_last()
+        self.show.episodes.finalize_last()
         return self
\ No newline at end of file
@@ -0,0 +1,113 @@
+from __future__ import annotations
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from Show import Show
+from Journal import Journal, set_attribute
+from sortedcontainers import SortedList
+
+
+def registry_order(show: Show) -> Tuple[int, int]:
+    return (show.priority, show.show_id)
+
+
+class ShowRegistry:
+    def __init__(self: ShowRegistry, shows: Optional[Iterable[Show]] = None) -> None:
+        #every registered show in priority order, exhausted or not; state changes never touch this list
+        self.ordered: SortedList = SortedList(key=registry_order)
+        self.by_name: Dict[str, Show] = {}
+        self.by_id: Dict[int, Show] = {}
+        self.exhausted_ids: Set[int] = set()
+        self.next_id: int = 0
+        #set by Schedule.attach_journal; covers registrations, priorities, exhaustion and the registered shows' episode queues
+        self.journal: Optional[Journal] = None
+        if shows:
+            for show in shows:
+                self.register(show)
+
+    def __len__(self: ShowRegistry) -> int:
+        return len(self.ordered) - len(self.exhausted_ids)
+
+    def __iter__(self: ShowRegistry) -> Iterator[Show]:
+        return self.active()
+
+    def __contains__(self: ShowRegistry, show_name: str) -> bool:
+        return show_name in self.by_name
+
+    def register(self: ShowRegistry, show: Show, show_id: Optional[int] = None) -> Show:
+        existing: Optional[Show] = self.by_name.get(show.name)
+        if existing is show:
+            self.mark_active(show)
+            return show
+        if existing:
+            self.unregister(existing)
+        show.show_id = show_id if show_id is not None else self.next_id
+        if self.journal is not None:
+            self.journal.add(ShowRegistry.set_registered, self, show, None, show.show_id)
+        set_attribute(self.journal, self, "next_id", max(self.next_id, show.show_id) + 1)
+        self.by_name[show.name] = show
+        self.by_id[show.show_id] = show
+        self.ordered.add(show)
+        show.episodes.registry = self
+        return show
+
+    def unregister(self: ShowRegistry, show: Show) -> None:
+        if self.journal is not None:
+            self.set_exhausted(show, False)
+            self.journal.add(ShowRegistry.set_registered, self, show, show.show_id, None)
+        if show.episodes.registry is self:
+            show.episodes.registry = None
+        self.ordered.remove(show)
+        del self.by_name[show.name]
+        del self.by_id[show.show_id]
+        self.exhausted_ids.discard(show.show_id)
+
+    def get(self: ShowRegistry, show_name: str) -> Show:
+        return self.by_name[show_name]
+
+    def get_by_id(self: ShowRegistry, show_id: int) -> Show:
+        return self.by_id[show_id]
+
+    def set_registered(self: ShowRegistry, show: Show, show_id: Optional[int]) -> None:
+        if show_id is not None:
+            #next_id has journal entries of its own, so putting a show back must leave it alone
+            next_id: int = self.next_id
+            self.register(show, show_id)
+            self.next_id = next_id
+        elif self.by_name.get(show.name) is show:
+            self.unregister(show)
+
+    def set_priority(self: ShowRegistry, show: Show, priority: int) -> None:
+        if self.journal is not None:
+            self.journal.add(ShowRegistry.set_priority, self, show, show.priority, priority)
+        self.ordered.remove(show)
+        show.priority = priority
+        self.ordered.add(show)
+
+    def is_exhausted(self: ShowRegistry, show: Show) -> bool:
+        return show.show_id in self.exhausted_ids
+
+    def mark_exhausted(self: ShowRegistry, show: Show) -> None:
+        self.set_exhausted(show, True)
+
+    def mark_active(self: ShowRegistry, show: Show) -> None:
+        self.set_exhausted(show, False)
+
+    def set_exhausted(self: ShowRegistry, show: Show, exhausted: bool) -> None:
+        if (show.show_id in self.exhausted_ids) == exhausted:
+            return
+        if self.journal is not None:
+            self.journal.add(ShowRegistry.set_exhausted, self, show, not exhausted, exhausted)
+        if exhausted:
+            self.exhausted_ids.add(show.show_id)
+        else:
+            self.exhausted_ids.discard(show.show_id)
+
+    def active(self: ShowRegistry) -> Iterator[Show]:
+        if not self.exhausted_ids:
+            return iter(self.ordered)
+        return (show for show in self.ordered if show.show_id not in self.exhausted_ids)
+
+    def exhausted(self: ShowRegistry) -> Iterator[Show]:
+        return (show for show in self.ordered if show.show_id in self.exhausted_ids)
+
+    def all(self: ShowRegistry) -> List[Show]:
+        return list(self.ordered)
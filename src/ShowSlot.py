@@ -4,6 +4,8 @@ from datetime import datetime
 from Episode import Episode
 
 class ShowSlot:
+    __slots__ = ("time", "episode")
+
     def __init__(
             self: ShowSlot,
             time: datetime,
@@ -0,0 +1,46 @@
+from __future__ import annotations
+from typing import Iterable, List, Mapping, Optional, Tuple
+from datetime import date, datetime, time
+
+DAYS_IN_WEEK: int = 7
+
+
+class SlotTemplate:
+    #weekday (monday = 0) -> slot times; one instance stands in for every ordinary day it covers,
+    #so nothing is kept per day until something is scheduled on it
+    __slots__ = ("times",)
+
+    def __init__(self: SlotTemplate, times: Mapping[int, Iterable[time]]) -> None:
+        self.times: Tuple[Tuple[time, ...], ...] = tuple(tuple(sorted(set(times.get(weekday, ())))) for weekday in range(DAYS_IN_WEEK))
+
+    def __eq__(self: SlotTemplate, other: object) -> bool:
+        return isinstance(other, SlotTemplate) and self.times == other.times
+
+    def __hash__(self: SlotTemplate) -> int:
+        return hash(self.times)
+
+    def times_on(self: SlotTemplate, day: date) -> Tuple[time, ...]:
+        return self.times[day.weekday()]
+
+    def moments(self: SlotTemplate, day: date) -> List[datetime]:
+        return [datetime.combine(day, slot_time) for slot_time in self.times[day.weekday()]]
+
+
+#dinner every day, plus lunch on weekends
+DEFAULT_TEMPLATE: SlotTemplate = SlotTemplate({weekday: (time(12), time(18)) if weekday >= 5 else (time(18),) for weekday in range(DAYS_IN_WEEK)})
+
+
+class SlotTemplates:
+    def __init__(self: SlotTemplates, default: Optional[SlotTemplate] = None) -> None:
+        self.default: SlotTemplate = default if default else DEFAULT_TEMPLATE
+        #(first day, last day, template); where ranges overlap the one added last wins
+        self.overrides: List[Tuple[date, date, SlotTemplate]] = []
+
+    def override(self: SlotTemplates, template: SlotTemplate, start: date, end: Optional[date] = None) -> None:
+        self.overrides.append((start, end if end else date.max, template))
+
+    def template_for(self: SlotTemplates, day: date) -> SlotTemplate:
+        for start, end, template in reversed(self.overrides):
+            if start <= day <= end:
+                return template
+        return self.default
@@ -0,0 +1,431 @@
+from __future__ import annotations
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union, cast
+from array import array
+from datetime import date, datetime, time, timedelta
+import io
+import mmap
+import struct
+from Availability import Availability, ANYTIME, ALL_WEEKDAYS
+from Calendar import Calendar
+from DenseCalendar import DenseCalendar
+from Episode import Episode
+from EpisodeQueue import EpisodeQueue
+from Schedule import Schedule
+from ScheduleDate import ScheduleDate, DefaultScheduleDate, SpecialScheduleDate
+from Show import Show
+from ShowSlot import ShowSlot
+from SlotTemplate import SlotTemplate, SlotTemplates, DAYS_IN_WEEK
+from sortedcontainers import SortedDict, SortedSet
+
+#layout: header, section table, then sections; all integers little endian
+MAGIC: bytes = b"SHOWSNAP"
+FORMAT_VERSION: int = 1
+HEADER: struct.Struct = struct.Struct("<8sHH")
+SECTION_ENTRY: struct.Struct = struct.Struct("<4sQQ")
+SHOW_RECORD: struct.Struct = struct.Struct("<iiiiBqiii")
+DAY_INDEX_ENTRY: struct.Struct = struct.Struct("<iQ")
+DAY_HEADER: struct.Struct = struct.Struct("<BHH")
+SLOT_RECORD: struct.Struct = struct.Struct("<qiii")
+SPAN_RECORD: struct.Struct = struct.Struct("<qq")
+#first and last day ordinals, then the slot count for each weekday; the default template is written first with 0, 0
+TEMPLATE_HEADER: struct.Struct = struct.Struct("<ii7B")
+
+DAY_DEFAULT: int = 0
+DAY_SPECIAL: int = 1
+DAY_PLAIN: int = 2
+#slot episode references: show index and queue index, or an inline episode when it isn't in any queue
+NO_EPISODE: int = -1
+INLINE_EPISODE: int = -2
+NO_TIME: int = -1
+EPOCH: datetime = datetime.min
+
+
+def encode_time(moment: Optional[datetime]) -> int:
+    if moment is None:
+        return NO_TIME
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def decode_time(value: int) -> Optional[datetime]:
+    if value == NO_TIME:
+        return None
+    return EPOCH + timedelta(microseconds=value)
+
+
+def encode_clock(moment: Optional[time]) -> int:
+    if moment is None:
+        return -1
+    return ((moment.hour * 60 + moment.minute) * 60 + moment.second) * 1000000 + moment.microsecond
+
+
+def decode_clock(value: int) -> Optional[time]:
+    if value < 0:
+        return None
+    seconds, micros = divmod(value, 1000000)
+    return time(seconds // 3600, (seconds // 60) % 60, seconds % 60, micros)
+
+
+class StringTable:
+    def __init__(self: StringTable) -> None:
+        self.strings: List[str] = []
+        self.indexes: Dict[str, int] = {}
+
+    def index(self: StringTable, value: str) -> int:
+        if value not in self.indexes:
+            self.indexes[value] = len(self.strings)
+            self.strings.append(value)
+        return self.indexes[value]
+
+    def encode(self: StringTable) -> bytes:
+        encoded: List[bytes] = [value.encode("utf-8") for value in self.strings]
+        offsets: array = array("Q", [0])
+        for blob in encoded:
+            offsets.append(offsets[-1] + len(blob))
+        return struct.pack("<Q", len(encoded)) + offsets.tobytes() + b"".join(encoded)
+
+    @staticmethod
+    def decode(buffer: Union[bytes, mmap.mmap, memoryview], offset: int) -> List[str]:
+        count: int = struct.unpack_from("<Q", buffer, offset)[0]
+        offsets: array = array("Q")
+        offsets.frombytes(bytes(buffer[offset + 8:offset + 8 + 8 * (count + 1)]))
+        base: int = offset + 8 + 8 * (count + 1)
+        return [bytes(buffer[base + offsets[i]:base + offsets[i + 1]]).decode("utf-8") for i in range(count)]
+
+
+class SnapshotWriter:
+    def __init__(self: SnapshotWriter, schedule: Schedule) -> None:
+        self.schedule: Schedule = schedule
+        self.strings: StringTable = StringTable()
+        self.shows: List[Show] = schedule.shows.all()
+        self.show_indexes: Dict[str, int] = {show.name: i for i, show in enumerate(self.shows)}
+
+    def write(self: SnapshotWriter, sink: BinaryIO) -> None:
+        #strings are collected while the other sections encode, so they go last
+        sections: List[Tuple[bytes, bytes]] = [
+            (b"SHOW", self.encode_shows()),
+            (b"DAYS", self.encode_days(self.calendar_days())),
+            (b"SPEC", self.encode_days(self.special_dates())),
+            (b"IDLE", self.encode_idle()),
+            (b"APPR", self.encode_appearances()),
+            (b"TMPL", self.encode_templates()),
+        ]
+        sections.append((b"STRS", self.strings.encode()))
+        offset: int = HEADER.size + SECTION_ENTRY.size * len(sections)
+        sink.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(sections)))
+        for tag, payload in sections:
+            sink.write(SECTION_ENTRY.pack(tag, offset, len(payload)))
+            offset += len(payload)
+        for _, payload in sections:
+            sink.write(payload)
+
+    def calendar_days(self: SnapshotWriter) -> List[Tuple[date, ScheduleDate]]:
+        calendar: Calendar = self.schedule.schedule
+        if calendar.earliest_date is None or calendar.latest_date is None:
+            return []
+        return [(day, schedule_date) for day, schedule_date in calendar.range(calendar.earliest_date, calendar.latest_date).items() if schedule_date is not None]
+
+    def special_dates(self: SnapshotWriter) -> List[Tuple[date, ScheduleDate]]:
+        #special dates already stored in the calendar are written once, with the calendar
+        calendar: Calendar = self.schedule.schedule
+        return [(day, special) for day, special in sorted(self.schedule.special_dates.items()) if calendar.get(day) is not special]
+
+    def encode_shows(self: SnapshotWriter) -> bytes:
+        chunks: List[bytes] = [struct.pack("<I", len(self.shows))]
+        for show in self.shows:
+            queue: EpisodeQueue = show.episodes
+            count: int = len(queue.orders)
+            last_seen: Optional[datetime] = self.schedule.previous_ep_cache.get(show)
+            chunks.append(SHOW_RECORD.pack(self.strings.index(show.name), show.priority, show.color, show.show_id,
+                                           1 if self.schedule.shows.is_exhausted(show) else 0, encode_time(last_seen),
+                                           count, queue.head, queue.remaining))
+            labels: array = array("i", (self.strings.index(queue.labels[i]) for i in range(count)))
+            releases: array = array("q", (encode_time(queue.releases[i]) for i in range(count)))
+            weekdays: bytearray = bytearray(constraint.weekdays for constraint in queue.constraints)
+            window_starts: array = array("q", (encode_clock(constraint.window_start) for constraint in queue.constraints))
+            window_ends: array = array("q", (encode_clock(constraint.window_end) for constraint in queue.constraints))
+            chunks += [queue.orders.tobytes(), labels.tobytes(), releases.tobytes(), bytes(weekdays),
+                       window_starts.tobytes(), window_ends.tobytes(), bytes(queue.consumed)]
+        return b"".join(chunks)
+
+    def encode_days(self: SnapshotWriter, days: List[Tuple[date, ScheduleDate]]) -> bytes:
+        index: List[bytes] = []
+        records: List[bytes] = []
+        offset: int = 0
+        for day, schedule_date in days:
+            record: bytes = self.encode_day(schedule_date)
+            index.append(DAY_INDEX_ENTRY.pack(day.toordinal(), offset))
+            records.append(record)
+            offset += len(record)
+        return struct.pack("<I", len(days)) + b"".join(index) + b"".join(records)
+
+    def encode_day(self: SnapshotWriter, schedule_date: ScheduleDate) -> bytes:
+        kind: int = DAY_SPECIAL if isinstance(schedule_date, SpecialScheduleDate) else DAY_DEFAULT if isinstance(schedule_date, DefaultScheduleDate) else DAY_PLAIN
+        chunks: List[bytes] = [DAY_HEADER.pack(kind, len(schedule_date.slots), len(schedule_date.special_notes))]
+        for slot in schedule_date.slots:
+            chunks.append(self.encode_slot(slot))
+        chunks.append(array("i", (self.strings.index(note) for note in schedule_date.special_notes)).tobytes())
+        return b"".join(chunks)
+
+    def encode_slot(self: SnapshotWriter, slot: ShowSlot) -> bytes:
+        episode: Optional[Episode] = slot.episode
+        if episode is None:
+            return SLOT_RECORD.pack(encode_time(slot.time), NO_EPISODE, 0, 0)
+        show_index: int = self.show_indexes.get(episode.show_name, -1)
+        queue_index: int = self.shows[show_index].episodes.find(episode) if show_index >= 0 else -1
+        if queue_index < 0:
+            return SLOT_RECORD.pack(encode_time(slot.time), INLINE_EPISODE, self.strings.index(episode.show_name), self.strings.index(episode.episode_label)) \
+                + struct.pack("<qq", episode.episode_order, encode_time(episode.release_date))
+        return SLOT_RECORD.pack(encode_time(slot.time), show_index, queue_index, 0)
+
+    def encode_idle(self: SnapshotWriter) -> bytes:
+        spans: List[Tuple[datetime, datetime]] = self.schedule.schedule.idle_spans
+        return struct.pack("<I", len(spans)) + b"".join(SPAN_RECORD.pack(encode_time(start), encode_time(end)) for start, end in spans)
+
+    def encode_templates(self: SnapshotWriter) -> bytes:
+        templates: SlotTemplates = self.schedule.slot_templates
+        ranges: List[Tuple[int, int, SlotTemplate]] = [(0, 0, templates.default)]
+        ranges += [(start.toordinal(), end.toordinal(), template) for start, end, template in templates.overrides]
+        chunks: List[bytes] = [struct.pack("<I", len(ranges))]
+        for start, end, template in ranges:
+            chunks.append(TEMPLATE_HEADER.pack(start, end, *(len(times) for times in template.times)))
+            chunks.append(array("q", (encode_clock(slot_time) for times in template.times for slot_time in times)).tobytes())
+        return b"".join(chunks)
+
+    def encode_appearances(self: SnapshotWriter) -> bytes:
+        appearances: Dict[str, SortedSet] = self.schedule.schedule.appearances
+        chunks: List[bytes] = [struct.pack("<I", len(appearances))]
+        for show_name, times in appearances.items():
+            chunks.append(struct.pack("<iI", self.strings.index(show_name), len(times)))
+            chunks.append(array("q", (encode_time(moment) for moment in times)).tobytes())
+        return b"".join(chunks)
+
+
+class SnapshotReader:
+    def __init__(self: SnapshotReader, buffer: Union[bytes, mmap.mmap, memoryview]) -> None:
+        self.buffer: Union[bytes, mmap.mmap, memoryview] = buffer
+        #every problem with the file comes out as a ValueError, a cut short one included
+        if len(buffer) < HEADER.size:
+            raise ValueError("truncated schedule snapshot")
+        magic, version, count = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("not a schedule snapshot")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"unsupported schedule snapshot version {version}")
+        if len(buffer) < HEADER.size + count * SECTION_ENTRY.size:
+            raise ValueError("truncated schedule snapshot")
+        self.sections: Dict[bytes, Tuple[int, int]] = {}
+        for i in range(count):
+            tag, offset, length = SECTION_ENTRY.unpack_from(buffer, HEADER.size + i * SECTION_ENTRY.size)
+            if offset + length > len(buffer):
+                raise ValueError("truncated schedule snapshot")
+            self.sections[tag] = (offset, length)
+        self.strings: List[str] = StringTable.decode(buffer, self.sections[b"STRS"][0])
+        self.shows: List[Show] = []
+        self.constraints: Dict[Tuple[int, int, int], Availability] = {}
+
+    def read_array(self: SnapshotReader, typecode: str, offset: int, count: int) -> Tuple[array, int]:
+        values: array = array(typecode)
+        end: int = offset + values.itemsize * count
+        values.frombytes(bytes(self.buffer[offset:end]))
+        return values, end
+
+    def constraint(self: SnapshotReader, weekdays: int, window_start: int, window_end: int) -> Availability:
+        key: Tuple[int, int, int] = (weekdays, window_start, window_end)
+        if key not in self.constraints:
+            start: Optional[time] = decode_clock(window_start)
+            if weekdays == ALL_WEEKDAYS and start in (None, time.min) and window_end < 0:
+                self.constraints[key] = ANYTIME
+            else:
+                self.constraints[key] = Availability(None, weekdays, start, decode_clock(window_end))
+        return self.constraints[key]
+
+    def read_schedule(self: SnapshotReader) -> Schedule:
+        calendar: SnapshotCalendar = SnapshotCalendar(self)
+        schedule: Schedule = Schedule(calendar=calendar)
+        offset: int = self.sections[b"SHOW"][0]
+        count: int = struct.unpack_from("<I", self.buffer, offset)[0]
+        offset += 4
+        for _ in range(count):
+            name, priority, color, show_id, exhausted, last_seen, episodes, head, remaining = SHOW_RECORD.unpack_from(self.buffer, offset)
+            offset += SHOW_RECORD.size
+            queue: EpisodeQueue = EpisodeQueue(self.strings[name])
+            queue.orders, offset = self.read_array("q", offset, episodes)
+            labels, offset = self.read_array("i", offset, episodes)
+            releases, offset = self.read_array("q", offset, episodes)
+            weekdays: bytes = bytes(self.buffer[offset:offset + episodes])
+            offset += episodes
+            window_starts, offset = self.read_array("q", offset, episodes)
+            window_ends, offset = self.read_array("q", offset, episodes)
+            queue.consumed = bytearray(self.buffer[offset:offset + episodes])
+            offset += episodes
+            queue.labels = [self.strings[label] for label in labels]
+            queue.releases = [decode_time(release) for release in releases]
+            queue.constraints = [self.constraint(weekdays[i], window_starts[i], window_ends[i]) for i in range(episodes)]
+            queue.episodes = [None] * episodes
+            queue.head = head
+            queue.remaining = remaining
+            show: Show = Show(self.strings[name], color, queue, priority)
+            #keep the saved ids so registration order and tie breaks survive the round trip
+            schedule.shows.register(show, show_id)
+            if exhausted:
+                schedule.shows.mark_exhausted(show)
+            if last_seen != NO_TIME:
+                schedule.previous_ep_cache[show] = cast(datetime, decode_time(last_seen))
+            self.shows.append(show)
+        calendar.load_index()
+        self.read_appearances(calendar)
+        self.read_idle(calendar)
+        self.read_templates(schedule.slot_templates)
+        for day, special in self.read_days(b"SPEC"):
+            schedule.special_dates[day] = special
+        #special dates that were stored in the calendar are the same objects as the calendar's days
+        for day in calendar.pending_special:
+            schedule.special_dates[day] = cast(ScheduleDate, calendar.get(day))
+        return schedule
+
+    def read_days(self: SnapshotReader, tag: bytes) -> List[Tuple[date, ScheduleDate]]:
+        offset: int = self.sections[tag][0]
+        count: int = struct.unpack_from("<I", self.buffer, offset)[0]
+        records: int = offset + 4 + count * DAY_INDEX_ENTRY.size
+        days: List[Tuple[date, ScheduleDate]] = []
+        for i in range(count):
+            ordinal, record = DAY_INDEX_ENTRY.unpack_from(self.buffer, offset + 4 + i * DAY_INDEX_ENTRY.size)
+            day: date = date.fromordinal(ordinal)
+            days.append((day, self.read_day(day, records + record)))
+        return days
+
+    def read_day(self: SnapshotReader, day: date, offset: int) -> ScheduleDate:
+        kind, slot_count, note_count = DAY_HEADER.unpack_from(self.buffer, offset)
+        offset += DAY_HEADER.size
+        schedule_date: ScheduleDate = SpecialScheduleDate(day) if kind == DAY_SPECIAL else DefaultScheduleDate(day) if kind == DAY_DEFAULT else ScheduleDate(day)
+        for _ in range(slot_count):
+            moment, show_index, value, label = SLOT_RECORD.unpack_from(self.buffer, offset)
+            offset += SLOT_RECORD.size
+            episode: Optional[Episode] = None
+            if show_index == INLINE_EPISODE:
+                order, release = struct.unpack_from("<qq", self.buffer, offset)
+                offset += 16
+                episode = Episode(self.strings[value], self.strings[label], order, decode_time(release))
+                episode.episode_order = order
+            elif show_index != NO_EPISODE:
+                episode = self.shows[show_index].episodes.episode_at(value)
+            schedule_date.slots.append(ShowSlot(cast(datetime, decode_time(moment)), episode))
+        notes, offset = self.read_array("i", offset, note_count)
+        schedule_date.special_notes = [self.strings[note] for note in notes]
+        return schedule_date
+
+    def read_appearances(self: SnapshotReader, calendar: Calendar) -> None:
+        offset: int = self.sections[b"APPR"][0]
+        count: int = struct.unpack_from("<I", self.buffer, offset)[0]
+        offset += 4
+        for _ in range(count):
+            name, times = struct.unpack_from("<iI", self.buffer, offset)
+            offset += 8
+            values, offset = self.read_array("q", offset, times)
+            calendar.appearances[self.strings[name]] = SortedSet(cast(datetime, decode_time(value)) for value in values)
+
+    def read_templates(self: SnapshotReader, templates: SlotTemplates) -> None:
+        #snapshots written before slot templates existed simply keep the default
+        if b"TMPL" not in self.sections:
+            return
+        offset: int = self.sections[b"TMPL"][0]
+        count: int = struct.unpack_from("<I", self.buffer, offset)[0]
+        offset += 4
+        for i in range(count):
+            start, end, *counts = TEMPLATE_HEADER.unpack_from(self.buffer, offset)
+            offset += TEMPLATE_HEADER.size
+            clocks, offset = self.read_array("q", offset, sum(counts))
+            times: Dict[int, List[time]] = {}
+            position: int = 0
+            for weekday in range(DAYS_IN_WEEK):
+                times[weekday] = [cast(time, decode_clock(clock)) for clock in clocks[position:position + counts[weekday]]]
+                position += counts[weekday]
+            if i == 0:
+                templates.default = SlotTemplate(times)
+            else:
+                templates.override(SlotTemplate(times), date.fromordinal(start), date.fromordinal(end))
+
+    def read_idle(self: SnapshotReader, calendar: Calendar) -> None:
+        offset: int = self.sections[b"IDLE"][0]
+        count: int = struct.unpack_from("<I", self.buffer, offset)[0]
+        for i in range(count):
+            start, end = SPAN_RECORD.unpack_from(self.buffer, offset + 4 + i * SPAN_RECORD.size)
+            calendar.idle_spans.append((cast(datetime, decode_time(start)), cast(datetime, decode_time(end))))
+
+
+class SnapshotCalendar(DenseCalendar):
+    def __init__(self: SnapshotCalendar, reader: SnapshotReader) -> None:
+        super().__init__()
+        self.reader: SnapshotReader = reader
+        #ordinal -> offset of days still only in the snapshot, decoded the first time they are read
+        self.pending: SortedDict = SortedDict()
+        self.pending_special: List[date] = []
+
+    def load_index(self: SnapshotCalendar) -> None:
+        offset: int = self.reader.sections[b"DAYS"][0]
+        count: int = struct.unpack_from("<I", self.reader.buffer, offset)[0]
+        records: int = offset + 4 + count * DAY_INDEX_ENTRY.size
+        for i in range(count):
+            ordinal, record = DAY_INDEX_ENTRY.unpack_from(self.reader.buffer, offset + 4 + i * DAY_INDEX_ENTRY.size)
+            self.pending[ordinal] = records + record
+            if self.reader.buffer[records + record] == DAY_SPECIAL:
+                self.pending_special.append(date.fromordinal(ordinal))
+        if not self.pending:
+            return
+        first: int = self.pending.keys()[0]
+        last: int = self.pending.keys()[-1]
+        self.base = first
+        self.days = [None] * (last - first + 1)
+        self.stored = len(self.pending)
+        self.earliest_date = date.fromordinal(first)
+        self.latest_date = date.fromordinal(last)
+
+    def materialize(self: SnapshotCalendar, ordinal: int) -> None:
+        offset: int = self.pending.pop(ordinal)
+        day: date = date.fromordinal(ordinal)
+        self.days[ordinal - self.base] = self.reader.read_day(day, offset)
+
+    def get(self: SnapshotCalendar, day: date) -> Optional[ScheduleDate]:
+        if self.pending and day.toordinal() in self.pending:
+            self.materialize(day.toordinal())
+        return super().get(day)
+
+    def discard(self: SnapshotCalendar, day: date) -> None:
+        if self.pending and day.toordinal() in self.pending:
+            self.materialize(day.toordinal())
+        super().discard(day)
+
+    def iter_range(self: SnapshotCalendar, start: date, length: int) -> Iterator[Optional[ScheduleDate]]:
+        if self.pending:
+            first: int = start.toordinal()
+            for ordinal in list(self.pending.irange(first, first + length - 1)):
+                self.materialize(ordinal)
+        return super().iter_range(start, length)
+
+    def close(self: SnapshotCalendar) -> None:
+        #anything still pending has to be decoded before the mapping goes away
+        for ordinal in list(self.pending):
+            self.materialize(ordinal)
+        if isinstance(self.reader.buffer, mmap.mmap):
+            self.reader.buffer.close()
+
+
+def save_schedule(schedule: Schedule, path: str) -> None:
+    with open(path, "wb") as sink:
+        SnapshotWriter(schedule).write(sink)
+
+
+def snapshot_bytes(schedule: Schedule) -> bytes:
+    sink: io.BytesIO = io.BytesIO()
+    SnapshotWriter(schedule).write(sink)
+    return sink.getvalue()
+
+
+def load_schedule(path: str) -> Schedule:
+    with open(path, "rb") as source:
+        buffer: mmap.mmap = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+    return SnapshotReader(buffer).read_schedule()
+
+
+def load_schedule_bytes(buffer: bytes) -> Schedule:
+    return SnapshotReader(buffer).read_schedule()
@@ -0,0 +1,79 @@
+from __future__ import annotations
+from typing import Any, ContextManager, Dict, List, Optional
+from contextlib import nullcontext
+import time
+
+#why a generation stopped
+STOP_END: str = "end"
+STOP_EMPTY_SHOW: str = "empty show"
+STOP_NO_CANDIDATE: str = "no candidate"
+STOP_CONVERGED: str = "converged"
+STOP_CONSUMER: str = "consumer stopped"
+
+
+class Stats:
+    def __init__(self: Stats) -> None:
+        self.counters: Dict[str, int] = {}
+        #seconds spent per phase
+        self.timers: Dict[str, float] = {}
+        self.stop_reason: Optional[str] = None
+        #the show that ran out, when the stop reason is an empty show
+        self.stopped_on: Optional[str] = None
+
+    def count(self: Stats, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self: Stats, name: str, seconds: float) -> None:
+        self.timers[name] = self.timers.get(name, 0.0) + seconds
+
+    def merge(self: Stats, other: Stats) -> None:
+        for name, amount in other.counters.items():
+            self.count(name, amount)
+        for name, seconds in other.timers.items():
+            self.add_time(name, seconds)
+        if other.stop_reason:
+            self.stop_reason = other.stop_reason
+            self.stopped_on = other.stopped_on
+
+    def cache_hit_ratio(self: Stats) -> Optional[float]:
+        lookups: int = self.counters.get("cache hits", 0) + self.counters.get("cache misses", 0)
+        return self.counters.get("cache hits", 0) / lookups if lookups else None
+
+    def to_dict(self: Stats) -> Dict[str, Any]:
+        return {"counters": dict(self.counters), "timers": dict(self.timers), "stop_reason": self.stop_reason, "stopped_on": self.stopped_on}
+
+    def __str__(self: Stats) -> str:
+        lines: List[str] = []
+        if self.stop_reason:
+            lines.append(f"stopped: {self.stop_reason}" + (f" ({self.stopped_on})" if self.stopped_on else ""))
+        lines += [f"{name}: {amount}" for name, amount in sorted(self.counters.items())]
+        ratio: Optional[float] = self.cache_hit_ratio()
+        if ratio is not None:
+            lines.append(f"cache hit ratio: {ratio:.2f}")
+        lines += [f"{name}: {seconds * 1000:.3f}ms" for name, seconds in sorted(self.timers.items())]
+        return "\n".join(lines)
+
+
+class PhaseTimer:
+    __slots__ = ("stats", "name", "started")
+
+    def __init__(self: PhaseTimer, stats: Stats, name: str) -> None:
+        self.stats: Stats = stats
+        self.name: str = name
+        self.started: float = 0.0
+
+    def __enter__(self: PhaseTimer) -> PhaseTimer:
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self: PhaseTimer, *exc_info: Any) -> None:
+        self.stats.add_time(self.name, time.perf_counter() - self.started)
+
+
+NOT_TIMED: ContextManager = nullcontext()
+
+
+def timed(stats: Optional[Stats], name: str) -> ContextManager:
+    #with instrumentation off this is a shared no-op, so phases cost one call each and nothing per slot
+    return PhaseTimer(stats, name) if stats is not None else NOT_TIMED
+
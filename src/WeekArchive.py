@@ -0,0 +1,137 @@
+from __future__ import annotations
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, cast
+from array import array
+from datetime import date, datetime, timedelta
+import os
+import struct
+from Episode import Episode
+from ScheduleDate import ScheduleDate, DefaultScheduleDate, SpecialScheduleDate
+from ShowSlot import ShowSlot
+from Snapshot import StringTable, encode_time, decode_time, DAY_DEFAULT, DAY_SPECIAL, DAY_PLAIN, NO_EPISODE
+
+#an append-only file of finished sunday-first weeks; each record stands alone, so a week is read back without the rest:
+#  header: magic, payload length, sunday ordinal
+#  payload: day count, then per day its header, slots and notes, then the record's own string table
+#episodes are written out in full, since an archived week outlives the queues its episodes came from
+WEEK_MAGIC: bytes = b"WEEK"
+WEEK_HEADER: struct.Struct = struct.Struct("<4sIi")
+ARCHIVED_DAY: struct.Struct = struct.Struct("<iBHH")
+ARCHIVED_SLOT: struct.Struct = struct.Struct("<qiiqq")
+DAYS_IN_WEEK: int = 7
+
+
+class WeekArchive:
+    def __init__(self: WeekArchive, path: str) -> None:
+        self.path: str = path
+        #sunday ordinal -> offset of that week's record; the only thing kept in memory per archived week
+        self.index: Dict[int, int] = {}
+        self.size: int = 0
+        self.reader: Optional[BinaryIO] = None
+        if os.path.exists(path):
+            self.load_index()
+
+    def __contains__(self: WeekArchive, sunday: date) -> bool:
+        return sunday.toordinal() in self.index
+
+    def __len__(self: WeekArchive) -> int:
+        return len(self.index)
+
+    def load_index(self: WeekArchive) -> None:
+        with open(self.path, "rb") as source:
+            end: int = source.seek(0, os.SEEK_END)
+            offset: int = source.seek(0)
+            while offset + WEEK_HEADER.size <= end:
+                magic, length, sunday = WEEK_HEADER.unpack(source.read(WEEK_HEADER.size))
+                if magic != WEEK_MAGIC:
+                    raise ValueError(f"{self.path} is not a week archive (bad record at {offset})")
+                if offset + WEEK_HEADER.size + length > end:
+                    break
+                self.index[sunday] = offset
+                offset = source.seek(length, os.SEEK_CUR)
+        #a record cut short by a crash is dropped, and overwritten by the next append
+        self.size = offset
+
+    def sundays(self: WeekArchive) -> List[date]:
+        return [date.fromordinal(ordinal) for ordinal in sorted(self.index)]
+
+    def append(self: WeekArchive, sunday: date, days: List[Tuple[date, ScheduleDate]]) -> None:
+        if sunday.toordinal() in self.index:
+            raise ValueError(f"week of {sunday} is already archived")
+        payload: bytes = encode_week(days)
+        with open(self.path, "r+b" if os.path.exists(self.path) else "wb") as sink:
+            sink.seek(self.size)
+            sink.truncate()
+            sink.write(WEEK_HEADER.pack(WEEK_MAGIC, len(payload), sunday.toordinal()))
+            sink.write(payload)
+        self.index[sunday.toordinal()] = self.size
+        self.size += WEEK_HEADER.size + len(payload)
+
+    def read_week(self: WeekArchive, sunday: date) -> List[Tuple[date, ScheduleDate]]:
+        #stored days of the week, in order; weeks never archived read back empty
+        offset: Optional[int] = self.index.get(sunday.toordinal())
+        if offset is None:
+            return []
+        if self.reader is None:
+            self.reader = open(self.path, "rb")
+        self.reader.seek(offset)
+        _, length, _ = WEEK_HEADER.unpack(self.reader.read(WEEK_HEADER.size))
+        return decode_week(self.reader.read(length))
+
+    def week_days(self: WeekArchive, sunday: date) -> List[Optional[ScheduleDate]]:
+        #all seven days, None where nothing was stored
+        stored: Dict[date, ScheduleDate] = dict(self.read_week(sunday))
+        return [stored.get(sunday + timedelta(days=i)) for i in range(DAYS_IN_WEEK)]
+
+    def iter_weeks(self: WeekArchive) -> Iterator[Tuple[date, List[Tuple[date, ScheduleDate]]]]:
+        for sunday in self.sundays():
+            yield sunday, self.read_week(sunday)
+
+    def close(self: WeekArchive) -> None:
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+
+def encode_week(days: List[Tuple[date, ScheduleDate]]) -> bytes:
+    strings: StringTable = StringTable()
+    chunks: List[bytes] = [struct.pack("<I", len(days))]
+    for day, schedule_date in days:
+        kind: int = DAY_SPECIAL if isinstance(schedule_date, SpecialScheduleDate) else DAY_DEFAULT if isinstance(schedule_date, DefaultScheduleDate) else DAY_PLAIN
+        chunks.append(ARCHIVED_DAY.pack(day.toordinal(), kind, len(schedule_date.slots), len(schedule_date.special_notes)))
+        for slot in schedule_date.slots:
+            episode: Optional[Episode] = slot.episode
+            if episode is None:
+                chunks.append(ARCHIVED_SLOT.pack(encode_time(slot.time), NO_EPISODE, 0, 0, 0))
+            else:
+                chunks.append(ARCHIVED_SLOT.pack(encode_time(slot.time), strings.index(episode.show_name), strings.index(episode.episode_label),
+                                                 episode.episode_order, encode_time(episode.release_date)))
+        chunks.append(array("i", (strings.index(note) for note in schedule_date.special_notes)).tobytes())
+    body: bytes = b"".join(chunks)
+    return struct.pack("<I", len(body)) + body + strings.encode()
+
+
+def decode_week(payload: bytes) -> List[Tuple[date, ScheduleDate]]:
+    body_length: int = struct.unpack_from("<I", payload, 0)[0]
+    strings: List[str] = StringTable.decode(payload, 4 + body_length)
+    count: int = struct.unpack_from("<I", payload, 4)[0]
+    offset: int = 8
+    days: List[Tuple[date, ScheduleDate]] = []
+    for _ in range(count):
+        ordinal, kind, slot_count, note_count = ARCHIVED_DAY.unpack_from(payload, offset)
+        offset += ARCHIVED_DAY.size
+        day: date = date.fromordinal(ordinal)
+        schedule_date: ScheduleDate = SpecialScheduleDate(day) if kind == DAY_SPECIAL else DefaultScheduleDate(day) if kind == DAY_DEFAULT else ScheduleDate(day)
+        for _ in range(slot_count):
+            moment, show, label, order, release = ARCHIVED_SLOT.unpack_from(payload, offset)
+            offset += ARCHIVED_SLOT.size
+            episode: Optional[Episode] = None
+            if show != NO_EPISODE:
+                episode = Episode(strings[show], strings[label], order, decode_time(release))
+                episode.episode_order = order
+            schedule_date.slots.append(ShowSlot(cast(datetime, decode_time(moment)), episode))
+        notes: array = array("i")
+        notes.frombytes(payload[offset:offset + 4 * note_count])
+        offset += 4 * note_count
+        schedule_date.special_notes = [strings[note] for note in notes]
+        days.append((day, schedule_date))
+    return days